@@ -185,6 +185,18 @@ def import_all_models():
     except ImportError as e:
         logger.error(f"无法导入AI设置模型: {e}")
     
+    # 尝试导入分析任务模型
+    try:
+        try:
+            from src.models.analysis_job import AnalysisJob
+            imported_models.append("AnalysisJob")
+        except ImportError:
+            from agent_rec.src.models.analysis_job import AnalysisJob
+            imported_models.append("AnalysisJob")
+        logger.info("成功导入分析任务模型")
+    except ImportError as e:
+        logger.error(f"无法导入分析任务模型: {e}")
+    
     # 打印导入的模型
     logger.info(f"成功导入的模型: {imported_models}")
     
@@ -0,0 +1,51 @@
+"""Add analysis_jobs table for the durable analysis queue
+
+Revision ID: 7c1e2b9d4f3a
+Revises: 4626e830026c
+Create Date: 2026-10-17 10:12:44.218310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7c1e2b9d4f3a'
+down_revision = '4626e830026c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('analysis_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('checkpoint', sa.JSON(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('paper_id', sa.String(), nullable=True),
+    sa.Column('user_id', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_analysis_jobs_id', 'analysis_jobs', ['id'], unique=False)
+    op.create_index('ix_analysis_jobs_paper_id', 'analysis_jobs', ['paper_id'], unique=False)
+    op.create_index('ix_analysis_jobs_user_id', 'analysis_jobs', ['user_id'], unique=False)
+    op.create_index('ix_analysis_jobs_claim', 'analysis_jobs', ['status', 'run_after', 'priority'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_jobs_claim', table_name='analysis_jobs')
+    op.drop_index('ix_analysis_jobs_user_id', table_name='analysis_jobs')
+    op.drop_index('ix_analysis_jobs_paper_id', table_name='analysis_jobs')
+    op.drop_index('ix_analysis_jobs_id', table_name='analysis_jobs')
+    op.drop_table('analysis_jobs')
@@ -0,0 +1,33 @@
+"""Add search_vector column and GIN index for library full-text search
+
+Revision ID: 9a3f5d2c8e61
+Revises: 7c1e2b9d4f3a
+Create Date: 2026-10-17 14:36:05.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '9a3f5d2c8e61'
+down_revision = '7c1e2b9d4f3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('papers', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # 先用数据库内置分词回填，英文即可检索；中文分词需执行 python -m src.services.library_search --rebuild
+    op.execute(
+        "UPDATE papers SET search_vector = "
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(abstract, '')), 'B') || "
+        "setweight(to_tsvector('simple', left(coalesce(content, ''), 100000)), 'C')"
+    )
+    op.create_index('ix_papers_search_vector', 'papers', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_papers_search_vector', table_name='papers')
+    op.drop_column('papers', 'search_vector')
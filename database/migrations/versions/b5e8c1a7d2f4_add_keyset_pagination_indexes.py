@@ -0,0 +1,30 @@
+"""Add composite indexes for keyset pagination of papers, projects and sessions
+
+Revision ID: b5e8c1a7d2f4
+Revises: 9a3f5d2c8e61
+Create Date: 2026-10-17 16:05:21.337940
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8c1a7d2f4'
+down_revision = '9a3f5d2c8e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_papers_owner_updated', 'papers', ['owner_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_papers_owner_created', 'papers', ['owner_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_writing_projects_owner_updated', 'writing_projects', ['owner_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_writing_projects_owner_created', 'writing_projects', ['owner_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_assistant_sessions_owner_last_message', 'assistant_sessions', ['owner_id', 'last_message_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assistant_sessions_owner_last_message', table_name='assistant_sessions')
+    op.drop_index('ix_writing_projects_owner_created', table_name='writing_projects')
+    op.drop_index('ix_writing_projects_owner_updated', table_name='writing_projects')
+    op.drop_index('ix_papers_owner_created', table_name='papers')
+    op.drop_index('ix_papers_owner_updated', table_name='papers')
@@ -0,0 +1,42 @@
+"""Add content-addressed paper_files table and papers.file_hash
+
+Revision ID: c3d9e4f1a8b6
+Revises: b5e8c1a7d2f4
+Create Date: 2026-10-17 18:42:10.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9e4f1a8b6'
+down_revision = 'b5e8c1a7d2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'paper_files',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('file_metadata', sa.JSON(), nullable=True),
+        sa.Column('page_count', sa.Integer(), nullable=True),
+        sa.Column('section_offsets', sa.JSON(), nullable=True),
+        sa.Column('extraction_backend', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    # 已有论文没有哈希，删除时仍按原路径直接删除文件
+    op.add_column('papers', sa.Column('file_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_papers_owner_file_hash', 'papers', ['owner_id', 'file_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_papers_owner_file_hash', table_name='papers')
+    op.drop_column('papers', 'file_hash')
+    op.drop_table('paper_files')
@@ -38,6 +38,7 @@ if settings.CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Total-Count"],
     )
 
 # 添加直接用户信息API，绕过复杂的路由配置
@@ -234,12 +235,42 @@ async def startup_event():
             print("后端服务启动成功")
         finally:
             db.close()
+        
+        # 未部署独立worker时在本进程内执行分析任务队列
+        from src.workers.analysis_worker import start_embedded_worker
+        start_embedded_worker()
     except Exception as e:
         print("启动事件处理出错:", str(e))
         print("错误详情:")
         traceback.print_exc()
         sys.exit(1)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 停止内嵌的分析worker，执行中的任务超过宽限时间后取消，由其他worker从断点继续
+    from src.workers.analysis_worker import stop_embedded_worker
+    await stop_embedded_worker()
+    
+    # 关闭共享的LLM HTTP连接池
+    from src.services.llm_client import close_llm_clients
+    await close_llm_clients()
+    
+    # 停止检索缓存的后台压缩任务并关闭缓存文件
+    from src.services.paper_search import paper_search_service
+    await paper_search_service.cache.close()
+    
+    # 释放异步数据库连接池
+    from src.db.session import async_engine
+    await async_engine.dispose()
+    
+    # 关闭进度总线
+    from src.services.progress_bus import progress_bus
+    await progress_bus.close()
+    
+    # 关闭PDF提取进程池
+    from src.utils.pdf_extraction import shutdown_pool
+    shutdown_pool()
+
 if __name__ == "__main__":
     import uvicorn
     try:
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Response, BackgroundTasks
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from pydantic import BaseModel, Field
@@ -9,14 +10,13 @@ import time
 import asyncio
 import json
 from fastapi.responses import JSONResponse
-from sqlalchemy import func
 import uuid
 
 from src.services import ai_assistant
 from src.services import assistant
-from src.core.deps import get_db, get_current_user
+from src.core.deps import get_db, get_current_user, get_async_db, get_current_user_async
 from src.models.user import User
-from src.models.assistant import AssistantMessage, ConceptExplanation
+from src.models.assistant import ConceptExplanation
 from src.schemas.assistant import (
     PaperAnalysisRequest, PaperAnalysisResponse, 
     SummaryRequest, SummaryResponse,
@@ -32,6 +32,7 @@ from src.services import ai_settings as ai_settings_service
 from src.services import paper as paper_service
 from src.services.ai_assistant_fixed import AIProvider
 from src.core.config import settings
+from src.utils.sse import sse_response
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -395,6 +396,24 @@ async def get_available_providers():
     
     return providers 
 
+@router.get("/llm-cache/stats", response_model=Dict[str, Any])
+async def get_llm_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    获取LLM响应缓存的命中统计
+    """
+    from src.services.llm_cache import llm_cache
+    
+    return llm_cache.get_stats()
+
+@router.get("/llm-router/stats", response_model=Dict[str, Any])
+async def get_llm_router_stats(current_user: User = Depends(get_current_user)):
+    """
+    获取各AI提供商的延迟、错误率和熔断状态
+    """
+    from src.services.llm_router import llm_router
+    
+    return llm_router.get_stats()
+
 class ResearchGap(BaseModel):
     title: str = Field(..., description="研究空白的标题")
     description: str = Field(..., description="研究空白的详细描述")
@@ -928,26 +947,41 @@ async def analyze_domain_research_problems(
 # 会话管理路由
 @router.get("/sessions", response_model=List[SessionSummary])
 async def get_user_sessions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     获取当前用户的会话列表
+
+    下一页游标通过 X-Next-Cursor 响应头返回，include_total=true 时总数通过 X-Total-Count 返回
     """
-    from src.services.assistant import get_sessions
+    from src.services.assistant import get_sessions_async, get_session_message_counts_async
+    from src.services.pagination import InvalidCursorError
     from src.schemas.assistant import AssistantType, SessionSummary
     
-    sessions = get_sessions(db, current_user.id, skip, limit, active_only)
+    try:
+        sessions, total, next_cursor = await get_sessions_async(
+            db, current_user.id, skip, limit, active_only, cursor=cursor, include_total=include_total
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    
+    # 一次查询统计所有会话的消息数量
+    message_counts = await get_session_message_counts_async(db, [session.id for session in sessions])
     
-    # 计算每个会话的消息数量
     session_summaries = []
     for session in sessions:
-        message_count = db.query(func.count(AssistantMessage.id)).filter(
-            AssistantMessage.session_id == session.id
-        ).scalar()
+        message_count = message_counts.get(session.id, 0)
         
         summary = SessionSummary(
             id=session.id,
@@ -965,16 +999,16 @@ async def get_user_sessions(
 @router.post("/sessions", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_new_session(
     session_data: SessionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     创建新的会话
     """
-    from src.services.assistant import create_session
+    from src.services.assistant import create_session_async
     from src.schemas.assistant import SessionResponse, AssistantType
     
-    db_session = create_session(db, current_user.id, session_data)
+    db_session = await create_session_async(db, current_user.id, session_data)
     
     # 创建会话响应
     session_response = SessionResponse(
@@ -998,16 +1032,16 @@ async def create_new_session(
 async def get_session_detail(
     session_id: str,
     message_limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     获取会话详情，包括消息历史
     """
-    from src.services.assistant import get_session_with_messages
+    from src.services.assistant import get_session_with_messages_async
     from src.schemas.assistant import MessageRole, AssistantType, MessageResponse, SessionResponse
     
-    session = get_session_with_messages(db, session_id, current_user.id, message_limit)
+    session = await get_session_with_messages_async(db, session_id, current_user.id, message_limit)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1050,16 +1084,16 @@ async def get_session_detail(
 async def update_session_info(
     session_id: str,
     session_data: SessionUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     更新会话信息
     """
-    from src.services.assistant import update_session
+    from src.services.assistant import update_session_async
     from src.schemas.assistant import SessionResponse, AssistantType
     
-    db_session = update_session(db, session_id, current_user.id, session_data)
+    db_session = await update_session_async(db, session_id, current_user.id, session_data)
     if not db_session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1088,18 +1122,18 @@ async def update_session_info(
 async def delete_user_session(
     session_id: str,
     hard_delete: bool = False,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     删除会话
     """
-    from src.services.assistant import delete_session, hard_delete_session
+    from src.services.assistant import delete_session_async, hard_delete_session_async
     
     if hard_delete:
-        success = hard_delete_session(db, session_id, current_user.id)
+        success = await hard_delete_session_async(db, session_id, current_user.id)
     else:
-        success = delete_session(db, session_id, current_user.id)
+        success = await delete_session_async(db, session_id, current_user.id)
     
     if not success:
         raise HTTPException(
@@ -1114,23 +1148,23 @@ async def get_session_messages(
     session_id: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     获取会话的消息列表
     """
-    from src.services.assistant import get_session, get_messages
+    from src.services.assistant import get_session_async, get_messages_async
     from src.schemas.assistant import MessageRole, MessageResponse
     
-    session = get_session(db, session_id, current_user.id)
+    session = await get_session_async(db, session_id, current_user.id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="会话不存在或无权访问"
         )
     
-    db_messages = get_messages(db, session_id, skip, limit)
+    db_messages = await get_messages_async(db, session_id, skip, limit)
     
     # 转换消息列表
     message_responses = []
@@ -1148,6 +1182,27 @@ async def get_session_messages(
     
     return message_responses
 
+@router.post("/chat/stream")
+async def stream_chat(
+    chat: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    通过SSE流式返回助手回复
+    
+    未指定session_id时创建新会话。用户消息立即保存，逐段推送 delta 事件，
+    回复完整生成后保存为助手消息并推送 done 事件（包含会话ID和消息ID）。
+    """
+    prepared = await assistant.prepare_chat_async(db, current_user.id, chat)
+    if prepared is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="会话不存在或无权访问"
+        )
+    session, messages = prepared
+    return sse_response(assistant.stream_chat_reply(session.id, messages))
+
 # 创新点生成请求模型
 class InnovationIdeasRequest(BaseModel):
     research_topic: str = Field(..., description="研究主题")
@@ -3,7 +3,9 @@ from typing import List, Optional, Dict, Any, Union
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query, Response, Body, Request
 from fastapi.responses import StreamingResponse, FileResponse
 from starlette.background import BackgroundTask
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 import json
 from datetime import datetime, date
 import io
@@ -13,11 +15,16 @@ import tempfile
 import re
 import traceback
 
-from src.core.deps import get_db, get_current_user
+from src.core.deps import get_db, get_current_user, get_async_db, get_current_user_async
 from src.models.user import User
 from src.models.paper import Paper, Tag, Note, paper_tags, paper_categories, Folder, Category, Annotation
+from src.core.config import settings
 from src.services import paper as paper_service
 from src.services import ai_assistant as assistant_service
+from src.services import analysis_queue, semantic_index
+from src.services.progress_bus import progress_bus, analysis_channel, publish_analysis_event
+from src.services.pagination import InvalidCursorError
+from src.db.session import AsyncSessionLocal
 from src.schemas.paper import (
     PaperCreate, PaperUpdate, PaperResponse, 
     TagCreate, TagResponse, 
@@ -29,6 +36,7 @@ from src.schemas.paper import (
     PaperImportDoi,
     PaperImportArxiv,
     PapersListResponse,
+    SemanticSearchResponse,
     PaperTagsUpdate,
     AnnotationCreate,
     AnnotationUpdate,
@@ -47,6 +55,7 @@ from src.schemas.paper import (
     TagUpdate
 )
 from src.utils.file_utils import save_uploaded_file, get_pdf_content, create_thumbnail
+from src.utils.sse import SSE_HEADERS, format_sse_event
 
 router = APIRouter(prefix="/papers", tags=["papers"])
 
@@ -192,14 +201,15 @@ async def upload_paper(
             "source": "upload",  # 设置为上传类型
             "has_content": bool(paper.content),  # 检查是否有内容
             "has_file": bool(paper.file_path),  # 检查是否有文件
-            "page_count": None,  # 默认为None
+            "page_count": getattr(paper, 'page_count', None),
             "metadata": paper.paper_metadata if hasattr(paper, 'paper_metadata') and paper.paper_metadata else {},
             "is_favorite": paper.is_favorite,
             "folder_id": paper.folder_id,  # 使用实际文件夹ID
             "folder_name": None,  # 默认为None
             "categories": [],  # 默认为空列表
             "analysis_status": None,  # 默认为None
-            "analysis_progress": paper.analysis_progress if hasattr(paper, 'analysis_progress') else 0
+            "analysis_progress": paper.analysis_progress if hasattr(paper, 'analysis_progress') else 0,
+            "duplicate_of": getattr(paper, 'duplicate_of', None)  # 用户库中已有相同文件时提示
         }
         
         return response_data
@@ -278,17 +288,52 @@ async def import_paper_from_arxiv(
             detail=f"从arXiv导入论文失败: {str(e)}"
         )
 
+def _paper_list_item(paper: Paper, score: Optional[float] = None) -> Dict[str, Any]:
+    """论文列表项（论文对象只加载了列表投影中的列，不能访问正文等大字段）"""
+    return {
+        "id": paper.id,
+        "title": paper.title,
+        "abstract": paper.abstract,
+        "authors": paper.authors or [],
+        "publication_date": paper.publication_date,
+        "journal": paper.journal,
+        "conference": paper.conference,
+        "doi": paper.doi,
+        "url": paper.url,
+        "tags": [tag.name for tag in paper.tags],
+        "notes": "",  # 列表不返回笔记
+        "owner_id": paper.owner_id,
+        "created_at": paper.created_at,
+        "updated_at": paper.updated_at,
+        "file_path": paper.file_path,
+        "source": paper.source or "manual",
+        "has_content": paper.has_content,
+        "has_file": paper.has_file,
+        "page_count": None,
+        "metadata": paper.paper_metadata or {},
+        "is_favorite": paper.is_favorite or False,
+        "folder_id": paper.folder_id,
+        "folder_name": paper.folder.name if paper.folder else None,
+        "categories": [{"id": cat.id, "name": cat.name} for cat in paper.categories],
+        "analysis_status": paper.analysis_status,
+        "analysis_progress": paper.analysis_progress or 0,
+        "search_snippet": getattr(paper, 'search_snippet', None),
+        "relevance_score": score
+    }
+
 @router.get("/", response_model=PapersListResponse)
 async def list_papers(
     query: Optional[str] = None,
     tags: Optional[str] = None,
     favorite: Optional[bool] = None,
-    sort_by: Optional[str] = "updated_at",
+    sort_by: Optional[str] = "updated_at",  # 可选relevance（按检索相关度）
     sort_order: Optional[str] = "desc",
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,  # 上一页返回的next_cursor，传入时忽略page
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     获取用户的论文列表
@@ -297,55 +342,79 @@ async def list_papers(
     tag_list = tags.split(",") if tags else None
     
     # 调用服务函数
-    papers, total = paper_service.get_user_papers(
-        db,
-        current_user.id,
-        query=query,
-        tags=tag_list,
-        favorite=favorite,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        skip=(page - 1) * per_page,
-        limit=per_page
-    )
+    try:
+        papers, total, total_is_estimate, next_cursor = await paper_service.get_user_papers_async(
+            db,
+            current_user.id,
+            query=query,
+            tags=tag_list,
+            favorite=favorite,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            skip=(page - 1) * per_page,
+            limit=per_page,
+            cursor=cursor,
+            include_total=include_total
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await paper_service.attach_search_snippets_async(db, papers, query)
     
     # 转换为API响应格式
-    paper_responses = []
-    for paper in papers:
-        paper_responses.append({
-            "id": paper.id,
-            "title": paper.title,
-            "abstract": paper.abstract,
-            "authors": paper.authors if hasattr(paper, 'authors') and paper.authors else [],
-            "publication_date": paper.publication_date,
-            "journal": paper.journal,
-            "conference": paper.conference,
-            "doi": paper.doi,
-            "url": paper.url,
-            "tags": [tag.name for tag in paper.tags] if hasattr(paper, 'tags') and paper.tags else [],
-            "notes": paper.notes if hasattr(paper, 'notes') and isinstance(paper.notes, str) else "",
-            "owner_id": paper.owner_id,
-            "created_at": paper.created_at,
-            "updated_at": paper.updated_at,
-            "file_path": paper.file_path,
-            "source": paper.source if hasattr(paper, 'source') and paper.source else "manual",
-            "has_content": hasattr(paper, 'has_content') and paper.has_content if hasattr(paper, 'has_content') else bool(paper.content),
-            "has_file": hasattr(paper, 'has_file') and paper.has_file if hasattr(paper, 'has_file') else bool(paper.file_path),
-            "page_count": paper.page_count if hasattr(paper, 'page_count') else None,
-            "metadata": paper.paper_metadata if hasattr(paper, 'paper_metadata') and paper.paper_metadata else {},
-            "is_favorite": paper.is_favorite if hasattr(paper, 'is_favorite') else False,
-            "folder_id": paper.folder_id if hasattr(paper, 'folder_id') else None,
-            "folder_name": paper.folder.name if hasattr(paper, 'folder') and paper.folder else None,
-            "categories": [{"id": cat.id, "name": cat.name} for cat in paper.categories] if hasattr(paper, 'categories') and paper.categories else [],
-            "analysis_status": paper.analysis_status if hasattr(paper, 'analysis_status') else None,
-            "analysis_progress": paper.analysis_progress if hasattr(paper, 'analysis_progress') else 0
-        })
+    paper_responses = [_paper_list_item(paper) for paper in papers]
     
     return {
         "papers": paper_responses,
         "total": total,
+        "total_is_estimate": total_is_estimate,
         "page": page,
-        "per_page": per_page
+        "per_page": per_page,
+        "next_cursor": next_cursor
+    }
+
+@router.get("/search/semantic", response_model=SemanticSearchResponse)
+async def semantic_search_papers(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("hybrid", regex="^(hybrid|semantic)$"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    语义检索论文库（hybrid：向量相似度与全文检索融合排序）
+    """
+    if not semantic_index.is_available():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="语义检索未启用")
+    
+    results = await paper_service.semantic_search_papers_async(db, current_user.id, q, limit=limit, mode=mode)
+    return {
+        "papers": [_paper_list_item(paper, score) for paper, score in results],
+        "query": q,
+        "mode": mode
+    }
+
+@router.get("/{paper_id}/similar", response_model=SemanticSearchResponse)
+async def get_similar_papers(
+    paper_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    获取与指定论文内容最相似的论文
+    """
+    if not semantic_index.is_available():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="语义检索未启用")
+    
+    paper = await paper_service.get_paper_by_id_async(db, paper_id, current_user.id)
+    if not paper:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="论文不存在")
+    
+    results = await paper_service.get_similar_papers_async(db, current_user.id, paper_id, limit=limit)
+    return {
+        "papers": [_paper_list_item(item, score) for item, score in results],
+        "query": None,
+        "mode": "similar"
     }
 
 @router.get("/tags")
@@ -362,22 +431,20 @@ async def get_user_tags(
 @router.get("/{paper_id}", response_model=PaperResponse)
 async def get_paper(
     paper_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     获取论文详情
     """
-    paper = paper_service.get_paper_by_id(db, paper_id, current_user.id)
+    # 异步查询总是读取数据库中的最新进度
+    paper = await paper_service.get_paper_by_id_async(db, paper_id, current_user.id)
     if not paper:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="论文未找到"
         )
     
-    # 确保刷新数据库会话以获取最新进度
-    db.refresh(paper)
-    
     # 构建符合PaperResponse的响应对象
     response_data = {
         "id": paper.id,
@@ -915,14 +982,19 @@ async def delete_note(
 @router.get("/{paper_id}/analysis")
 async def get_paper_analysis(
     paper_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     获取论文分析结果
     """
     try:
-        paper = db.query(Paper).filter(Paper.id == paper_id, Paper.owner_id == current_user.id).first()
+        result = await db.execute(
+            select(Paper)
+            .options(selectinload(Paper.experiments))
+            .where(Paper.id == paper_id, Paper.owner_id == current_user.id)
+        )
+        paper = result.scalars().first()
         if not paper:
             raise HTTPException(status_code=404, detail="论文不存在")
         
@@ -1070,6 +1142,85 @@ async def get_paper_analysis(
         print(f"异常堆栈: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"获取论文分析失败: {str(e)}")
 
+@router.get("/{paper_id}/analysis/job")
+async def get_paper_analysis_job(
+    paper_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取论文最近一次分析任务的状态（排队、执行中、重试次数、已完成阶段、死信原因）
+    """
+    job = analysis_queue.get_latest_job(db, paper_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="该论文没有分析任务")
+    return analysis_queue.job_to_dict(job)
+
+@router.get("/{paper_id}/analysis/events")
+async def stream_paper_analysis_events(
+    paper_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    通过SSE实时推送论文分析进度，取代轮询论文详情
+    
+    连接建立后先发送一次当前状态快照，之后推送各阶段完成事件（携带该阶段的部分结果），
+    分析完成或失败后关闭连接。
+    """
+    owned = await db.scalar(
+        select(Paper.id).where(Paper.id == paper_id, Paper.owner_id == current_user.id)
+    )
+    if not owned:
+        raise HTTPException(status_code=404, detail="论文不存在")
+    
+    async def read_status():
+        # 只读取状态列，不加载论文全文
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(
+                select(Paper.analysis_status, Paper.analysis_progress).where(Paper.id == paper_id)
+            )).first()
+        return row if row else (None, 0)
+    
+    async def event_stream():
+        async with progress_bus.subscribe(analysis_channel(paper_id)) as events:
+            # 先订阅再读取快照，避免丢失两者之间发布的事件
+            analysis_status, analysis_progress = await read_status()
+            yield format_sse_event({
+                "type": "snapshot",
+                "paper_id": paper_id,
+                "status": analysis_status,
+                "progress": analysis_progress or 0
+            })
+            if analysis_status != "processing":
+                return
+            
+            async for event in events:
+                if event is None:
+                    # 没有事件时检查一次数据库中的状态：发布方与总线不互通（如进程内总线配合独立worker）
+                    # 或结束事件丢失时，连接仍能正常结束
+                    analysis_status, analysis_progress = await read_status()
+                    if analysis_status != "processing":
+                        yield format_sse_event({
+                            "type": analysis_status if analysis_status in ("completed", "failed") else "snapshot",
+                            "paper_id": paper_id,
+                            "status": analysis_status,
+                            "progress": analysis_progress or 0
+                        })
+                        return
+                    # 心跳注释，防止代理断开空闲连接
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse_event(event)
+                if event.get("type") in ("completed", "failed"):
+                    return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @router.post("/{paper_id}/analyze", response_model=PaperAnalysisResponse)
 async def analyze_paper(
     paper_id: str,
@@ -1114,16 +1265,34 @@ async def analyze_paper(
         
         print(f"分析参数: extract_core_content={extract_core_content}, analyze_experiments={analyze_experiments}, analyze_references={analyze_references}")
         
-        # 调用分析函数，传递参数
-        paper = await paper_analyzer.analyze_paper(
-            db, 
-            paper_id, 
-            current_user.id,
-            extract_core_content=extract_core_content,
-            analyze_experiments=analyze_experiments,
-            analyze_references=analyze_references
-        )
-        print(f"paper_analyzer.analyze_paper调用成功: paper_id={paper_id}")
+        if settings.ANALYSIS_QUEUE_ENABLED:
+            # 提交到持久化任务队列，由独立的worker进程执行，请求立即返回
+            paper = paper_service.get_paper_by_id(db, paper_id, current_user.id)
+            if not paper:
+                raise ValueError("论文不存在或无权访问")
+            if not paper.content:
+                raise ValueError("论文内容为空，无法进行分析")
+            analysis_queue.enqueue_analysis_job(
+                db,
+                paper,
+                current_user.id,
+                options={
+                    "extract_core_content": extract_core_content,
+                    "analyze_experiments": analyze_experiments,
+                    "analyze_references": analyze_references,
+                }
+            )
+        else:
+            # 调用分析函数，传递参数
+            paper = await paper_analyzer.analyze_paper(
+                db, 
+                paper_id, 
+                current_user.id,
+                extract_core_content=extract_core_content,
+                analyze_experiments=analyze_experiments,
+                analyze_references=analyze_references
+            )
+            print(f"paper_analyzer.analyze_paper调用成功: paper_id={paper_id}")
         
         print(f"开始构建分析响应对象: paper_id={paper_id}")
         
@@ -1236,11 +1405,92 @@ async def analyze_paper(
         except Exception as status_error:
             print(f"在路由处理器中更新分析状态失败: paper_id={paper_id}, error={str(status_error)}")
         
+        publish_analysis_event(paper_id, "failed", status="failed", error=str(e))
+        
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=error_msg
         )
 
+# 外部论文搜索参数校验
+def _prepare_external_search_params(search_request: ExternalSearchRequest) -> Dict[str, Any]:
+    """
+    校验外部搜索请求并返回 search_papers 的关键字参数
+    """
+    # 验证搜索查询是否为空
+    if not search_request.query.strip() and not search_request.domain:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="搜索关键词不能为空，请提供有效的查询词或领域"
+        )
+    
+    # 确保sources是有效的枚举值
+    valid_sources = []
+    if not search_request.sources or len(search_request.sources) == 0:
+        # 如果没有指定源，使用默认值（已移除CiteSeerX）
+        print("未指定搜索源，使用默认值 [arxiv, semanticscholar, core, openalex]")
+        valid_sources = [
+            SearchSourceEnum.ARXIV, 
+            SearchSourceEnum.SEMANTICSCHOLAR,
+            SearchSourceEnum.CORE,
+            SearchSourceEnum.OPENALEX
+        ]
+    else:
+        for source in search_request.sources:
+            if isinstance(source, str):
+                try:
+                    # 尝试将字符串转换为枚举值
+                    valid_source = SearchSourceEnum(source.lower())
+                    valid_sources.append(valid_source)
+                except ValueError:
+                    print(f"忽略无效的搜索源: {source}")
+            else:
+                valid_sources.append(source)
+    
+    if not valid_sources:
+        # 默认使用四个主要数据库（已移除CiteSeerX）
+        valid_sources = [
+            SearchSourceEnum.ARXIV, 
+            SearchSourceEnum.SEMANTICSCHOLAR,
+            SearchSourceEnum.CORE,
+            SearchSourceEnum.OPENALEX
+        ]
+    
+    print(f"使用有效搜索源: {valid_sources}")
+    
+    # 设置合理的默认值
+    limit = min(search_request.limit or 10, 50)  # 限制最大结果数为50
+    offset = max(search_request.offset or 0, 0)  # 确保偏移量非负
+    
+    # 检查年份范围是否合理
+    year_from = search_request.year_from
+    year_to = search_request.year_to
+    current_year = datetime.now().year
+    
+    if year_from and year_from > current_year:
+        print(f"起始年份 {year_from} 超过当前年份，重置为None")
+        year_from = None
+    
+    if year_to and year_to > current_year:
+        print(f"结束年份 {year_to} 超过当前年份，重置为当前年份")
+        year_to = current_year
+        
+    if year_from and year_to and year_from > year_to:
+        print(f"起始年份 {year_from} 大于结束年份 {year_to}，交换两个值")
+        year_from, year_to = year_to, year_from
+    
+    return {
+        "query": search_request.query,
+        "sources": valid_sources,
+        "limit": limit,
+        "offset": offset,
+        "year_from": year_from,
+        "year_to": year_to,
+        "full_text": search_request.full_text,
+        "domain": search_request.domain,
+        "venues": search_request.venues
+    }
+
 # 外部论文搜索API
 @router.post("/search/external", response_model=ExternalSearchResponse)
 async def search_external_papers(
@@ -1255,80 +1505,10 @@ async def search_external_papers(
         # 记录传入的搜索参数
         print(f"搜索请求参数（完整）: {search_request.dict()}")
         
-        # 验证搜索查询是否为空
-        if not search_request.query.strip() and not search_request.domain:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="搜索关键词不能为空，请提供有效的查询词或领域"
-            )
-        
-        # 确保sources是有效的枚举值
-        valid_sources = []
-        if not search_request.sources or len(search_request.sources) == 0:
-            # 如果没有指定源，使用默认值（已移除CiteSeerX）
-            print("未指定搜索源，使用默认值 [arxiv, semanticscholar, core, openalex]")
-            valid_sources = [
-                SearchSourceEnum.ARXIV, 
-                SearchSourceEnum.SEMANTICSCHOLAR,
-                SearchSourceEnum.CORE,
-                SearchSourceEnum.OPENALEX
-            ]
-        else:
-            for source in search_request.sources:
-                if isinstance(source, str):
-                    try:
-                        # 尝试将字符串转换为枚举值
-                        valid_source = SearchSourceEnum(source.lower())
-                        valid_sources.append(valid_source)
-                    except ValueError:
-                        print(f"忽略无效的搜索源: {source}")
-                else:
-                    valid_sources.append(source)
-        
-        if not valid_sources:
-            # 默认使用四个主要数据库（已移除CiteSeerX）
-            valid_sources = [
-                SearchSourceEnum.ARXIV, 
-                SearchSourceEnum.SEMANTICSCHOLAR,
-                SearchSourceEnum.CORE,
-                SearchSourceEnum.OPENALEX
-            ]
-        
-        print(f"使用有效搜索源: {valid_sources}")
-        
-        # 设置合理的默认值
-        limit = min(search_request.limit or 10, 50)  # 限制最大结果数为50
-        offset = max(search_request.offset or 0, 0)  # 确保偏移量非负
-        
-        # 检查年份范围是否合理
-        year_from = search_request.year_from
-        year_to = search_request.year_to
-        current_year = datetime.now().year
-        
-        if year_from and year_from > current_year:
-            print(f"起始年份 {year_from} 超过当前年份，重置为None")
-            year_from = None
-        
-        if year_to and year_to > current_year:
-            print(f"结束年份 {year_to} 超过当前年份，重置为当前年份")
-            year_to = current_year
-            
-        if year_from and year_to and year_from > year_to:
-            print(f"起始年份 {year_from} 大于结束年份 {year_to}，交换两个值")
-            year_from, year_to = year_to, year_from
+        search_params = _prepare_external_search_params(search_request)
         
         # 执行搜索
-        results = await paper_search_service.search_papers(
-            query=search_request.query,
-            sources=valid_sources,
-            limit=limit,
-            offset=offset,
-            year_from=year_from,
-            year_to=year_to,
-            full_text=search_request.full_text,
-            domain=search_request.domain,
-            venues=search_request.venues
-        )
+        results = await paper_search_service.search_papers(**search_params)
         
         return results
     except HTTPException:
@@ -1343,6 +1523,36 @@ async def search_external_papers(
             detail=error_detail
         )
 
+# 外部论文流式搜索API
+@router.post("/search/external/stream")
+async def search_external_papers_stream(
+    search_request: ExternalSearchRequest
+):
+    """
+    在外部学术数据库中流式搜索论文
+    
+    以NDJSON格式（每行一个JSON对象）返回：每个来源完成后立即输出一个batch事件，
+    包含该来源去重后的新结果；所有来源结束后输出summary事件，包含融合排序后的最终结果。
+    """
+    from src.services.paper_search import paper_search_service
+    
+    print(f"流式搜索请求参数（完整）: {search_request.dict()}")
+    search_params = _prepare_external_search_params(search_request)
+    
+    async def event_stream():
+        try:
+            async for event in paper_search_service.search_papers_stream(**search_params):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"外部论文流式搜索失败: {str(e)}\n{traceback.format_exc()}")
+            yield json.dumps({"event": "error", "source": None, "detail": f"外部论文搜索失败: {str(e)}"}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 文件夹管理
 @router.post("/folders", response_model=FolderResponse)
 async def create_folder(
@@ -27,6 +27,8 @@ from src.services import writing as writing_service
 from src.core.deps import get_db, get_current_user
 from src.models.user import User
 from src.services import ai_settings as ai_settings_service
+from src.services.pagination import decode_cursor, InvalidCursorError
+from src.utils.sse import sse_response
 
 router = APIRouter(prefix="/writing", tags=["writing"])
 
@@ -92,24 +94,35 @@ async def get_projects(
     include_collaborated: bool = True,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,  # 上一页返回的next_cursor，传入时忽略skip
+    include_total: bool = True,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取用户的写作项目列表
     """
+    if cursor:
+        # 游标无效时返回400，而不是被下面的兜底处理吞掉
+        try:
+            decode_cursor(cursor, sort_by, sort_order.lower() == "desc")
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
     try:
         logging.info(f"用户 {current_user.id} 请求获取项目列表")
         # 获取项目列表
-        projects = writing_service.get_projects(
+        projects, total, total_is_estimate, next_cursor = writing_service.get_projects_page(
             db=db,
             user_id=current_user.id,
-            skip=skip,
             limit=limit,
+            cursor=cursor,
+            skip=skip,
             query=query,
             sort_by=sort_by,
             sort_order=sort_order,
-            include_collaborated=include_collaborated
+            include_collaborated=include_collaborated,
+            include_total=include_total
         )
         
         # 确保所有项目都有必要的属性，以便前端正确显示
@@ -145,14 +158,14 @@ async def get_projects(
                 # 如果metadata存在但不是字典，则重置为空字典
                 setattr(project, 'metadata', {})
         
-        total = len(projects)  # 简化计算，实际应使用count查询
-        
-        logging.info(f"成功获取到 {total} 个项目")
+        logging.info(f"成功获取到 {len(projects)} 个项目，总数 {total}")
         return {
             "items": projects,
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "page": skip // limit + 1 if limit > 0 else 1,
-            "size": limit
+            "size": limit,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         stack_trace = traceback.format_exc()
@@ -662,6 +675,55 @@ async def improve_section_content(
             detail=f"改进内容失败: {str(e)}"
         )
 
+@router.post("/sections/{section_id}/generate/stream")
+async def stream_section_content(
+    section_id: str = Path(...),
+    data: SectionContentGenerationRequest = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    通过SSE流式生成章节内容
+    
+    逐段推送 delta 事件，生成结束后把完整内容追加到章节并推送 done 事件；出错时推送 error 事件。
+    """
+    events = writing_service.stream_section_content(
+        db=db,
+        section_id=section_id,
+        user_id=current_user.id,
+        prompt=data.prompt,
+        paper_id=data.paper_id
+    )
+    if events is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="章节未找到或无权访问"
+        )
+    return sse_response(events)
+
+@router.post("/sections/{section_id}/improve/stream")
+async def stream_improve_section_content(
+    section_id: str = Path(...),
+    data: SectionContentImprovementRequest = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    通过SSE流式改进章节内容，生成结束后用完整结果替换章节内容
+    """
+    events = writing_service.stream_improve_writing(
+        db=db,
+        section_id=section_id,
+        user_id=current_user.id,
+        improvement_type=data.improvement_type
+    )
+    if events is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="章节未找到或无权访问"
+        )
+    return sse_response(events)
+
 # 项目导出接口
 @router.get("/projects/{project_id}/export", response_model=ProjectExportResponse)
 async def export_project(
@@ -979,6 +1041,34 @@ async def generate_content(
             detail=f"生成内容失败: {str(e)}"
         )
 
+@router.post("/generate-content/stream")
+async def stream_generate_content(
+    request: ContentGenerationRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    通过SSE流式生成论文内容
+    
+    逐段推送 delta 事件，结束时推送包含完整内容和改进建议的 done 事件。
+    """
+    logging.info(f"用户 {current_user.id} 请求流式生成论文内容: {request.section_type}")
+    
+    from src.services.ai_assistant_fixed import get_assistant
+    
+    events = get_assistant().stream_paper_section(
+        section_type=request.section_type,
+        writing_style=request.writing_style,
+        topic=request.topic,
+        research_problem=request.research_problem,
+        method_feature=request.method_feature,
+        modeling_target=request.modeling_target,
+        improvement=request.improvement,
+        key_component=request.key_component,
+        impact=request.impact,
+        additional_context=request.additional_context
+    )
+    return sse_response(events)
+
 @router.get("/projects/{project_id}/debug")
 async def get_project_debug(
     project_id: str = Path(...),
@@ -51,7 +51,12 @@ class Settings(BaseSettings):
                         userpass = f"{user}:{password}"
                     return f"{protocol}://{userpass}@{hostpart}"
         return v
-    
+
+    # 异步数据库连接（留空时由DATABASE_URL自动转换为asyncpg/aiosqlite驱动）
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "20"))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+
     # 安全设置
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
@@ -124,6 +129,81 @@ class Settings(BaseSettings):
         }
     }
     
+    # LLM HTTP连接池设置（每个提供商一个共享客户端）
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "False").lower() == "true"
+
+    # LLM token预算设置
+    LLM_CONTEXT_WINDOW: int = int(os.getenv("LLM_CONTEXT_WINDOW", "0"))  # 覆盖模型的上下文窗口，0为按模型取值
+    LLM_MAX_PROMPT_TOKENS: int = int(os.getenv("LLM_MAX_PROMPT_TOKENS", "12000"))  # 单次请求提示词的token上限，0为只受窗口限制
+
+    # LLM响应缓存设置
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "memory")  # 可选: memory, redis
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))  # 秒
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    LLM_CACHE_MAX_BYTES: int = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    LLM_CACHE_MAX_TEMPERATURE: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.5"))  # 高于此温度不缓存
+    LLM_SINGLEFLIGHT_ENABLED: bool = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "True").lower() == "true"  # 合并并发的相同请求
+
+    # LLM多提供商路由设置（配置了至少两个提供商的API密钥时生效）
+    LLM_ROUTER_ENABLED: bool = os.getenv("LLM_ROUTER_ENABLED", "True").lower() == "true"
+    LLM_ROUTER_PROVIDERS: str = os.getenv("LLM_ROUTER_PROVIDERS", "deepseek,openai,claude")  # 参与路由的提供商，顺序为同等条件下的优先顺序
+    LLM_ROUTER_WEIGHTS: str = os.getenv("LLM_ROUTER_WEIGHTS", "")  # 流量权重，如 deepseek:3,openai:1；未列出的为1
+    LLM_ROUTER_TASK_PROVIDERS: str = os.getenv("LLM_ROUTER_TASK_PROVIDERS", "")  # 按任务类型限定提供商，如 code:openai|claude;analysis:deepseek|openai
+    LLM_ROUTER_EWMA_ALPHA: float = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.3"))  # 延迟和错误率的平滑系数
+    LLM_ROUTER_FAILURE_THRESHOLD: int = int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", "3"))  # 连续失败多少次后熔断
+    LLM_ROUTER_COOLDOWN: float = float(os.getenv("LLM_ROUTER_COOLDOWN", "60"))  # 熔断时长（秒）
+    LLM_ROUTER_MAX_ATTEMPTS: int = int(os.getenv("LLM_ROUTER_MAX_ATTEMPTS", "4"))  # 单次调用在各提供商之间的总尝试次数
+    LLM_ROUTER_TIMEOUT: float = float(os.getenv("LLM_ROUTER_TIMEOUT", "90"))  # 单次尝试的读取超时（秒），超时即切换提供商
+
+    # 论文分析阶段并发设置
+    ANALYSIS_STAGE_CONCURRENCY: int = int(os.getenv("ANALYSIS_STAGE_CONCURRENCY", "4"))  # 单篇论文同时执行的阶段数
+    ANALYSIS_GLOBAL_STAGE_CONCURRENCY: int = int(os.getenv("ANALYSIS_GLOBAL_STAGE_CONCURRENCY", "12"))  # 全进程同时执行的阶段数
+    ANALYSIS_CONTEXT_RETRIEVAL: bool = os.getenv("ANALYSIS_CONTEXT_RETRIEVAL", "True").lower() == "true"  # 按阶段检索相关分块，关闭时使用正则截取核心内容
+    ANALYSIS_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("ANALYSIS_CONTEXT_TOKEN_BUDGET", "3000"))  # 每个阶段上下文的token预算
+    ANALYSIS_MAP_REDUCE_ENABLED: bool = os.getenv("ANALYSIS_MAP_REDUCE_ENABLED", "True").lower() == "true"  # 超长论文分片摘录后再汇总
+    ANALYSIS_MAP_REDUCE_THRESHOLD: int = int(os.getenv("ANALYSIS_MAP_REDUCE_THRESHOLD", "100000"))  # 超过该字符数时使用map-reduce模式
+    ANALYSIS_MAP_CHUNK_TOKENS: int = int(os.getenv("ANALYSIS_MAP_CHUNK_TOKENS", "6000"))  # 每个片段的token数
+    ANALYSIS_MAP_CONCURRENCY: int = int(os.getenv("ANALYSIS_MAP_CONCURRENCY", "4"))  # 单篇论文同时摘录的片段数
+
+    # 研究助手多轮生成设置
+    ASSISTANT_FANOUT_CONCURRENCY: int = int(os.getenv("ASSISTANT_FANOUT_CONCURRENCY", "4"))  # 逐项生成（如每个研究问题的深入分析）同时执行的调用数
+    ASSISTANT_ITEM_TIMEOUT: float = float(os.getenv("ASSISTANT_ITEM_TIMEOUT", "180"))  # 单个条目（如一个创新点）各轮生成的总时限（秒），超时后使用部分结果
+
+    # 论文分析任务队列设置
+    ANALYSIS_QUEUE_ENABLED: bool = os.getenv("ANALYSIS_QUEUE_ENABLED", "True").lower() == "true"  # 关闭时在请求中直接执行分析
+    ANALYSIS_EMBEDDED_WORKER: bool = os.getenv("ANALYSIS_EMBEDDED_WORKER", "True").lower() == "true"  # 在Web进程内运行worker；部署了独立worker时设为False
+    ANALYSIS_WORKER_CONCURRENCY: int = int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", "4"))  # 每个worker进程同时执行的任务数
+    ANALYSIS_WORKER_SHUTDOWN_GRACE: float = float(os.getenv("ANALYSIS_WORKER_SHUTDOWN_GRACE", "10"))  # 停止时等待执行中任务的时间（秒），超时取消，租约过期后从断点继续
+    ANALYSIS_WORKER_POLL_INTERVAL: float = float(os.getenv("ANALYSIS_WORKER_POLL_INTERVAL", "2"))  # 队列为空时的轮询间隔（秒）
+    ANALYSIS_JOB_MAX_ATTEMPTS: int = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))  # 超过后进入死信
+    ANALYSIS_JOB_RETRY_BASE_DELAY: float = float(os.getenv("ANALYSIS_JOB_RETRY_BASE_DELAY", "30"))  # 重试退避基数（秒）
+    ANALYSIS_JOB_LEASE_SECONDS: int = int(os.getenv("ANALYSIS_JOB_LEASE_SECONDS", "300"))  # 心跳超时后任务被重新入队
+    ANALYSIS_JOB_MAX_RUNNING_PER_USER: int = int(os.getenv("ANALYSIS_JOB_MAX_RUNNING_PER_USER", "2"))  # 单个用户同时执行的任务数
+    PROGRESS_BUS_BACKEND: str = os.getenv("PROGRESS_BUS_BACKEND", "")  # 可选: memory, redis；留空时使用独立worker则为redis，否则为memory
+
+    # 论文库全文检索设置
+    LIBRARY_SEARCH_TOKENIZER: str = os.getenv("LIBRARY_SEARCH_TOKENIZER", "jieba")  # 可选: jieba, bigram（中文按字二元组切分）
+    LIBRARY_SEARCH_TS_CONFIG: str = os.getenv("LIBRARY_SEARCH_TS_CONFIG", "simple")  # PostgreSQL文本搜索配置
+    LIBRARY_SEARCH_MAX_CONTENT_CHARS: int = int(os.getenv("LIBRARY_SEARCH_MAX_CONTENT_CHARS", "100000"))  # 正文参与索引的最大字符数
+
+    # 列表分页设置
+    PAGINATION_COUNT_LIMIT: int = int(os.getenv("PAGINATION_COUNT_LIMIT", "10000"))  # 总数最多精确统计到的行数，超出时返回估计值
+    PAGINATION_TOTAL_CACHE_TTL: float = float(os.getenv("PAGINATION_TOTAL_CACHE_TTL", "30"))  # 列表总数缓存时间（秒），0为不缓存
+
+    # 论文库语义检索设置
+    SEMANTIC_SEARCH_ENABLED: bool = os.getenv("SEMANTIC_SEARCH_ENABLED", "True").lower() == "true"
+    SEMANTIC_EMBEDDING_MODEL: str = os.getenv("SEMANTIC_EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+    SEMANTIC_EMBEDDING_BATCH_SIZE: int = int(os.getenv("SEMANTIC_EMBEDDING_BATCH_SIZE", "32"))
+    SEMANTIC_INDEX_DIR: str = os.getenv("SEMANTIC_INDEX_DIR", "data/semantic_index")
+    SEMANTIC_CHUNK_CHARS: int = int(os.getenv("SEMANTIC_CHUNK_CHARS", "1000"))  # 正文分块大小（字符）
+    SEMANTIC_MAX_CHUNKS_PER_PAPER: int = int(os.getenv("SEMANTIC_MAX_CHUNKS_PER_PAPER", "40"))
+    SEMANTIC_HNSW_M: int = int(os.getenv("SEMANTIC_HNSW_M", "32"))  # HNSW每个节点的邻居数
+    SEMANTIC_HNSW_EF_SEARCH: int = int(os.getenv("SEMANTIC_HNSW_EF_SEARCH", "64"))  # 查询时的候选队列长度
+
     # LLM API密钥 - 用于论文分析，根据默认提供商自动选择
     @property
     def LLM_API_KEY(self) -> str:
@@ -132,6 +212,12 @@ class Settings(BaseSettings):
             return self.AI_PROVIDERS[provider]["api_key"]
         return ""
     
+    # PDF提取设置
+    PDF_EXTRACTION_WORKERS: int = int(os.getenv("PDF_EXTRACTION_WORKERS", "2"))  # 提取进程数
+    PDF_EXTRACTION_TIMEOUT: float = float(os.getenv("PDF_EXTRACTION_TIMEOUT", "120"))  # 单个文档的提取超时（秒）
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "60"))  # 超过该页数时按页段并行提取
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "20"))  # 并行提取时每段的最少页数
+    
     # 存储设置
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024  # 20MB
@@ -179,6 +265,17 @@ class Settings(BaseSettings):
     # 全文检索配置
     SEARCH_INDEXDIR: str = "search_index"
     
+    # 外部论文检索源限流配置: rate=每秒请求数, burst=突发容量, concurrency=该源最大并发请求数
+    SEARCH_SOURCE_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+        "arxiv": {"rate": 0.34, "burst": 1, "concurrency": 1},  # arXiv要求每3秒不超过1次请求
+        "semanticscholar": {"rate": 1.0, "burst": 2, "concurrency": 2},
+        "core": {"rate": 1.0, "burst": 2, "concurrency": 2},
+        "openalex": {"rate": 8.0, "burst": 10, "concurrency": 4},
+        "default": {"rate": 2.0, "burst": 2, "concurrency": 2},
+    }
+    SEARCH_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("SEARCH_BREAKER_FAILURE_THRESHOLD", "3"))
+    SEARCH_BREAKER_RECOVERY_SECONDS: float = float(os.getenv("SEARCH_BREAKER_RECOVERY_SECONDS", "300"))
+    
     # 代理URL配置
     PROXY_URL: Optional[str] = "http://127.0.0.1:7890"
 
@@ -1,10 +1,12 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 
-from src.db.session import SessionLocal
+from src.db.session import SessionLocal, AsyncSessionLocal
 from src.core.config import settings
 from src.models.user import User
 from src.schemas.user import TokenPayload
@@ -18,20 +20,25 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+# 异步数据库会话依赖
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """获取异步数据库会话，查询不会阻塞事件循环"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # OAuth2登录表单路径
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-# 获取当前用户依赖
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
-    """获取当前用户"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的身份认证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _get_token_user_id(token: str) -> str:
+    """校验访问令牌并返回其中的用户ID"""
+    credentials_exception = _credentials_exception()
     
     try:
         payload = jwt.decode(
@@ -48,10 +55,34 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == token_data.sub).first()
+    return token_data.sub
+
+# 获取当前用户依赖
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> User:
+    """获取当前用户"""
+    user_id = _get_token_user_id(token)
+    user = db.query(User).filter(User.id == user_id).first()
+    
+    if user is None:
+        raise _credentials_exception()
+    
+    return user
+
+# 获取当前用户依赖（异步版本，与路由共用同一个异步会话）
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> User:
+    """获取当前用户（异步）"""
+    user_id = _get_token_user_id(token)
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalars().first()
     
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     return user
 
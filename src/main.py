@@ -31,7 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Type", "Content-Disposition"]
+    expose_headers=["Content-Type", "Content-Disposition", "X-Next-Cursor", "X-Total-Count"]
 )
 
 # 挂载静态文件
@@ -82,6 +82,28 @@ async def check_database_structure():
     
     logger.info("数据库检查完成")
 
+@app.on_event("startup")
+async def start_analysis_worker():
+    """未部署独立worker时在本进程内执行分析任务队列"""
+    from src.workers.analysis_worker import start_embedded_worker
+    start_embedded_worker()
+
+@app.on_event("shutdown")
+async def close_shared_resources():
+    """关闭时停止内嵌的分析worker，并释放共享的LLM HTTP连接池、检索缓存、异步数据库连接池、进度总线和PDF提取进程池"""
+    from src.workers.analysis_worker import stop_embedded_worker
+    await stop_embedded_worker()
+    from src.services.llm_client import close_llm_clients
+    from src.services.paper_search import paper_search_service
+    from src.db.session import async_engine
+    from src.services.progress_bus import progress_bus
+    from src.utils.pdf_extraction import shutdown_pool
+    await close_llm_clients()
+    await paper_search_service.cache.close()
+    await async_engine.dispose()
+    await progress_bus.close()
+    shutdown_pool()
+
 # 注册异常处理
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, JSON, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+import uuid
+
+from src.db.base import Base
+
+class AnalysisJobStatus:
+    """分析任务状态"""
+    QUEUED = "queued"        # 等待执行（包括等待重试）
+    RUNNING = "running"      # 已被worker领取
+    SUCCEEDED = "succeeded"  # 执行成功
+    DEAD = "dead"            # 重试次数耗尽，进入死信
+
+    ACTIVE = (QUEUED, RUNNING)
+
+class AnalysisJob(Base):
+    """论文分析任务模型（持久化任务队列）"""
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # worker领取任务时按状态、可执行时间和优先级筛选
+        Index("ix_analysis_jobs_claim", "status", "run_after", "priority"),
+        {'extend_existing': True},
+    )
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, nullable=False, default=AnalysisJobStatus.QUEUED)
+    priority = Column(Integer, nullable=False, default=0)  # 数值越大越优先
+    options = Column(JSON, nullable=True)  # analyze_paper的参数
+    checkpoint = Column(JSON, nullable=True)  # 已完成的阶段名列表
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # 重试退避
+    locked_by = Column(String, nullable=True)  # 领取任务的worker
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # worker最近一次心跳
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # 外键
+    paper_id = Column(String, ForeignKey("papers.id", ondelete="CASCADE"), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+
+    # 关系
+    paper = relationship("Paper")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON, Enum, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON, Enum, Boolean, Integer, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -23,7 +23,11 @@ class AssistantType(str, enum.Enum):
 class AssistantSession(Base):
     """研究助手会话模型"""
     __tablename__ = "assistant_sessions"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # 会话列表游标分页
+        Index("ix_assistant_sessions_owner_last_message", "owner_id", "last_message_at", "id"),
+        {'extend_existing': True},
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
@@ -1,5 +1,6 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Text, Table, JSON
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Text, Table, JSON, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, backref, deferred
 from sqlalchemy.sql import func
 import uuid
 
@@ -26,7 +27,16 @@ paper_categories = Table(
 class Paper(Base):
     """论文模型"""
     __tablename__ = "papers"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # 论文库全文检索
+        Index("ix_papers_search_vector", "search_vector", postgresql_using="gin"),
+        # 论文列表游标分页
+        Index("ix_papers_owner_updated", "owner_id", "updated_at", "id"),
+        Index("ix_papers_owner_created", "owner_id", "created_at", "id"),
+        # 上传时检查用户库中是否已有相同文件
+        Index("ix_papers_owner_file_hash", "owner_id", "file_hash"),
+        {'extend_existing': True},
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, index=True)
@@ -42,6 +52,7 @@ class Paper(Base):
     content = Column(Text, nullable=True)  # 提取的文本内容
     paper_metadata = Column(JSON, nullable=True)  # 附加元数据
     file_size = Column(Integer, nullable=True)  # 文件大小（字节）
+    file_hash = Column(String(64), nullable=True)  # 上传文件的SHA-256，对应 paper_files.sha256
     source = Column(String, nullable=True, default="upload")  # 论文来源：upload, url, doi, arxiv, manual
     is_favorite = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -60,6 +71,9 @@ class Paper(Base):
     analysis_progress = Column(Integer, default=0)  # 分析进度（0-100）
     analysis_date = Column(DateTime(timezone=True), nullable=True)  # 分析完成时间
     
+    # 全文检索向量（由 library_search 写入，SQLite下使用FTS5表，该列不使用）
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
+    
     # 外键
     owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"))
     folder_id = Column(String, ForeignKey("folders.id", ondelete="SET NULL"), nullable=True)  # 所属文件夹
@@ -73,6 +87,23 @@ class Paper(Base):
     experiments = relationship("Experiment", back_populates="paper")
     folder = relationship("Folder", back_populates="papers")
 
+class PaperFile(Base):
+    """按内容哈希保存的论文文件及其提取结果，多篇论文可共享同一文件"""
+    __tablename__ = "paper_files"
+    __table_args__ = {'extend_existing': True}
+
+    sha256 = Column(String(64), primary_key=True)
+    file_path = Column(String, nullable=False)
+    file_size = Column(Integer, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)  # 引用该文件的论文数，降为0时删除文件
+    content = Column(Text, nullable=True)  # 提取的文本（上传时未提取则为空）
+    file_metadata = Column(JSON, nullable=True)
+    page_count = Column(Integer, nullable=True)
+    section_offsets = Column(JSON, nullable=True)  # [{"title": 章节标题, "offset": 在正文中的字符位置}]
+    extraction_backend = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
 class Tag(Base):
     """标签模型"""
     __tablename__ = "tags"
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Text, JSON, Enum, Table
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Text, JSON, Enum, Table, Index
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
 import uuid
@@ -26,7 +26,12 @@ class ProjectStatus(enum.Enum):
 class WritingProject(Base):
     """写作项目模型"""
     __tablename__ = "writing_projects"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # 项目列表游标分页
+        Index("ix_writing_projects_owner_updated", "owner_id", "updated_at", "id"),
+        Index("ix_writing_projects_owner_created", "owner_id", "created_at", "id"),
+        {'extend_existing': True},
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=False)
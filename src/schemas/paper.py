@@ -144,6 +144,9 @@ class PaperResponse(PaperBase):
     last_read_at: Optional[datetime] = None
     analysis_status: Optional[AnalysisStatusEnum] = None
     analysis_progress: Optional[int] = 0
+    search_snippet: Optional[str] = None  # 搜索结果的高亮片段（<mark>标记命中词）
+    relevance_score: Optional[float] = None  # 语义检索得分
+    duplicate_of: Optional[str] = None  # 上传时用户库中已有相同文件的论文ID
     
     class Config:
         orm_mode = True
@@ -167,9 +170,17 @@ class PaperAnalysisResponse(PaperResponse):
 # 论文列表响应模型
 class PapersListResponse(BaseModel):
     papers: List[PaperResponse]
-    total: int
+    total: Optional[int] = None  # include_total=False 时不统计
+    total_is_estimate: bool = False  # 超过统计上限时total为估计值
     page: int
     per_page: int
+    next_cursor: Optional[str] = None  # 下一页游标，为空表示没有更多
+
+# 语义检索/相似论文响应模型
+class SemanticSearchResponse(BaseModel):
+    papers: List[PaperResponse]
+    query: Optional[str] = None
+    mode: str  # hybrid, semantic, similar
     
 # 标签操作模型
 class TagOperation(BaseModel):
@@ -55,9 +55,11 @@ class WritingProjectResponse(BaseModel):
 class WritingProjectListResponse(BaseModel):
     """写作项目列表响应模型"""
     items: List[WritingProjectResponse]
-    total: int
+    total: Optional[int] = None  # include_total=False 时不统计
+    total_is_estimate: bool = False  # 超过统计上限时total为估计值
     page: int
     size: int
+    next_cursor: Optional[str] = None  # 下一页游标，为空表示没有更多
 
 # 章节相关模型
 class WritingSectionBase(BaseModel):
@@ -4,11 +4,18 @@ import logging
 import httpx
 import uuid
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from sqlalchemy.orm import Session
 from enum import Enum
 from . import paper as paper_service
 from src.core.config import settings
+from src.services.llm_client import (
+    LLMProviderError, chat_completion_once, chat_completions_url, get_llm_client, stream_chat_completion
+)
+from src.services.llm_cache import llm_cache, make_cache_key
+from src.services.llm_router import DEFAULT_TASK, llm_router
+from src.services.singleflight import llm_singleflight
+from src.services.token_budget import count_tokens, plan_call, truncate_to_tokens
 import urllib.parse
 import asyncio
 import random
@@ -52,8 +59,10 @@ class AIAssistant:
         
         print(f"AI助手初始化成功，使用提供商: {self.provider}，模型: {self.model}")
         
-        # 创建httpx客户端用于API请求
-        self.client = httpx.AsyncClient(base_url=self.api_base)
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """当前提供商的共享HTTP客户端（进程级连接池）"""
+        return get_llm_client(self.provider)
     
     def set_provider(self, provider: str):
         self.provider = provider
@@ -84,32 +93,53 @@ class AIAssistant:
                 "status": f"failed: {str(e)}"
             }
     
-    async def generate_completion(self, prompt, max_tokens=None, temperature=0.7, verbose=False, system_prompt=None):
-        """生成完成内容，增强版本确保更有效地控制提示词长度"""
+    async def generate_completion(self, prompt, max_tokens=None, temperature=0.7, verbose=False, system_prompt=None,
+                                  task=DEFAULT_TASK):
+        """
+        生成完成内容，低温度调用会先查询响应缓存
+
+        并发的相同请求（提供商、模型、提示词和参数都相同）合并为一次API调用，共享结果。
+        配置了多个提供商时按任务类型 task 路由（见 llm_router）。
+        """
         if not prompt:
             raise ValueError("Prompt cannot be empty")
         
-        # 限制最大token数
-        if max_tokens is None:
-            # 根据提示词长度自适应token数
-            prompt_length = len(prompt)
-            max_tokens = min(8000, max(2000, int(prompt_length * 0.5)))  # 自适应调整
+        cache_key = make_cache_key(self.provider, self.model, system_prompt, prompt, temperature, max_tokens)
+        
+        if not llm_cache.should_cache(temperature):
+            llm_cache.record_bypass()
+            return await llm_singleflight.do(
+                cache_key,
+                lambda: self._generate_completion(prompt, max_tokens, temperature, verbose, system_prompt, task)
+            )
+        
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            if verbose:
+                print(f"命中LLM响应缓存: {cache_key[:12]}")
+            return cached
+        
+        # 写入缓存也在共享的调用中完成，合并的请求不会重复写入
+        async def fetch():
+            response = await self._generate_completion(prompt, max_tokens, temperature, verbose, system_prompt, task)
+            await llm_cache.set(cache_key, response)
+            return response
         
-        # 提示词长度安全检查 - 大幅降低阈值以避免代理超时
-        max_chars = 8000  # 8000字符上限，对于methodolgy设置更低
-        if len(prompt) > max_chars:
-            print(f"提示词过长({len(prompt)}字符)，截断至最大{max_chars}字符")
-            # 智能截断：保留前60%和后40%
-            front_part = int(max_chars * 0.6)
-            back_part = max_chars - front_part - 20
-            prompt = prompt[:front_part] + "\n...[内容省略]...\n" + prompt[-back_part:] if back_part > 0 else prompt[:max_chars]
+        return await llm_singleflight.do(cache_key, fetch)
+    
+    async def _generate_completion(self, prompt, max_tokens, temperature, verbose, system_prompt, task=DEFAULT_TASK):
+        """生成完成内容，按模型的上下文窗口分配输入和输出token预算"""
+        if llm_router.active:
+            return await self._generate_routed(prompt, max_tokens, temperature, verbose, system_prompt, task)
         
-        # 如果未指定max_tokens，则使用配置或默认值
-        max_tokens = max_tokens or self.max_tokens or 2000  # 默认减少到2000
+        budget = plan_call(prompt, self.provider, self.model, max_tokens, system_prompt)
+        prompt = budget.prompt
+        max_tokens = budget.max_tokens
+        prompt_tokens = budget.prompt_tokens
         
         # 记录请求信息
         if verbose:
-            print(f"生成请求：长度={len(prompt)}字符，max_tokens={max_tokens}")
+            print(f"生成请求：提示词={prompt_tokens} tokens，max_tokens={max_tokens}")
         
         # 重试策略
         max_retries = 3
@@ -138,23 +168,17 @@ class AIAssistant:
                     # 不同类型错误的处理策略
                     if "timeout" in error_msg:
                         # 超时错误 - 大幅减少请求内容
-                        new_length = int(len(prompt) * 0.4)  # 更激进，减少60%
-                        prompt = prompt[:new_length]
-                        print(f"超时错误，减少提示词长度至{new_length}字符后重试")
+                        prompt_tokens = int(prompt_tokens * 0.4)  # 更激进，减少60%
+                        prompt = truncate_to_tokens(prompt, prompt_tokens, self.model)
+                        print(f"超时错误，减少提示词至{prompt_tokens} tokens后重试")
                         max_tokens = int(max_tokens * 0.75)  # 减少生成长度
                         
                     elif "too many tokens" in error_msg or "maximum context length" in error_msg:
-                        # Token过多错误
-                        new_length = int(len(prompt) * 0.3)  # 更激进，减少70%
-                        prompt = prompt[:new_length] 
-                        print(f"Token超限，减少提示词长度至{new_length}字符后重试")
+                        # Token过多错误：窗口信息与服务端不一致，按比例收缩输入和输出
+                        prompt_tokens = int(prompt_tokens * 0.5)
+                        prompt = truncate_to_tokens(prompt, prompt_tokens, self.model)
+                        print(f"Token超限，减少提示词至{prompt_tokens} tokens后重试")
                         max_tokens = int(max_tokens * 0.6)  # 大幅减少生成长度
-                        
-                    else:
-                        # 其他错误，减少30%内容
-                        new_length = int(len(prompt) * 0.7)
-                        prompt = prompt[:new_length]
-                        print(f"遇到错误，减少提示词长度至{new_length}字符后重试")
                     
                     # 等待后重试
                     await asyncio.sleep(2)
@@ -166,6 +190,51 @@ class AIAssistant:
         # 不应该执行到这里
         return "生成失败"
 
+    async def _generate_routed(self, prompt, max_tokens, temperature, verbose, system_prompt, task):
+        """
+        在多个提供商之间路由调用
+        
+        每次尝试只请求一次，失败后立即切换到下一个候选提供商，而不是在出问题的提供商上
+        反复重试；所有候选都失败后退避一段时间再从头轮换，总尝试次数为 LLM_ROUTER_MAX_ATTEMPTS。
+        每个提供商按自己的模型重新分配token预算。
+        """
+        candidates = llm_router.candidates(task)
+        max_attempts = settings.LLM_ROUTER_MAX_ATTEMPTS
+        errors = []
+        
+        for attempt in range(max_attempts):
+            provider = candidates[attempt % len(candidates)]
+            if attempt and attempt % len(candidates) == 0:
+                wait_time = 2 ** (attempt // len(candidates)) + random.random() * 2
+                print(f"所有候选提供商均失败，等待 {wait_time:.1f} 秒后重新轮换")
+                await asyncio.sleep(wait_time)
+            
+            budget = plan_call(prompt, provider, settings.AI_PROVIDERS[provider]["model"], max_tokens, system_prompt)
+            if verbose:
+                print(f"路由到 {provider} (任务类型: {task})：提示词={budget.prompt_tokens} tokens，max_tokens={budget.max_tokens}")
+            
+            start_time = time.time()
+            try:
+                response = await chat_completion_once(
+                    provider,
+                    budget.prompt,
+                    budget.max_tokens,
+                    temperature,
+                    system_prompt=system_prompt,
+                    read_timeout=settings.LLM_ROUTER_TIMEOUT
+                )
+            except LLMProviderError as e:
+                # 400等请求本身的问题换提供商可能成功，但不计入该提供商的健康状态
+                llm_router.record_failure(provider, penalize=e.retryable or e.status_code in (401, 403))
+                errors.append(f"{provider}: {str(e)}")
+                print(f"{provider} 调用失败 (尝试 {attempt + 1}/{max_attempts}): {str(e)}")
+                continue
+            
+            llm_router.record_success(provider, task, time.time() - start_time)
+            return response
+        
+        raise Exception(f"在{max_attempts}次尝试后所有提供商均调用失败: {'; '.join(errors)}")
+
     def _preprocess_prompt(self, prompt):
         """
         预处理提示词，估算token数并在必要时进行截断
@@ -176,26 +245,17 @@ class AIAssistant:
         Returns:
             处理后的提示词和token信息
         """
-        # 粗略估算token数（按照英文1:1.5，中文1:2的比例）
-        english_char_count = sum(1 for c in prompt if ord(c) < 128)
-        chinese_char_count = len(prompt) - english_char_count
-        
-        estimated_tokens = int(english_char_count * 0.25 + chinese_char_count * 0.5)
+        budget = plan_call(prompt, self.provider, self.model)
         token_info = {
-            "estimated_tokens": estimated_tokens,
+            "estimated_tokens": count_tokens(prompt, self.model),
+            "prompt_tokens": budget.prompt_tokens,
             "prompt_length": len(prompt),
-            "english_chars": english_char_count,
-            "chinese_chars": chinese_char_count
+            "max_tokens": budget.max_tokens
         }
         
-        # 如果估计的token数超过阈值，进行截断
-        max_allowed_tokens = 6000  # 设置一个安全阈值
-        if estimated_tokens > max_allowed_tokens:
-            # 计算需要保留的比例
-            keep_ratio = max_allowed_tokens / estimated_tokens
-            truncated_prompt = self._truncate_prompt(prompt, ratio=keep_ratio)
-            print(f"提示词过长(估计{estimated_tokens}tokens)，已截断至{len(truncated_prompt)}/{len(prompt)}字符")
-            return truncated_prompt, {**token_info, "truncated": True, "truncated_length": len(truncated_prompt)}
+        if budget.truncated:
+            print(f"提示词过长({token_info['estimated_tokens']} tokens)，已截断至{budget.prompt_tokens} tokens")
+            return budget.prompt, {**token_info, "truncated": True, "truncated_length": len(budget.prompt)}
         
         return prompt, token_info
 
@@ -315,32 +375,76 @@ class AIAssistant:
                     "temperature": temperature
                 }
         
-        async with httpx.AsyncClient(timeout=120.0) as client:  # 增加超时时间到120秒
-            response = await client.post(
-                f"{api_base.rstrip('/')}/chat/completions",
-                headers=headers,
-                json=data
-            )
-            
-            if response.status_code == 200:
-                response_json = response.json()
-                if "choices" in response_json and len(response_json["choices"]) > 0:
-                    return response_json["choices"][0]["message"]["content"]
-                else:
-                    error_msg = f"OpenAI API 返回了不包含有效内容的响应: {response.text}"
-                    print(f"错误: {error_msg}")
-                    return f"API 调用出错: {error_msg}"
+        # 使用共享连接池，超时时间120秒
+        response = await get_llm_client(AIProvider.OPENAI.value).post(
+            f"{api_base.rstrip('/')}/chat/completions",
+            headers=headers,
+            json=data,
+            timeout=120.0
+        )
+        
+        if response.status_code == 200:
+            response_json = response.json()
+            if "choices" in response_json and len(response_json["choices"]) > 0:
+                return response_json["choices"][0]["message"]["content"]
             else:
-                error_msg = f"OpenAI API 调用失败，状态码: {response.status_code}, 响应: {response.text}"
+                error_msg = f"OpenAI API 返回了不包含有效内容的响应: {response.text}"
                 print(f"错误: {error_msg}")
-                
-                # 对于常见错误进行更友好的处理
-                if response.status_code == 429:
-                    return "API 服务器负载过高或达到速率限制，请稍后再试。"
-                elif response.status_code >= 500:
-                    return "API 服务器出现错误，请稍后再试。"
-                else:
-                    return f"API 调用出错: {error_msg}"
+                return f"API 调用出错: {error_msg}"
+        else:
+            error_msg = f"OpenAI API 调用失败，状态码: {response.status_code}, 响应: {response.text}"
+            print(f"错误: {error_msg}")
+            
+            # 对于常见错误进行更友好的处理
+            if response.status_code == 429:
+                return "API 服务器负载过高或达到速率限制，请稍后再试。"
+            elif response.status_code >= 500:
+                return "API 服务器出现错误，请稍后再试。"
+            else:
+                return f"API 调用出错: {error_msg}"
+        
+    def _chat_completions_url(self) -> str:
+        """chat/completions 接口地址，规范化API基础URL，防止URL路径重复"""
+        return chat_completions_url(self.api_base or "https://api.deepseek.com")
+    
+    async def stream_completion(self, prompt, max_tokens=None, temperature=0.7, system_prompt=None) -> AsyncIterator[str]:
+        """流式生成，逐段产出模型输出的文本（不经过响应缓存）"""
+        if not prompt:
+            raise ValueError("Prompt cannot be empty")
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": prompt})
+        async for text in self.stream_chat(messages, max_tokens=max_tokens, temperature=temperature):
+            yield text
+    
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens=None, temperature=0.7) -> AsyncIterator[str]:
+        """
+        多轮对话的流式生成
+        
+        最后一条消息之前的内容计入固定开销，最后一条消息超出输入预算时按段落截断。
+        """
+        messages = [dict(message) for message in messages]
+        history = "\n".join(message["content"] for message in messages[:-1])
+        budget = plan_call(messages[-1]["content"], self.provider, self.model, max_tokens, history or None)
+        messages[-1]["content"] = budget.prompt
+        
+        request_id = str(uuid.uuid4())[:8]
+        print(f"[{request_id}] 流式请求: {len(messages)}条消息，最后一条={budget.prompt_tokens} tokens，max_tokens={budget.max_tokens}")
+        start_time = time.time()
+        length = 0
+        async for text in stream_chat_completion(
+            self.provider,
+            self._chat_completions_url(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+            payload={
+                "model": self.model or "deepseek-chat",
+                "messages": messages,
+                "temperature": float(temperature),
+                "max_tokens": int(budget.max_tokens),
+            },
+        ):
+            length += len(text)
+            yield text
+        print(f"[{request_id}] 流式请求完成，用时: {time.time() - start_time:.2f}秒，响应长度: {length}")
         
     async def _call_deepseek_api(self, prompt, max_tokens, temperature, stream=False, system_prompt=None):
         """
@@ -362,41 +466,21 @@ class AIAssistant:
         import random
         import time
         
+        if stream:
+            # 流式读取后拼接为完整文本；需要逐段输出时使用 stream_completion
+            return "".join([text async for text in self.stream_completion(prompt, max_tokens, temperature, system_prompt)])
+        
         # 记录请求信息
         request_id = str(uuid.uuid4())[:8]
         print(f"[{request_id}] DeepSeek API 请求: 提示词长度={len(prompt)}, max_tokens={max_tokens}, temp={temperature}")
         start_time = time.time()
         
-        # 预先截断过长的提示词，避免超时
-        if len(prompt) > 8000:  # 降低阈值以减少超时风险
-            print(f"[{request_id}] 提示词过长({len(prompt)}字符)，执行智能截断")
-            # 保留前60%和后30%
-            front_len = int(8000 * 0.65)
-            back_len = 8000 - front_len - 50
-            prompt = prompt[:front_len] + "\n\n...[内容已省略]...\n\n" + prompt[-back_len:]
-            print(f"[{request_id}] 截断后长度: {len(prompt)}字符")
+        # 提示词长度和max_tokens已由 generate_completion 按token预算确定，这里不再按字符截断
         
         # 创建请求数据
         api_key = self.api_key
         
-        # 规范化API基础URL，防止URL路径重复
-        base_url = self.api_base or "https://api.deepseek.com"
-        
-        # 移除末尾的斜杠
-        base_url = base_url.rstrip('/')
-            
-        # 分析URL看是否已包含v1路径
-        parsed_url = urllib.parse.urlparse(base_url)
-        path_parts = parsed_url.path.strip('/').split('/')
-        
-        # 构建正确的完整URL
-        if 'v1' in path_parts:
-            # URL已包含v1，直接添加chat/completions
-            api_url = f"{base_url}/chat/completions"
-        else:
-            # URL不包含v1，需要添加完整路径
-            api_url = f"{base_url}/v1/chat/completions"
-            
+        api_url = self._chat_completions_url()
         model = self.model or "deepseek-chat"
         
         # 构建请求数据，更好地兼容API格式
@@ -414,7 +498,7 @@ class AIAssistant:
             "messages": messages,
             "temperature": float(temperature),
             "max_tokens": int(max_tokens),
-            "stream": stream
+            "stream": False
         }
         
         # 设置请求头
@@ -427,8 +511,8 @@ class AIAssistant:
         max_retries = 5  # 增加最大重试次数
         base_timeout = 60.0  # 增加基础超时时间到60秒
         
-        # 计算原始内容长度用于判断
-        original_prompt_length = len(prompt)
+        # 计算原始token数用于判断
+        original_prompt_tokens = count_tokens(prompt, model)
         original_max_tokens = max_tokens
         
         # 退避重试策略
@@ -439,7 +523,7 @@ class AIAssistant:
             try:
                 print(f"[{request_id}] 尝试API请求 ({attempt+1}/{max_retries}), 超时设置: {current_timeout}秒")
                 
-                # 创建客户端，设置合理的超时
+                # 设置本次请求的超时
                 timeout_settings = httpx.Timeout(
                     connect=20.0,  # 增加连接超时
                     read=current_timeout,  # 读取超时
@@ -447,45 +531,45 @@ class AIAssistant:
                     pool=20.0  # 增加连接池超时
                 )
                 
-                # 默认会使用系统代理，除非显式禁用
-                async with httpx.AsyncClient(timeout=timeout_settings) as client:
-                    response = await client.post(
-                        url=api_url,
-                        json=data,
-                        headers=headers
-                    )
+                # 复用进程级共享连接池，避免每次重试都重新握手（默认会使用系统代理）
+                response = await get_llm_client(self.provider).post(
+                    url=api_url,
+                    json=data,
+                    headers=headers,
+                    timeout=timeout_settings
+                )
+                
+                # 处理成功响应
+                if response.status_code == 200:
+                    result = response.json()
+                    if "choices" in result and len(result["choices"]) > 0:
+                        message = result["choices"][0]["message"]
+                        if "content" in message:
+                            content = message["content"]
+                            elapsed_time = time.time() - start_time
+                            print(f"[{request_id}] API请求成功，用时: {elapsed_time:.2f}秒，响应长度: {len(content)}")
+                            return content
                     
-                    # 处理成功响应
-                    if response.status_code == 200:
-                        result = response.json()
-                        if "choices" in result and len(result["choices"]) > 0:
-                            message = result["choices"][0]["message"]
-                            if "content" in message:
-                                content = message["content"]
-                                elapsed_time = time.time() - start_time
-                                print(f"[{request_id}] API请求成功，用时: {elapsed_time:.2f}秒，响应长度: {len(content)}")
-                                return content
-                        
-                        print(f"[{request_id}] API响应格式异常: {result}")
-                        raise ValueError("API响应格式异常")
+                    print(f"[{request_id}] API响应格式异常: {result}")
+                    raise ValueError("API响应格式异常")
+                else:
+                    # 处理错误响应
+                    error_msg = f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}"
+                    print(f"[{request_id}] {error_msg}")
+                    
+                    # 429状态码表示请求过多，需要更长的等待时间
+                    if response.status_code == 429:
+                        retry_after = int(response.headers.get('retry-after', 5)) + random.randint(1, 5)
+                        print(f"[{request_id}] 请求过多 (429)，等待 {retry_after} 秒后重试")
+                        await asyncio.sleep(retry_after)
+                    elif 500 <= response.status_code < 600:
+                        # 服务器错误，等待后重试
+                        wait_time = 2 ** attempt + random.random() * 2  # 指数退避
+                        print(f"[{request_id}] 服务器错误 ({response.status_code})，等待 {wait_time:.1f} 秒后重试")
+                        await asyncio.sleep(wait_time)
                     else:
-                        # 处理错误响应
-                        error_msg = f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}"
-                        print(f"[{request_id}] {error_msg}")
-                        
-                        # 429状态码表示请求过多，需要更长的等待时间
-                        if response.status_code == 429:
-                            retry_after = int(response.headers.get('retry-after', 5)) + random.randint(1, 5)
-                            print(f"[{request_id}] 请求过多 (429)，等待 {retry_after} 秒后重试")
-                            await asyncio.sleep(retry_after)
-                        elif 500 <= response.status_code < 600:
-                            # 服务器错误，等待后重试
-                            wait_time = 2 ** attempt + random.random() * 2  # 指数退避
-                            print(f"[{request_id}] 服务器错误 ({response.status_code})，等待 {wait_time:.1f} 秒后重试")
-                            await asyncio.sleep(wait_time)
-                        else:
-                            # 其他错误直接抛出
-                            raise Exception(error_msg)
+                        # 其他错误直接抛出
+                        raise Exception(error_msg)
                 
             except httpx.TimeoutException as e:
                 # 处理超时异常
@@ -497,28 +581,21 @@ class AIAssistant:
                     # 如果还有重试次数，更激进地减少提示词长度
                     reduction_factor = 0.6 ** (attempt + 1)  # 更激进的减少因子
                     
-                    # 确保提示词长度不小于原始长度的20%
-                    min_length = max(int(original_prompt_length * 0.2), 1000)
-                    new_length = max(int(len(prompt) * reduction_factor), min_length)
-                    
-                    front_len = int(new_length * 0.7)  # 前面部分占更多
-                    back_len = new_length - front_len - 50
-                    
-                    # 确保back_len不是负数
-                    if back_len < 0:
-                        front_len = new_length - 50
-                        back_len = 0
+                    # 确保提示词不少于原始token数的20%，按段落保留开头和结尾
+                    min_tokens = max(int(original_prompt_tokens * 0.2), 250)
+                    new_tokens = max(int(count_tokens(prompt, model) * reduction_factor), min_tokens)
+                    truncated = truncate_to_tokens(prompt, new_tokens, model, head_ratio=0.7)
                     
-                    if front_len > 0 and back_len >= 0:
-                        prompt = prompt[:front_len] + "\n\n...[内容已大幅省略以避免超时]...\n\n" + (prompt[-back_len:] if back_len > 0 else "")
-                        print(f"[{request_id}] 超时重试：减少提示词长度至 {len(prompt)} 字符 (原始长度的 {len(prompt)/original_prompt_length*100:.1f}%)")
+                    if truncated != prompt:
+                        prompt = truncated
+                        print(f"[{request_id}] 超时重试：减少提示词至 {new_tokens} tokens (原始的 {new_tokens/max(original_prompt_tokens, 1)*100:.1f}%)")
                         
                         # 同时减少生成的token数，减轻模型负担
                         max_tokens = max(int(max_tokens * 0.7), 500)  # 确保不小于500
                         print(f"[{request_id}] 超时重试：减少max_tokens至 {max_tokens} (原始值的 {max_tokens/original_max_tokens*100:.1f}%)")
                         
                         # 更新请求数据
-                        data["messages"][0]["content"] = prompt
+                        data["messages"][-1]["content"] = prompt
                         data["max_tokens"] = max_tokens
                     
                     print(f"[{request_id}] 等待 {wait_time:.1f} 秒后重试...")
@@ -551,14 +628,14 @@ class AIAssistant:
                     await asyncio.sleep(wait_time)
                     
                     # 如果是最后几次尝试，尝试大幅减少提示词长度以提高成功率
-                    if attempt >= max_retries - 3 and len(prompt) > 2000:
-                        prompt = prompt[:1500] + "\n\n...[内容已大幅省略]...\n\n" + prompt[-500:]
-                        print(f"[{request_id}] 最后尝试：极限减少提示词长度至 {len(prompt)} 字符")
+                    if attempt >= max_retries - 3 and count_tokens(prompt, model) > 500:
+                        prompt = truncate_to_tokens(prompt, 500, model, head_ratio=0.75)
+                        print(f"[{request_id}] 最后尝试：极限减少提示词至500 tokens")
                         max_tokens = min(max_tokens, 1000)
                         print(f"[{request_id}] 最后尝试：限制max_tokens至 {max_tokens}")
                         
                         # 更新请求数据
-                        data["messages"][0]["content"] = prompt
+                        data["messages"][-1]["content"] = prompt
                         data["max_tokens"] = max_tokens
             else:
                     total_time = time.time() - start_time
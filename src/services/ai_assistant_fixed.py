@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Tuple, AsyncIterator
 import logging
 import asyncio
 import json
@@ -13,6 +13,8 @@ import re
 
 # 导入settings对象
 from src.core.config import settings
+from src.services.llm_client import get_llm_client, stream_chat_completion
+from src.services.token_budget import plan_call
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -179,32 +181,20 @@ class AIAssistant:
                 "suggestions": ["考虑添加更多相关研究引用", "增加图表说明关键概念", "精简冗长描述"]
             }
     
-    async def generate_paper_section(
-        self, 
-        section_type: str, 
+    def _build_paper_section_prompts(
+        self,
+        section_type: str,
         writing_style: str,
-        topic: Optional[str] = None,
-        research_problem: Optional[str] = None,
-        method_feature: Optional[str] = None,
-        modeling_target: Optional[str] = None,
-        improvement: Optional[str] = None,
-        key_component: Optional[str] = None,
-        impact: Optional[str] = None,
-        additional_context: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """生成论文特定部分的内容"""
-        logger.info(f"生成论文{section_type}部分，风格：{writing_style}")
-        
-        # 如果没有API密钥或强制使用模拟数据，直接返回模拟内容
-        if self.force_mock or not self.api_key:
-            logger.warning("使用模拟数据（没有API密钥或已启用强制模拟模式）")
-            content = self._generate_mock_content(section_type, topic, research_problem, method_feature, key_component)
-            suggestions = self._generate_mock_suggestions(section_type)
-            return {
-                "content": content,
-                "suggestions": suggestions
-            }
-        
+        topic: Optional[str],
+        research_problem: Optional[str],
+        method_feature: Optional[str],
+        modeling_target: Optional[str],
+        improvement: Optional[str],
+        key_component: Optional[str],
+        impact: Optional[str],
+        additional_context: Optional[str]
+    ) -> Tuple[str, str]:
+        """构建生成论文部分内容的 (系统提示, 提示词)"""
         # 构建写作风格指南
         style_guide = self._get_writing_style_guide(writing_style)
         
@@ -342,6 +332,38 @@ class AIAssistant:
 
 请直接以Markdown格式生成内容，并在内容最后列出2-3条改进建议，用"## 改进建议"作为标题。
 """
+        return system_prompt, prompt
+    
+    async def generate_paper_section(
+        self, 
+        section_type: str, 
+        writing_style: str,
+        topic: Optional[str] = None,
+        research_problem: Optional[str] = None,
+        method_feature: Optional[str] = None,
+        modeling_target: Optional[str] = None,
+        improvement: Optional[str] = None,
+        key_component: Optional[str] = None,
+        impact: Optional[str] = None,
+        additional_context: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """生成论文特定部分的内容"""
+        logger.info(f"生成论文{section_type}部分，风格：{writing_style}")
+        
+        # 如果没有API密钥或强制使用模拟数据，直接返回模拟内容
+        if self.force_mock or not self.api_key:
+            logger.warning("使用模拟数据（没有API密钥或已启用强制模拟模式）")
+            content = self._generate_mock_content(section_type, topic, research_problem, method_feature, key_component)
+            suggestions = self._generate_mock_suggestions(section_type)
+            return {
+                "content": content,
+                "suggestions": suggestions
+            }
+        
+        system_prompt, prompt = self._build_paper_section_prompts(
+            section_type, writing_style, topic, research_problem, method_feature, modeling_target,
+            improvement, key_component, impact, additional_context
+        )
         
         try:
             # 开始计时
@@ -360,25 +382,7 @@ class AIAssistant:
             elapsed_time = time.time() - start_time
             logger.info(f"AI API调用完成，用时: {elapsed_time:.2f}秒，响应长度: {len(response)}字符")
             
-            # 尝试解析返回的JSON
-            try:
-                # 先检查响应是否为JSON格式
-                if response.strip().startswith("{") and response.strip().endswith("}"):
-                    # 尝试解析JSON
-                    result = json.loads(response)
-                    
-                    # 标准化结果格式
-                    result = self._standardize_result(result, section_type)
-                else:
-                    # 不是JSON，可能是直接的Markdown内容
-                    result = self._extract_content_and_suggestions(response)
-                
-                logger.info(f"成功解析AI响应，内容长度: {len(result.get('content', ''))}")
-                return result
-            except json.JSONDecodeError as e:
-                logger.info(f"响应不是JSON格式，尝试作为Markdown处理: {e}")
-                result = self._extract_content_and_suggestions(response)
-                return result
+            return self._parse_section_response(response, section_type)
                 
         except Exception as e:
             error_detail = str(e)
@@ -398,6 +402,104 @@ class AIAssistant:
                 "suggestions": suggestions
             }
     
+    def _parse_section_response(self, response: str, section_type: str) -> Dict[str, Any]:
+        """将模型输出解析为 {"content", "suggestions"}"""
+        try:
+            # 先检查响应是否为JSON格式
+            if response.strip().startswith("{") and response.strip().endswith("}"):
+                # 尝试解析JSON并标准化结果格式
+                result = self._standardize_result(json.loads(response), section_type)
+            else:
+                # 不是JSON，可能是直接的Markdown内容
+                result = self._extract_content_and_suggestions(response)
+            
+            logger.info(f"成功解析AI响应，内容长度: {len(result.get('content', ''))}")
+            return result
+        except json.JSONDecodeError as e:
+            logger.info(f"响应不是JSON格式，尝试作为Markdown处理: {e}")
+            return self._extract_content_and_suggestions(response)
+    
+    async def stream_paper_section(
+        self,
+        section_type: str,
+        writing_style: str,
+        topic: Optional[str] = None,
+        research_problem: Optional[str] = None,
+        method_feature: Optional[str] = None,
+        modeling_target: Optional[str] = None,
+        improvement: Optional[str] = None,
+        key_component: Optional[str] = None,
+        impact: Optional[str] = None,
+        additional_context: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成论文特定部分的内容
+        
+        逐段产出 {"type": "delta", "content": 文本}，结束时产出
+        {"type": "done", "content": 完整内容, "suggestions": 建议列表}。
+        开始输出之前调用失败时与 generate_paper_section 一样退回模拟数据。
+        """
+        logger.info(f"流式生成论文{section_type}部分，风格：{writing_style}")
+        
+        if not (self.force_mock or not self.api_key):
+            system_prompt, prompt = self._build_paper_section_prompts(
+                section_type, writing_style, topic, research_problem, method_feature, modeling_target,
+                improvement, key_component, impact, additional_context
+            )
+            parts = []
+            try:
+                async for text in self._stream_api(prompt, self.max_tokens, self.default_temperature, system_prompt):
+                    parts.append(text)
+                    yield {"type": "delta", "content": text}
+            except Exception as e:
+                if parts:
+                    raise
+                logger.error(f"流式调用AI API失败: {str(e)}")
+            if parts:
+                result = self._parse_section_response("".join(parts), section_type)
+                yield {"type": "done", "content": result["content"], "suggestions": result.get("suggestions", [])}
+                return
+        
+        logger.warning("使用模拟数据（没有API密钥、已启用强制模拟模式或调用失败）")
+        content = self._generate_mock_content(section_type, topic, research_problem, method_feature, key_component)
+        yield {"type": "delta", "content": content}
+        yield {"type": "done", "content": content, "suggestions": self._generate_mock_suggestions(section_type)}
+    
+    def _api_url(self) -> str:
+        """使用settings中配置的API基础URL"""
+        if self.provider == AIProvider.DEEPSEEK:
+            return f"{settings.DEEPSEEK_API_BASE}/chat/completions"
+        elif self.provider == AIProvider.OPENAI:
+            return f"{settings.OPENAI_API_BASE}/chat/completions"
+        elif self.provider == AIProvider.CLAUDE:
+            return f"{settings.CLAUDE_API_BASE}/messages"
+        # 默认使用DeepSeek
+        return f"{settings.DEEPSEEK_API_BASE}/chat/completions"
+    
+    async def _stream_api(self, prompt, max_tokens, temperature, system_prompt=None) -> AsyncIterator[str]:
+        """以SSE方式调用API，逐段产出文本，输入和输出按模型上下文窗口分配预算"""
+        api_key = self.api_key
+        if not api_key or len(api_key.strip()) < 8:
+            raise ValueError("无效的API密钥")
+        
+        budget = plan_call(prompt, self.provider, self.model, max_tokens, system_prompt)
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": budget.prompt})
+        
+        async for text in stream_chat_completion(
+            self.provider,
+            self._api_url(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"},
+            payload={
+                "model": self.model,
+                "messages": messages,
+                "temperature": float(temperature),
+                "max_tokens": int(budget.max_tokens),
+            },
+            read_timeout=120.0,
+        ):
+            yield text
+    
     async def _call_deepseek_api(self, prompt, max_tokens, temperature, stream=False, system_prompt=None):
         """
         调用DeepSeek API获取响应
@@ -412,6 +514,10 @@ class AIAssistant:
         Returns:
             API响应内容
         """
+        if stream:
+            # 流式读取后拼接为完整文本；需要逐段输出时使用 _stream_api
+            return "".join([text async for text in self._stream_api(prompt, max_tokens, temperature, system_prompt)])
+        
         # 记录请求信息
         request_id = str(uuid.uuid4())[:8]
         logger.info(f"[{request_id}] DeepSeek API 请求: 提示词长度={len(prompt)}, max_tokens={max_tokens}, temp={temperature}")
@@ -430,17 +536,7 @@ class AIAssistant:
         if not api_key or len(api_key.strip()) < 8:
             raise ValueError("无效的API密钥")
         
-        # 使用settings中配置的API基础URL
-        if self.provider == AIProvider.DEEPSEEK:
-            api_url = f"{settings.DEEPSEEK_API_BASE}/chat/completions"
-        elif self.provider == AIProvider.OPENAI:
-            api_url = f"{settings.OPENAI_API_BASE}/chat/completions"
-        elif self.provider == AIProvider.CLAUDE:
-            api_url = f"{settings.CLAUDE_API_BASE}/messages"
-        else:
-            # 默认使用DeepSeek
-            api_url = f"{settings.DEEPSEEK_API_BASE}/chat/completions"
-            
+        api_url = self._api_url()
         model = self.model
         logger.info(f"[{request_id}] 将请求发送到: {api_url}, 使用模型: {model}")
         
@@ -459,7 +555,7 @@ class AIAssistant:
             "messages": messages,
             "temperature": float(temperature),
             "max_tokens": int(max_tokens),
-            "stream": stream
+            "stream": False
         }
         
         # 输出请求信息（排除实际提示词内容）
@@ -492,54 +588,55 @@ class AIAssistant:
                     pool=30.0
                 )
                 
-                async with httpx.AsyncClient(timeout=timeout_settings) as client:
-                    response = await client.post(
-                        url=api_url,
-                        json=data,
-                        headers=headers
-                    )
+                # 复用进程级共享连接池，避免每次重试都重新握手
+                response = await get_llm_client(self.provider).post(
+                    url=api_url,
+                    json=data,
+                    headers=headers,
+                    timeout=timeout_settings
+                )
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    if "choices" in result and len(result["choices"]) > 0:
+                        message = result["choices"][0]["message"]
+                        if "content" in message:
+                            content = message["content"]
+                            elapsed_time = time.time() - start_time
+                            logger.info(f"[{request_id}] API请求成功，用时: {elapsed_time:.2f}秒，响应长度: {len(content)}")
+                            
+                            # 确保返回的内容不为空
+                            if not content.strip():
+                                logger.warning(f"[{request_id}] API返回了空内容，使用备用响应")
+                                return json.dumps({
+                                    "content": "API返回了空内容，请重试。",
+                                    "suggestions": ["尝试使用不同的提示词", "检查API连接状态", "调整生成参数"]
+                                }, ensure_ascii=False)
+                            
+                            return content
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        if "choices" in result and len(result["choices"]) > 0:
-                            message = result["choices"][0]["message"]
-                            if "content" in message:
-                                content = message["content"]
-                                elapsed_time = time.time() - start_time
-                                logger.info(f"[{request_id}] API请求成功，用时: {elapsed_time:.2f}秒，响应长度: {len(content)}")
-                                
-                                # 确保返回的内容不为空
-                                if not content.strip():
-                                    logger.warning(f"[{request_id}] API返回了空内容，使用备用响应")
-                                    return json.dumps({
-                                        "content": "API返回了空内容，请重试。",
-                                        "suggestions": ["尝试使用不同的提示词", "检查API连接状态", "调整生成参数"]
-                                    }, ensure_ascii=False)
-                                
-                                return content
-                        
-                        logger.error(f"[{request_id}] API响应格式异常: {result}")
-                        # 构造一个基本的有效JSON作为后备
-                        return json.dumps({
-                            "content": f"API响应格式异常，请重试。收到的响应: {str(result)[:200]}...",
-                            "suggestions": ["请检查API配置", "尝试使用不同的提示词", "联系技术支持"]
-                        }, ensure_ascii=False)
+                    logger.error(f"[{request_id}] API响应格式异常: {result}")
+                    # 构造一个基本的有效JSON作为后备
+                    return json.dumps({
+                        "content": f"API响应格式异常，请重试。收到的响应: {str(result)[:200]}...",
+                        "suggestions": ["请检查API配置", "尝试使用不同的提示词", "联系技术支持"]
+                    }, ensure_ascii=False)
+                else:
+                    error_msg = f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}"
+                    logger.error(f"[{request_id}] {error_msg}")
+                    
+                    if response.status_code == 401:
+                        raise ValueError("API密钥无效或未授权，请检查您的API密钥设置")
+                    elif response.status_code == 429:
+                        retry_after = int(response.headers.get('retry-after', 5)) + random.randint(1, 5)
+                        logger.info(f"[{request_id}] 请求过多 (429)，等待 {retry_after} 秒后重试")
+                        await asyncio.sleep(retry_after)
+                    elif 500 <= response.status_code < 600:
+                        wait_time = 2 ** attempt + random.random() * 2
+                        logger.info(f"[{request_id}] 服务器错误 ({response.status_code})，等待 {wait_time:.1f} 秒后重试")
+                        await asyncio.sleep(wait_time)
                     else:
-                        error_msg = f"API请求失败: 状态码 {response.status_code}, 响应: {response.text}"
-                        logger.error(f"[{request_id}] {error_msg}")
-                        
-                        if response.status_code == 401:
-                            raise ValueError("API密钥无效或未授权，请检查您的API密钥设置")
-                        elif response.status_code == 429:
-                            retry_after = int(response.headers.get('retry-after', 5)) + random.randint(1, 5)
-                            logger.info(f"[{request_id}] 请求过多 (429)，等待 {retry_after} 秒后重试")
-                            await asyncio.sleep(retry_after)
-                        elif 500 <= response.status_code < 600:
-                            wait_time = 2 ** attempt + random.random() * 2
-                            logger.info(f"[{request_id}] 服务器错误 ({response.status_code})，等待 {wait_time:.1f} 秒后重试")
-                            await asyncio.sleep(wait_time)
-                        else:
-                            raise Exception(error_msg)
+                        raise Exception(error_msg)
             
             except (httpx.TimeoutException, httpx.ConnectError) as e:
                 if attempt < max_retries - 1:
@@ -0,0 +1,247 @@
+"""
+论文分析任务队列
+
+任务持久化在PostgreSQL的analysis_jobs表中，worker通过 SELECT ... FOR UPDATE SKIP LOCKED
+互不阻塞地领取任务。领取时优先选择当前执行中任务最少的用户（按用户公平），其次按优先级
+和入队时间排序。失败的任务按指数退避重试，重试次数耗尽后进入死信状态；worker失联
+（心跳超时）的任务会被重新入队，并从已记录的阶段断点继续执行。
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.models.analysis_job import AnalysisJob, AnalysisJobStatus
+from src.models.paper import Paper
+from src.services.rate_limit import backoff_with_jitter
+
+# 重试退避上限（秒）
+MAX_RETRY_DELAY = 1800
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def get_active_job(db: Session, paper_id: str) -> Optional[AnalysisJob]:
+    """获取论文尚未结束的分析任务"""
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.paper_id == paper_id,
+        AnalysisJob.status.in_(AnalysisJobStatus.ACTIVE)
+    ).first()
+
+
+def get_latest_job(db: Session, paper_id: str, user_id: str) -> Optional[AnalysisJob]:
+    """获取论文最近一次的分析任务"""
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.paper_id == paper_id,
+        AnalysisJob.user_id == user_id
+    ).order_by(AnalysisJob.created_at.desc()).first()
+
+
+def enqueue_analysis_job(db: Session, paper: Paper, user_id: str, options: Dict[str, Any],
+                         priority: int = 0) -> AnalysisJob:
+    """
+    提交论文分析任务
+
+    同一篇论文已有排队或执行中的任务时直接返回该任务，不会重复入队。
+    """
+    job = get_active_job(db, paper.id)
+    if job:
+        print(f"论文已有未完成的分析任务: paper_id={paper.id}, job_id={job.id}, status={job.status}")
+        return job
+
+    job = AnalysisJob(
+        paper_id=paper.id,
+        user_id=user_id,
+        priority=priority,
+        options=options,
+        checkpoint=[],
+        max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+        run_after=_now(),
+    )
+    db.add(job)
+
+    # 与任务一起提交，前端立即看到分析已开始
+    paper.analysis_status = "processing"
+    paper.analysis_progress = 0
+    db.commit()
+    db.refresh(job)
+    print(f"分析任务已入队: paper_id={paper.id}, job_id={job.id}, priority={priority}")
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[AnalysisJob]:
+    """
+    领取下一个可执行的任务
+
+    执行中任务数达到上限的用户本轮不参与领取；各worker之间通过SKIP LOCKED互不阻塞。
+    执行中任务数是读取时的快照，并发领取时单用户上限可能被短暂超出一个任务。
+    """
+    running = (
+        select(AnalysisJob.user_id, func.count(AnalysisJob.id).label("running"))
+        .where(AnalysisJob.status == AnalysisJobStatus.RUNNING)
+        .group_by(AnalysisJob.user_id)
+        .subquery()
+    )
+    running_count = func.coalesce(running.c.running, 0)
+
+    stmt = (
+        select(AnalysisJob)
+        .outerjoin(running, running.c.user_id == AnalysisJob.user_id)
+        .where(
+            AnalysisJob.status == AnalysisJobStatus.QUEUED,
+            AnalysisJob.run_after <= _now(),
+            running_count < settings.ANALYSIS_JOB_MAX_RUNNING_PER_USER,
+        )
+        .order_by(running_count.asc(), AnalysisJob.priority.desc(), AnalysisJob.created_at.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True, of=AnalysisJob)
+    )
+    job = db.execute(stmt).scalars().first()
+    if job is None:
+        db.rollback()
+        return None
+
+    job.status = AnalysisJobStatus.RUNNING
+    job.locked_by = worker_id
+    job.heartbeat_at = _now()
+    job.attempts += 1
+    db.commit()
+    return job
+
+
+def heartbeat(db: Session, job_id: str, worker_id: str) -> bool:
+    """刷新任务心跳，任务已不属于当前worker时返回False"""
+    updated = db.query(AnalysisJob).filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.locked_by == worker_id,
+        AnalysisJob.status == AnalysisJobStatus.RUNNING
+    ).update({AnalysisJob.heartbeat_at: _now()}, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
+
+def _owned(db: Session, job_id: str, worker_id: str):
+    """仍由 worker_id 执行中的任务；租约过期后被重新入队或被其他worker领取时为空"""
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.locked_by == worker_id,
+        AnalysisJob.status == AnalysisJobStatus.RUNNING
+    )
+
+
+def record_checkpoint(db: Session, job: AnalysisJob, stage_name: str, worker_id: str) -> bool:
+    """记录已完成的阶段，重试时从断点继续；任务已不属于当前worker时不写入并返回False"""
+    completed: List[str] = list(job.checkpoint or [])
+    if stage_name in completed:
+        return True
+    completed.append(stage_name)
+    updated = _owned(db, job.id, worker_id).update(
+        {AnalysisJob.checkpoint: completed}, synchronize_session=False
+    )
+    db.commit()
+    if not updated:
+        print(f"任务已不属于当前worker，未记录断点: job_id={job.id}, stage={stage_name}")
+    return updated > 0
+
+
+def complete_job(db: Session, job: AnalysisJob, worker_id: str) -> bool:
+    """标记任务成功；任务已不属于当前worker时不修改并返回False"""
+    updated = _owned(db, job.id, worker_id).update({
+        AnalysisJob.status: AnalysisJobStatus.SUCCEEDED,
+        AnalysisJob.locked_by: None,
+        AnalysisJob.last_error: None,
+        AnalysisJob.finished_at: _now(),
+    }, synchronize_session=False)
+    db.commit()
+    if not updated:
+        print(f"任务已不属于当前worker，未标记完成: job_id={job.id}")
+    return updated > 0
+
+
+def _mark_failed(job: AnalysisJob, error: str):
+    """修改任务和论文状态（不提交）：未超过重试次数时退避后重新入队，否则进入死信"""
+    job.last_error = error
+    job.locked_by = None
+    if job.attempts >= job.max_attempts:
+        job.status = AnalysisJobStatus.DEAD
+        job.finished_at = _now()
+        # worker崩溃时分析流程来不及更新论文状态
+        if job.paper is not None and job.paper.analysis_status == "processing":
+            job.paper.analysis_status = "failed"
+        print(f"分析任务重试次数耗尽，进入死信: job_id={job.id}, attempts={job.attempts}, error={error}")
+    else:
+        delay = backoff_with_jitter(job.attempts, settings.ANALYSIS_JOB_RETRY_BASE_DELAY, cap=MAX_RETRY_DELAY)
+        job.status = AnalysisJobStatus.QUEUED
+        job.run_after = _now() + timedelta(seconds=delay)
+        # 等待重试期间论文仍显示为分析中
+        if job.paper is not None:
+            job.paper.analysis_status = "processing"
+        print(f"分析任务失败，{delay:.0f}秒后重试: job_id={job.id}, attempts={job.attempts}, error={error}")
+
+
+def failure_event(job: AnalysisJob) -> Dict[str, Any]:
+    """任务失败后需要发布的进度事件：重新入队为 retrying，进入死信为 failed"""
+    if job.status == AnalysisJobStatus.QUEUED:
+        return {"paper_id": job.paper_id, "type": "retrying", "attempts": job.attempts,
+                "run_after": job.run_after, "error": job.last_error}
+    return {"paper_id": job.paper_id, "type": "failed",
+            "status": job.paper.analysis_status if job.paper else "failed", "error": job.last_error}
+
+
+def fail_job(db: Session, job: AnalysisJob, error: str, worker_id: str) -> bool:
+    """
+    任务执行失败：未超过重试次数时退避后重新入队，否则进入死信
+
+    先锁定仍属于当前worker的任务行再修改；任务已被重新入队或由其他worker执行时不修改并返回False。
+    """
+    owned = _owned(db, job.id, worker_id).with_for_update().first()
+    if owned is None:
+        db.rollback()
+        print(f"任务已不属于当前worker，忽略失败结果: job_id={job.id}, error={error}")
+        return False
+    _mark_failed(owned, error)
+    db.commit()
+    return True
+
+
+def requeue_stale_jobs(db: Session) -> List[Dict[str, Any]]:
+    """
+    将心跳超时（worker崩溃或被杀）的任务重新入队，重试次数耗尽的进入死信
+
+    所有任务在持有行锁期间修改、最后一次提交：逐个提交会提前释放其余行的锁，
+    其他worker可能在此期间领取任务，随后又被这里改回排队状态而重复执行。
+    返回需要发布的进度事件（见 failure_event），由调用方在事件循环中发布。
+    """
+    deadline = _now() - timedelta(seconds=settings.ANALYSIS_JOB_LEASE_SECONDS)
+    stale_jobs = db.query(AnalysisJob).filter(
+        AnalysisJob.status == AnalysisJobStatus.RUNNING,
+        AnalysisJob.heartbeat_at < deadline
+    ).with_for_update(skip_locked=True).all()
+
+    events = []
+    for job in stale_jobs:
+        _mark_failed(job, f"worker心跳超时: {job.locked_by}")
+        events.append(failure_event(job))
+    db.commit()
+    return events
+
+
+def job_to_dict(job: AnalysisJob) -> Dict[str, Any]:
+    """任务状态的API表示"""
+    return {
+        "id": job.id,
+        "paper_id": job.paper_id,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "completed_stages": job.checkpoint or [],
+        "last_error": job.last_error,
+        "run_after": job.run_after,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
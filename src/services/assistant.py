@@ -1,7 +1,10 @@
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select
+import asyncio
 import uuid
 import re
 import json
@@ -14,9 +17,14 @@ from src.schemas.assistant import (
     SessionUpdate, 
     MessageCreate, 
     MessageRole,
+    ChatRequest,
 )
 from src.models.paper import Paper
-from src.services import ai_assistant
+from src.core.config import settings
+from src.services import ai_assistant, pagination
+from src.services.llm_cache import llm_cache, make_cache_key
+from src.services.stage_scheduler import StageScheduler, StageSkipped
+from src.services.token_budget import count_tokens
 
 # 获取AI助手实例的辅助函数
 def get_ai_assistant(provider: Optional[str] = None):
@@ -50,6 +58,7 @@ def create_session(
     db.add(db_session)
     db.commit()
     db.refresh(db_session)
+    pagination.total_cache.invalidate("assistant_sessions", user_id)
     return db_session
 
 def get_session(db: Session, session_id: str, user_id: str) -> Optional[AssistantSession]:
@@ -124,6 +133,7 @@ def delete_session(db: Session, session_id: str, user_id: str) -> bool:
     session.is_active = False
     session.updated_at = datetime.now()
     db.commit()
+    pagination.total_cache.invalidate("assistant_sessions", user_id)
     return True
 
 def hard_delete_session(db: Session, session_id: str, user_id: str) -> bool:
@@ -134,6 +144,7 @@ def hard_delete_session(db: Session, session_id: str, user_id: str) -> bool:
     
     db.delete(session)
     db.commit()
+    pagination.total_cache.invalidate("assistant_sessions", user_id)
     return True
 
 # 消息管理函数
@@ -201,6 +212,276 @@ def delete_message(db: Session, message_id: str) -> bool:
     db.commit()
     return True
 
+# 会话与消息管理函数（异步版本，供API路由使用）
+
+# 会话列表的排序字段（最近消息时间降序）
+SESSION_SORT_KEY = "last_message_at"
+
+async def create_session_async(
+    db: AsyncSession, 
+    user_id: str, 
+    session_data: SessionCreate
+) -> AssistantSession:
+    """创建新的研究助手会话（异步）"""
+    session_type = session_data.session_type
+    if isinstance(session_type, ModelAssistantType):
+        session_type = session_type.value
+    
+    db_session = AssistantSession(
+        owner_id=user_id,
+        title=session_data.title,
+        session_type=session_type,
+        context=session_data.context,
+        paper_id=session_data.paper_id
+    )
+    db.add(db_session)
+    await db.commit()
+    await db.refresh(db_session)
+    pagination.total_cache.invalidate("assistant_sessions", user_id)
+    return db_session
+
+async def get_session_async(db: AsyncSession, session_id: str, user_id: str) -> Optional[AssistantSession]:
+    """获取指定会话（异步）"""
+    result = await db.execute(
+        select(AssistantSession).where(
+            AssistantSession.id == session_id,
+            AssistantSession.owner_id == user_id
+        )
+    )
+    return result.scalars().first()
+
+async def get_sessions_async(
+    db: AsyncSession, 
+    user_id: str, 
+    skip: int = 0, 
+    limit: int = 100,
+    active_only: bool = True,
+    cursor: Optional[str] = None,
+    include_total: bool = False
+) -> Tuple[List[AssistantSession], Optional[int], Optional[str]]:
+    """
+    获取用户的会话列表（异步）
+
+    按 (last_message_at, id) 降序游标分页，传入 cursor 时忽略 skip。
+    返回 (会话列表, 总数, 下一页游标)，include_total=False 时总数为None。
+    """
+    query = select(AssistantSession).where(AssistantSession.owner_id == user_id)
+    
+    if active_only:
+        query = query.where(AssistantSession.is_active == True)
+    
+    total = None
+    if include_total:
+        total, _ = await pagination.get_total_async(
+            db, "assistant_sessions", user_id, {"active_only": active_only}, query, AssistantSession.id
+        )
+    
+    cursor_value = pagination.decode_cursor(cursor, SESSION_SORT_KEY, True) if cursor else None
+    query = pagination.apply_keyset(
+        query, AssistantSession.last_message_at, AssistantSession.id, True, cursor_value
+    )
+    if cursor_value is not None:
+        skip = 0
+    
+    result = await db.execute(query.offset(skip).limit(limit))
+    sessions = list(result.scalars().all())
+    return sessions, total, pagination.next_cursor(sessions, limit, SESSION_SORT_KEY, True)
+
+async def get_session_message_counts_async(db: AsyncSession, session_ids: List[str]) -> Dict[str, int]:
+    """一次查询统计多个会话的消息数量"""
+    if not session_ids:
+        return {}
+    result = await db.execute(
+        select(AssistantMessage.session_id, func.count(AssistantMessage.id))
+        .where(AssistantMessage.session_id.in_(session_ids))
+        .group_by(AssistantMessage.session_id)
+    )
+    return {session_id: count for session_id, count in result.all()}
+
+async def get_session_with_messages_async(
+    db: AsyncSession, 
+    session_id: str, 
+    user_id: str,
+    message_limit: int = 50
+) -> Optional[AssistantSession]:
+    """获取会话及其消息（异步）"""
+    session = await get_session_async(db, session_id, user_id)
+    if session:
+        messages = await get_messages_async(db, session_id, limit=message_limit)
+        # 直接设置已加载的集合，避免赋值时触发对原集合的懒加载
+        set_committed_value(session, "messages", messages)
+    return session
+
+async def update_session_async(
+    db: AsyncSession, 
+    session_id: str, 
+    user_id: str, 
+    session_data: SessionUpdate
+) -> Optional[AssistantSession]:
+    """更新会话信息（异步）"""
+    session = await get_session_async(db, session_id, user_id)
+    if not session:
+        return None
+        
+    update_data = session_data.dict(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(session, key, value)
+    
+    session.updated_at = datetime.now()
+    
+    await db.commit()
+    await db.refresh(session)
+    return session
+
+async def delete_session_async(db: AsyncSession, session_id: str, user_id: str) -> bool:
+    """删除会话（软删除，异步）"""
+    session = await get_session_async(db, session_id, user_id)
+    if not session:
+        return False
+    
+    session.is_active = False
+    session.updated_at = datetime.now()
+    await db.commit()
+    pagination.total_cache.invalidate("assistant_sessions", user_id)
+    return True
+
+async def hard_delete_session_async(db: AsyncSession, session_id: str, user_id: str) -> bool:
+    """硬删除会话及其所有消息（异步）"""
+    # 级联删除需要加载关联对象，复用同步实现在greenlet中执行
+    return await db.run_sync(hard_delete_session, session_id, user_id)
+
+async def create_message_async(
+    db: AsyncSession, 
+    session_id: str,
+    message_data: MessageCreate
+) -> AssistantMessage:
+    """创建新消息（异步）"""
+    max_sequence = await db.scalar(
+        select(func.max(AssistantMessage.sequence)).where(AssistantMessage.session_id == session_id)
+    ) or 0
+    
+    metadata = message_data.message_metadata or {}
+    role_value = message_data.role.value if hasattr(message_data.role, 'value') else message_data.role
+    
+    db_message = AssistantMessage(
+        session_id=session_id,
+        role=ModelMessageRole(role_value),
+        content=message_data.content,
+        message_metadata=metadata,
+        sequence=max_sequence + 1
+    )
+    db.add(db_message)
+    
+    # 更新会话的最后消息时间
+    session = await db.get(AssistantSession, session_id)
+    if session:
+        session.last_message_at = datetime.now()
+    
+    await db.commit()
+    await db.refresh(db_message)
+    return db_message
+
+async def get_messages_async(
+    db: AsyncSession, 
+    session_id: str, 
+    skip: int = 0, 
+    limit: int = 100
+) -> List[AssistantMessage]:
+    """获取会话的消息列表（异步）"""
+    result = await db.execute(
+        select(AssistantMessage)
+        .where(AssistantMessage.session_id == session_id)
+        .order_by(AssistantMessage.sequence)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+# 对话
+CHAT_SYSTEM_PROMPT = "你是一个专业的科研助手，帮助用户阅读论文、梳理研究思路、设计实验和改进写作。请使用中文回答，内容准确、条理清晰。"
+# 每次对话带上的最近历史消息数，超出token预算时再丢弃最早的消息
+CHAT_HISTORY_MESSAGES = 20
+
+async def _chat_system_prompt(db: AsyncSession, session: AssistantSession, user_id: str) -> str:
+    system_prompt = CHAT_SYSTEM_PROMPT
+    if session.paper_id:
+        row = (await db.execute(
+            select(Paper.title, Paper.abstract).where(Paper.id == session.paper_id, Paper.owner_id == user_id)
+        )).first()
+        if row:
+            system_prompt += f"\n\n当前讨论的论文: {row[0]}"
+            if row[1]:
+                system_prompt += f"\n摘要: {row[1]}"
+    return system_prompt
+
+async def prepare_chat_async(
+    db: AsyncSession,
+    user_id: str,
+    chat: ChatRequest
+) -> Optional[Tuple[AssistantSession, List[Dict[str, str]]]]:
+    """
+    准备一轮对话：获取（或创建）会话，保存用户消息，并构建发送给模型的消息列表
+
+    返回 (会话, 消息列表)；指定的会话不存在或无权访问时返回None。
+    """
+    if chat.session_id:
+        session = await get_session_async(db, chat.session_id, user_id)
+        if not session:
+            return None
+    else:
+        session = await create_session_async(db, user_id, SessionCreate(
+            title=chat.message[:50],
+            context=chat.context,
+            paper_id=chat.paper_id
+        ))
+    
+    await create_message_async(db, session.id, MessageCreate(role=MessageRole.USER, content=chat.message))
+    
+    result = await db.execute(
+        select(AssistantMessage.role, AssistantMessage.content)
+        .where(AssistantMessage.session_id == session.id)
+        .order_by(desc(AssistantMessage.sequence))
+        .limit(CHAT_HISTORY_MESSAGES)
+    )
+    history = [
+        {"role": role.value if hasattr(role, "value") else role, "content": content}
+        for role, content in reversed(result.all())
+    ]
+    
+    # 历史消息超出输入预算时丢弃最早的消息，始终保留本轮的用户消息
+    history_tokens = [count_tokens(message["content"]) for message in history]
+    while len(history) > 1 and sum(history_tokens) > settings.LLM_MAX_PROMPT_TOKENS > 0:
+        history.pop(0)
+        history_tokens.pop(0)
+    
+    system_prompt = await _chat_system_prompt(db, session, user_id)
+    return session, [{"role": "system", "content": system_prompt}] + history
+
+async def stream_chat_reply(
+    session_id: str,
+    messages: List[Dict[str, str]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式生成助手回复
+
+    逐段产出 {"type": "delta", "content": 文本}；完整生成后保存为助手消息，
+    再产出 {"type": "done", "session_id", "message_id", "content"}。客户端中途断开时不保存。
+    """
+    from src.db.session import AsyncSessionLocal
+    
+    parts = []
+    async for text in get_ai_assistant().stream_chat(messages):
+        parts.append(text)
+        yield {"type": "delta", "content": text}
+    
+    content = "".join(parts)
+    # 流式响应在请求依赖的会话关闭之后才结束，这里使用独立的会话写入
+    async with AsyncSessionLocal() as db:
+        message = await create_message_async(db, session_id, MessageCreate(
+            role=MessageRole.ASSISTANT, content=content
+        ))
+    yield {"type": "done", "session_id": session_id, "message_id": message.id, "content": content}
+
 # 研究空白分析服务
 async def analyze_research_gaps(
     db: Session,
@@ -443,15 +724,22 @@ async def get_research_gap_analysis(
             combined_result = round1_data
             logging.info(f"第一轮生成完成，识别出{len(combined_result.get('researchGaps', []))}个研究问题")
             
-            # 第二轮：深入分析每个问题的本质和根源
+            # 第二轮（深入分析）和第三轮（潜在研究方向）按问题并发执行：每个问题的第三轮在
+            # 该问题的第二轮完成后立即开始，所有单项调用共享并发上限，结果按原顺序汇总
             research_gaps = combined_result.get("researchGaps", [])
-            enriched_gaps = []
+            semaphore = asyncio.Semaphore(settings.ASSISTANT_FANOUT_CONCURRENCY)
             
-            for i, gap in enumerate(research_gaps):
-                logging.info(f"【分批生成】第二轮：深入分析研究问题 {i+1}/{len(research_gaps)}: {gap.get('title', '未命名问题')}")
-                
-                # 为每个问题生成深入分析
-                gap_prompt = f"""系统指令:
+            async def limited_completion(prompt: str, max_tokens: int) -> str:
+                async with semaphore:
+                    return await ai.generate_completion(
+                        prompt=prompt,
+                        system_prompt=system_message,
+                        temperature=0.7,
+                        max_tokens=max_tokens
+                    )
+            
+            def build_gap_prompt(gap: Dict[str, Any]) -> str:
+                return f"""系统指令:
 {system_message}
 
 用户查询:
@@ -482,37 +770,9 @@ async def get_research_gap_analysis(
 }}
 ```
 """
-                
-                # 第二轮针对每个问题单独生成，使用中等token
-                gap_response = await ai.generate_completion(
-                    prompt=gap_prompt,
-                    system_prompt=system_message,
-                    temperature=0.7,
-                    max_tokens=2500
-                )
-                
-                # 解析单个问题的深入分析
-                gap_data = extract_json_from_response(gap_response)
-                if gap_data:
-                    # 合并原始问题数据和深入分析
-                    enriched_gap = {**gap, **gap_data}
-                    enriched_gaps.append(enriched_gap)
-                else:
-                    # 如果解析失败，保留原始问题
-                    logging.warning(f"无法解析问题{i+1}的深入分析，保留原始数据")
-                    enriched_gaps.append(gap)
-            
-            # 更新研究问题数据
-            combined_result["researchGaps"] = enriched_gaps
-            logging.info(f"第二轮生成完成，完成{len(enriched_gaps)}个问题的深入分析")
             
-            # 第三轮：为每个问题添加潜在研究方向
-            final_gaps = []
-            for i, gap in enumerate(enriched_gaps):
-                logging.info(f"【分批生成】第三轮：为研究问题 {i+1}/{len(enriched_gaps)} 生成潜在解决方向")
-                
-                # 为每个问题生成潜在研究方向
-                direction_prompt = f"""系统指令:
+            def build_direction_prompt(gap: Dict[str, Any]) -> str:
+                return f"""系统指令:
 {system_message}
 
 用户查询:
@@ -540,32 +800,52 @@ async def get_research_gap_analysis(
 }}
 ```
 """
+            
+            failed_calls = 0
+            
+            async def analyze_gap(i: int, gap: Dict[str, Any]) -> Dict[str, Any]:
+                nonlocal failed_calls
+                # 第二轮：深入分析问题的本质和根源，使用中等token
+                logging.info(f"【分批生成】第二轮：深入分析研究问题 {i+1}/{len(research_gaps)}: {gap.get('title', '未命名问题')}")
+                gap_data = None
+                try:
+                    gap_data = extract_json_from_response(await limited_completion(build_gap_prompt(gap), 2500))
+                except Exception as e:
+                    failed_calls += 1
+                    logging.warning(f"问题{i+1}的深入分析调用失败: {str(e)}")
+                if gap_data:
+                    # 合并原始问题数据和深入分析
+                    gap = {**gap, **gap_data}
+                else:
+                    # 如果解析失败，保留原始问题
+                    logging.warning(f"无法解析问题{i+1}的深入分析，保留原始数据")
                 
-                # 第三轮针对每个问题单独生成潜在方向，使用适中token
-                direction_response = await ai.generate_completion(
-                    prompt=direction_prompt,
-                    system_prompt=system_message,
-                    temperature=0.7,
-                    max_tokens=2000
-                )
-                
-                # 解析研究方向
-                direction_data = extract_json_from_response(direction_response)
+                # 第三轮：生成潜在研究方向，使用适中token
+                logging.info(f"【分批生成】第三轮：为研究问题 {i+1}/{len(research_gaps)} 生成潜在解决方向")
+                direction_data = None
+                try:
+                    direction_data = extract_json_from_response(await limited_completion(build_direction_prompt(gap), 2000))
+                except Exception as e:
+                    failed_calls += 1
+                    logging.warning(f"问题{i+1}的研究方向调用失败: {str(e)}")
                 if direction_data and "potentialDirections" in direction_data:
-                    # 将研究方向添加到问题中
                     gap["potentialDirections"] = direction_data["potentialDirections"]
-                    final_gaps.append(gap)
                 else:
                     # 如果解析失败，添加默认研究方向
                     logging.warning(f"无法解析问题{i+1}的研究方向，添加默认方向")
                     gap["potentialDirections"] = [
                         {"direction": f"改进{domain}领域{perspective}方法的新思路", "approach": "需要进一步探索", "challenges": ["待确定"], "impact": "可能提高性能"}
                     ]
-                    final_gaps.append(gap)
+                return gap
+            
+            # 单个问题失败时保留已有结果，全部调用都失败时视为分析失败
+            final_gaps = list(await asyncio.gather(*(analyze_gap(i, gap) for i, gap in enumerate(research_gaps))))
+            if research_gaps and failed_calls == len(research_gaps) * 2:
+                raise Exception("第二轮和第三轮的所有调用均失败")
             
             # 更新最终研究问题数据
             combined_result["researchGaps"] = final_gaps
-            logging.info(f"第三轮生成完成，为{len(final_gaps)}个问题添加了潜在研究方向")
+            logging.info(f"第二、三轮生成完成，完成{len(final_gaps)}个问题的深入分析和潜在研究方向，失败调用{failed_calls}次")
             
             # 第四轮：生成总结和参考文献
             logging.info(f"【分批生成】第四轮：生成总结分析和完整参考文献")
@@ -1688,15 +1968,13 @@ async def get_innovation_ideas(
             combined_result = round1_data
             logging.info(f"第一轮生成完成，识别出{len(combined_result.get('innovations', []))}个创新点")
             
-            # 第二轮：深入分析每个创新点的技术路径
+            # 第二轮（技术路径分析）和第三轮（学术价值评估）按创新点流水线执行：固定数量的
+            # worker从队列中取创新点，每个创新点依次完成两轮，互不等待；每个创新点有独立的
+            # 截止时间，超时或失败时保留已完成的部分并补充默认评估，不拖慢整个请求
             innovations = combined_result.get("innovations", [])
-            enriched_innovations = []
             
-            for i, innovation in enumerate(innovations):
-                logging.info(f"【分批生成】第二轮：深入分析创新点 {i+1}/{len(innovations)}: {innovation.get('title', '未命名创新点')}")
-                
-                # 为每个创新点生成技术路径和可行性分析
-                innovation_prompt = f"""系统指令:
+            def build_innovation_prompt(innovation: Dict[str, Any]) -> str:
+                return f"""系统指令:
 {system_prompt}
 
 用户查询:
@@ -1724,37 +2002,9 @@ async def get_innovation_ideas(
 }}
 ```
 """
-                
-                # 第二轮针对每个创新点单独生成，使用较大token
-                innovation_response = await ai_assistant.generate_completion(
-                    prompt=innovation_prompt,
-                    system_prompt=system_prompt,
-                    temperature=0.7,
-                    max_tokens=2500
-                )
-                
-                # 解析单个创新点的深入分析
-                innovation_data = extract_json_from_response(innovation_response)
-                if innovation_data:
-                    # 合并原始创新点数据和深入分析
-                    enriched_innovation = {**innovation, **innovation_data}
-                    enriched_innovations.append(enriched_innovation)
-                else:
-                    # 如果解析失败，保留原始创新点
-                    logging.warning(f"无法解析创新点{i+1}的深入分析，保留原始数据")
-                    enriched_innovations.append(innovation)
-            
-            # 更新创新点数据
-            combined_result["innovations"] = enriched_innovations
-            logging.info(f"第二轮生成完成，完成{len(enriched_innovations)}个创新点的技术路径分析")
             
-            # 第三轮：评估学术价值和实现挑战
-            final_innovations = []
-            for i, innovation in enumerate(enriched_innovations):
-                logging.info(f"【分批生成】第三轮：评估创新点 {i+1}/{len(enriched_innovations)} 的学术价值和实现挑战")
-                
-                # 为每个创新点评估学术价值和实现挑战
-                evaluation_prompt = f"""系统指令:
+            def build_evaluation_prompt(innovation: Dict[str, Any]) -> str:
+                return f"""系统指令:
 {system_prompt}
 
 用户查询:
@@ -1781,33 +2031,85 @@ async def get_innovation_ideas(
 }}
 ```
 """
+            
+            def with_default_evaluation(innovation: Dict[str, Any]) -> Dict[str, Any]:
+                return {
+                    **innovation,
+                    "differentiators": "需要进一步分析与现有研究的区别",
+                    "academic_value": "需要进一步评估学术价值",
+                    "technical_challenges": ["技术实现挑战待详细分析"],
+                    "solution_approaches": ["解决思路需进一步探索"]
+                }
+            
+            # 每个创新点当前已完成的结果，超时后从这里取回部分结果
+            results: List[Dict[str, Any]] = list(innovations)
+            evaluated = [False] * len(innovations)
+            
+            async def process_innovation(i: int) -> None:
+                # 第二轮：技术路径和可行性分析，使用较大token
+                logging.info(f"【分批生成】第二轮：深入分析创新点 {i+1}/{len(innovations)}: {results[i].get('title', '未命名创新点')}")
+                try:
+                    innovation_response = await ai_assistant.generate_completion(
+                        prompt=build_innovation_prompt(results[i]),
+                        system_prompt=system_prompt,
+                        temperature=0.7,
+                        max_tokens=2500
+                    )
+                    innovation_data = extract_json_from_response(innovation_response)
+                except Exception as e:
+                    logging.warning(f"创新点{i+1}的深入分析调用失败: {str(e)}")
+                    innovation_data = None
+                if innovation_data:
+                    # 合并原始创新点数据和深入分析
+                    results[i] = {**results[i], **innovation_data}
+                else:
+                    # 如果解析失败，保留原始创新点
+                    logging.warning(f"无法解析创新点{i+1}的深入分析，保留原始数据")
                 
-                # 第三轮针对每个创新点单独评估
+                # 第三轮：学术价值和实现挑战评估
+                logging.info(f"【分批生成】第三轮：评估创新点 {i+1}/{len(innovations)} 的学术价值和实现挑战")
                 evaluation_response = await ai_assistant.generate_completion(
-                    prompt=evaluation_prompt,
+                    prompt=build_evaluation_prompt(results[i]),
                     system_prompt=system_prompt,
                     temperature=0.7,
                     max_tokens=2000
                 )
-                
-                # 解析评估结果
                 evaluation_data = extract_json_from_response(evaluation_response)
                 if evaluation_data:
-                    # 将评估结果添加到创新点
-                    complete_innovation = {**innovation, **evaluation_data}
-                    final_innovations.append(complete_innovation)
-                else:
-                    # 如果解析失败，添加默认评估
-                    logging.warning(f"无法解析创新点{i+1}的评估结果，添加默认评估")
-                    innovation["differentiators"] = "需要进一步分析与现有研究的区别"
-                    innovation["academic_value"] = "需要进一步评估学术价值"
-                    innovation["technical_challenges"] = ["技术实现挑战待详细分析"]
-                    innovation["solution_approaches"] = ["解决思路需进一步探索"]
-                    final_innovations.append(innovation)
+                    results[i] = {**results[i], **evaluation_data}
+                    evaluated[i] = True
+            
+            queue: asyncio.Queue = asyncio.Queue()
+            for i in range(len(innovations)):
+                queue.put_nowait(i)
+            
+            async def worker() -> None:
+                while True:
+                    try:
+                        i = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        await asyncio.wait_for(process_innovation(i), timeout=settings.ASSISTANT_ITEM_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        logging.warning(f"创新点{i+1}超过{settings.ASSISTANT_ITEM_TIMEOUT}秒未完成，使用已完成的部分结果")
+                    except Exception as e:
+                        logging.warning(f"创新点{i+1}的评估调用失败: {str(e)}")
+            
+            worker_count = max(1, min(settings.ASSISTANT_FANOUT_CONCURRENCY, len(innovations)))
+            await asyncio.gather(*(worker() for _ in range(worker_count)))
+            
+            final_innovations = []
+            for i, innovation in enumerate(results):
+                if not evaluated[i]:
+                    # 评估失败、超时或解析失败时，添加默认评估
+                    logging.warning(f"创新点{i+1}没有有效的评估结果，添加默认评估")
+                    innovation = with_default_evaluation(innovation)
+                final_innovations.append(innovation)
             
             # 更新最终创新点数据
             combined_result["innovations"] = final_innovations
-            logging.info(f"第三轮生成完成，为{len(final_innovations)}个创新点添加了学术价值和挑战评估")
+            logging.info(f"第二、三轮生成完成，{sum(evaluated)}/{len(final_innovations)}个创新点完成了技术路径分析和学术价值评估")
             
             # 第四轮：生成参考文献和最终总结
             logging.info(f"【分批生成】第四轮：生成参考文献和最终总结")
@@ -2070,6 +2372,10 @@ async def get_innovation_ideas(
             "details": str(e)
         }
 
+# 实验设计的生成节点：framework（目标和框架）、data（数据集和评估指标）、methods（基线和提出的方法）、
+# ablation（消融实验和参数敏感性）、code（核心代码），合并结果时按此顺序
+EXPERIMENT_DESIGN_NODES = ("framework", "data", "methods", "ablation", "code")
+
 # 实验设计生成函数
 async def get_experiment_design(
     paper_id: Optional[str] = None,
@@ -2078,10 +2384,11 @@ async def get_experiment_design(
     framework: str = "pytorch",
     language: str = "python",
     ai_provider: Optional[str] = None,
-    db: Optional[Session] = None
+    db: Optional[Session] = None,
+    regenerate: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
-    生成实验设计方案和代码，使用多轮问询和自适应token策略提高质量
+    生成实验设计方案和代码，各部分按依赖关系组成DAG并发生成
     
     Args:
         paper_id: 论文ID
@@ -2091,6 +2398,7 @@ async def get_experiment_design(
         language: 编程语言
         ai_provider: AI提供商
         db: 数据库会话
+        regenerate: 忽略缓存重新生成的节点（见 EXPERIMENT_DESIGN_NODES），其余节点复用缓存
         
     Returns:
         实验设计方案和代码
@@ -2233,11 +2541,38 @@ async def get_experiment_design(
     try:
         # 获取AI助手实例
         ai_assistant = get_ai_assistant(provider=ai_provider)
-        combined_result = {}
-        
-        # 第一轮：确定实验目标和整体框架
-        logging.info(f"【分批生成】第一轮：为实验'{experiment_name or '推荐系统实验'}'制定目标和整体框架")
-        round1_prompt = f"""系统指令:
+        regenerate = set(regenerate or [])
+        
+        async def run_node(node: str, prompt: str, max_tokens: int) -> Optional[Dict[str, Any]]:
+            """
+            执行一个节点并解析JSON结果
+
+            每个节点按自己的提示词单独缓存；上游节点重新生成后提示词变化，下游节点自然不会命中旧结果。
+            """
+            cache_key = make_cache_key(ai_assistant.provider, ai_assistant.model, system_prompt, prompt, 0.7, max_tokens)
+            use_cache = llm_cache.enabled and node not in regenerate
+            if use_cache:
+                cached = await llm_cache.get(cache_key)
+                if cached is not None:
+                    logging.info(f"实验设计节点 {node} 命中缓存")
+                    return extract_json_from_response(cached)
+            
+            response = await ai_assistant.generate_completion(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                temperature=0.7
+            )
+            data = extract_json_from_response(response)
+            # 只缓存能解析的结果，解析失败的节点下次重新生成
+            if data and llm_cache.enabled:
+                await llm_cache.set(cache_key, response)
+            return data
+        
+        # 实验目标和整体框架
+        async def framework_node(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            logging.info(f"【分批生成】framework：为实验'{experiment_name or '推荐系统实验'}'制定目标和整体框架")
+            prompt = f"""系统指令:
 {system_prompt}
 
 用户查询:
@@ -2266,36 +2601,24 @@ async def get_experiment_design(
 }}
 ```
 """
-        
-        try:
-            # 第一轮使用适中token，确定实验基本框架
-            round1_response = await ai_assistant.generate_completion(
-                prompt=round1_prompt,
-                system_prompt=system_prompt,
-                max_tokens=2000,
-                temperature=0.7
-            )
-            
-            # 解析第一轮结果
-            round1_data = extract_json_from_response(round1_response)
-            if not round1_data:
-                raise ValueError("第一轮分析未能生成有效的实验框架")
-                
-            # 保存第一轮结果
-            combined_result = round1_data
-            logging.info("第一轮生成完成，已确定实验目标和整体框架")
-            
-            # 第二轮：数据集处理方案和评估指标
-            logging.info(f"【分批生成】第二轮：设计数据集处理方案和评估指标")
-            round2_prompt = f"""系统指令:
+            # 使用适中token，确定实验基本框架
+            result = await run_node("framework", prompt, 2000)
+            if not result:
+                raise ValueError("未能生成有效的实验框架")
+            logging.info("framework节点完成，已确定实验目标和整体框架")
+            return result
+        
+        # 数据集处理方案和评估指标，只依赖用户请求
+        async def data_node(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            logging.info(f"【分批生成】data：设计数据集处理方案和评估指标")
+            prompt = f"""系统指令:
 {system_prompt}
 
 用户查询:
-基于第一轮确定的实验目标和框架，请详细设计数据集处理方案和评估指标。
+请为以下实验详细设计数据集处理方案和评估指标。
 
-实验标题: {combined_result.get('experiment_title', experiment_name or '推荐系统实验')}
-研究问题: {', '.join(combined_result.get('research_questions', ['未指定']))}
-技术路线: {combined_result.get('technical_approach', '未指定')}
+实验名称: {experiment_name or "推荐系统实验"}
+{f"实验描述: {experiment_description}" if experiment_description else ""}
 
 请为该实验选择合适的数据集，详细说明数据预处理流程、数据分割方法，并选择适当的评估指标。所选数据集和指标必须是学术界公认且广泛使用的，请注明每个选择的依据和参考文献。
 
@@ -2332,51 +2655,43 @@ async def get_experiment_design(
 }}
 ```
 """
-            
-            # 第二轮生成
-            round2_response = await ai_assistant.generate_completion(
-                prompt=round2_prompt,
-                system_prompt=system_prompt,
-                max_tokens=2500,
-                temperature=0.7
-            )
-            
-            # 解析第二轮结果
-            round2_data = extract_json_from_response(round2_response)
-            if round2_data:
-                # 合并到总结果中
-                combined_result.update(round2_data)
-                logging.info(f"第二轮生成完成，已设计数据集处理方案和评估指标")
-            else:
-                logging.warning("无法解析第二轮数据，使用默认数据集和评估指标")
-                combined_result["datasets"] = [{
-                    "name": "MovieLens-1M",
-                    "source": "GroupLens Research",
-                    "description": "包含6000名用户对4000部电影的100万条评分数据",
-                    "preprocessing": ["去除评分为0的记录", "按时间戳排序", "转换为隐式反馈"],
-                    "split_strategy": "时序分割，最后一次交互作为测试集"
-                }]
-                combined_result["evaluation_metrics"] = [{
-                    "name": "NDCG@K",
-                    "description": "归一化折损累计增益，评估推荐列表的排序质量",
-                    "justification": "学术界标准排序质量指标"
-                }, {
-                    "name": "Recall@K",
-                    "description": "推荐列表中命中测试集物品的比例",
-                    "justification": "广泛使用的覆盖率指标"
-                }]
-            
-            # 第三轮：基线方法和提出的方法
-            logging.info(f"【分批生成】第三轮：确定基线方法和实现细节")
-            round3_prompt = f"""系统指令:
+            result = await run_node("data", prompt, 2500)
+            if result:
+                logging.info(f"data节点完成，已设计数据集处理方案和评估指标")
+                return result
+            logging.warning("无法解析data节点结果，使用默认数据集和评估指标")
+            result = {}
+            result["datasets"] = [{
+                "name": "MovieLens-1M",
+                "source": "GroupLens Research",
+                "description": "包含6000名用户对4000部电影的100万条评分数据",
+                "preprocessing": ["去除评分为0的记录", "按时间戳排序", "转换为隐式反馈"],
+                "split_strategy": "时序分割，最后一次交互作为测试集"
+            }]
+            result["evaluation_metrics"] = [{
+                "name": "NDCG@K",
+                "description": "归一化折损累计增益，评估推荐列表的排序质量",
+                "justification": "学术界标准排序质量指标"
+            }, {
+                "name": "Recall@K",
+                "description": "推荐列表中命中测试集物品的比例",
+                "justification": "广泛使用的覆盖率指标"
+            }]
+            return result
+        
+        # 基线方法和提出的方法
+        async def methods_node(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            framework_result, data_result = inputs["framework"], inputs["data"]
+            logging.info(f"【分批生成】methods：确定基线方法和实现细节")
+            prompt = f"""系统指令:
 {system_prompt}
 
 用户查询:
-基于前两轮确定的实验目标、数据集和评估指标，请详细设计基线方法和实现细节。
+基于已确定的实验目标、数据集和评估指标，请详细设计基线方法和实现细节。
 
-实验标题: {combined_result.get('experiment_title', experiment_name or '推荐系统实验')}
-选择的数据集: {', '.join([d.get('name', '未命名数据集') for d in combined_result.get('datasets', [])])}
-评估指标: {', '.join([m.get('name', '未命名指标') for m in combined_result.get('evaluation_metrics', [])])}
+实验标题: {framework_result.get('experiment_title', experiment_name or '推荐系统实验')}
+选择的数据集: {', '.join([d.get('name', '未命名数据集') for d in data_result.get('datasets', [])])}
+评估指标: {', '.join([m.get('name', '未命名指标') for m in data_result.get('evaluation_metrics', [])])}
 
 请选择合适的基线方法，详细说明每种方法的实现细节、超参数配置和训练流程。所选基线必须包括该领域经典方法和最新SOTA方法，确保公平比较。同时，详细描述您提出的方法（如果适用）或实验的核心实现细节。
 
@@ -2423,47 +2738,38 @@ async def get_experiment_design(
 }}
 ```
 """
-            
-            # 第三轮生成
-            round3_response = await ai_assistant.generate_completion(
-                prompt=round3_prompt,
-                system_prompt=system_prompt,
-                max_tokens=3000,
-                temperature=0.7
-            )
-            
-            # 解析第三轮结果
-            round3_data = extract_json_from_response(round3_response)
-            if round3_data:
-                # 合并到总结果中
-                combined_result.update(round3_data)
-                logging.info(f"第三轮生成完成，已确定基线方法和实现细节")
-            else:
-                logging.warning("无法解析第三轮数据，使用默认基线方法")
-                # 设置默认基线方法
-                combined_result["baseline_methods"] = [{
-                    "name": "BPR-MF",
-                    "type": "经典方法",
-                    "description": "贝叶斯个性化排序矩阵分解，经典的隐式反馈推荐方法",
-                    "reference_paper": "Rendle et al., 2009. BPR: Bayesian Personalized Ranking from Implicit Feedback. UAI."
-                }, {
-                    "name": "LightGCN",
-                    "type": "SOTA方法",
-                    "description": "轻量级图卷积网络，移除了传统GCN中的特征变换和非线性激活",
-                    "reference_paper": "He et al., 2020. LightGCN: Simplifying and Powering Graph Convolution Network for Recommendation. SIGIR."
-                }]
-            
-            # 第四轮：消融实验和参数敏感性分析
-            logging.info(f"【分批生成】第四轮：设计消融实验和参数敏感性分析")
-            round4_prompt = f"""系统指令:
+            result = await run_node("methods", prompt, 3000)
+            if result:
+                logging.info(f"methods节点完成，已确定基线方法和实现细节")
+                return result
+            logging.warning("无法解析methods节点结果，使用默认基线方法")
+            result = {}
+            result["baseline_methods"] = [{
+                "name": "BPR-MF",
+                "type": "经典方法",
+                "description": "贝叶斯个性化排序矩阵分解，经典的隐式反馈推荐方法",
+                "reference_paper": "Rendle et al., 2009. BPR: Bayesian Personalized Ranking from Implicit Feedback. UAI."
+            }, {
+                "name": "LightGCN",
+                "type": "SOTA方法",
+                "description": "轻量级图卷积网络，移除了传统GCN中的特征变换和非线性激活",
+                "reference_paper": "He et al., 2020. LightGCN: Simplifying and Powering Graph Convolution Network for Recommendation. SIGIR."
+            }]
+            return result
+        
+        # 消融实验和参数敏感性分析
+        async def ablation_node(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            framework_result, methods_result = inputs["framework"], inputs["methods"]
+            logging.info(f"【分批生成】ablation：设计消融实验和参数敏感性分析")
+            prompt = f"""系统指令:
 {system_prompt}
 
 用户查询:
-基于前三轮的设计，请详细规划消融实验和参数敏感性分析。
+基于已确定的实验框架和方法设计，请详细规划消融实验和参数敏感性分析。
 
-实验标题: {combined_result.get('experiment_title', experiment_name or '推荐系统实验')}
-提出的方法: {combined_result.get('proposed_method', {}).get('name', '方法未命名')}
-核心组件: {combined_result.get('proposed_method', {}).get('architecture', '未详细说明')}
+实验标题: {framework_result.get('experiment_title', experiment_name or '推荐系统实验')}
+提出的方法: {methods_result.get('proposed_method', {}).get('name', '方法未命名')}
+核心组件: {methods_result.get('proposed_method', {}).get('architecture', '未详细说明')}
 
 请设计完整的消融实验，以验证提出方法中各个组件的有效性，并设计参数敏感性分析，以研究关键超参数对性能的影响。确保实验设计符合学术界标准，能够全面评估方法的各个方面。
 
@@ -2498,44 +2804,36 @@ async def get_experiment_design(
 }}
 ```
 """
-            
-            # 第四轮生成
-            round4_response = await ai_assistant.generate_completion(
-                prompt=round4_prompt,
-                system_prompt=system_prompt,
-                max_tokens=2500,
-                temperature=0.7
-            )
-            
-            # 解析第四轮结果
-            round4_data = extract_json_from_response(round4_response)
-            if round4_data:
-                # 合并到总结果中
-                combined_result.update(round4_data)
-                logging.info(f"第四轮生成完成，已设计消融实验和参数敏感性分析")
-            else:
-                logging.warning("无法解析第四轮数据，使用默认消融实验设计")
-                combined_result["ablation_studies"] = [{
-                    "component": "主要组件",
-                    "purpose": "验证该组件的必要性",
-                    "variant_description": "移除该组件的变体",
-                    "expected_outcome": "性能下降，证明该组件的有效性"
-                }]
-                combined_result["parameter_sensitivity"] = [{
-                    "parameter": "嵌入维度",
-                    "range": "16, 32, 64, 128, 256",
-                    "importance": "影响模型表达能力和过拟合风险"
-                }]
-            
-            # 第五轮：核心代码实现
-            logging.info(f"【分批生成】第五轮：实现核心代码和分析方法")
-            round5_prompt = f"""系统指令:
+            result = await run_node("ablation", prompt, 2500)
+            if result:
+                logging.info(f"ablation节点完成，已设计消融实验和参数敏感性分析")
+                return result
+            logging.warning("无法解析ablation节点结果，使用默认消融实验设计")
+            result = {}
+            result["ablation_studies"] = [{
+                "component": "主要组件",
+                "purpose": "验证该组件的必要性",
+                "variant_description": "移除该组件的变体",
+                "expected_outcome": "性能下降，证明该组件的有效性"
+            }]
+            result["parameter_sensitivity"] = [{
+                "parameter": "嵌入维度",
+                "range": "16, 32, 64, 128, 256",
+                "importance": "影响模型表达能力和过拟合风险"
+            }]
+            return result
+        
+        # 核心代码实现
+        async def code_node(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            framework_result = inputs["framework"]
+            logging.info(f"【分批生成】code：实现核心代码和分析方法")
+            prompt = f"""系统指令:
 {system_prompt}
 
 用户查询:
-基于前四轮的设计，请实现核心代码和结果分析方法，特别注意生成符合前端展示需求的标准格式。
+基于已确定的实验框架，请实现核心代码和结果分析方法，特别注意生成符合前端展示需求的标准格式。
 
-实验标题: {combined_result.get('experiment_title', experiment_name or '推荐系统实验')}
+实验标题: {framework_result.get('experiment_title', experiment_name or '推荐系统实验')}
 框架: {framework}
 编程语言: {language}
 
@@ -2580,45 +2878,57 @@ async def get_experiment_design(
   "dependencies": ["numpy", "torch", "pandas", "scikit-learn", "matplotlib"]
 }}
 ```"""
-
-            # 第五轮生成，使用更大token以包纳代码
-            round5_response = await ai_assistant.generate_completion(
-                prompt=round5_prompt,
-                system_prompt=system_prompt,
-                max_tokens=4000,
-                temperature=0.7
-            )
+            # 使用更大token以包纳代码
+            result = await run_node("code", prompt, 4000)
+            if result:
+                logging.info(f"code节点完成，已实现核心代码和分析方法")
+                return result
+            logging.warning("无法解析code节点结果，使用简化版代码实现")
+            # 设置简化版代码实现，不影响其他节点的设计
+            result = {}
+            result["code_structure"] = [{
+                "file_name": "data_processor.py",
+                "purpose": "数据加载与预处理",
+                "code_content": "# 完整代码将在API成功响应时提供\n# 这是占位代码\nimport torch\nimport pandas as pd\nimport numpy as np\n\ndef load_data(dataset_path, split_ratio=0.8):\n    print('加载数据集')\n    # 数据加载和预处理代码\n    return train_data, test_data"
+            }, {
+                "file_name": "model.py",
+                "purpose": "模型架构定义",
+                "code_content": "# 模型定义代码\nimport torch\nimport torch.nn as nn\n\nclass RecommendationModel(nn.Module):\n    def __init__(self, user_num, item_num, embedding_dim):\n        super(RecommendationModel, self).__init__()\n        # 模型定义代码\n        self.user_embedding = nn.Embedding(user_num, embedding_dim)\n        self.item_embedding = nn.Embedding(item_num, embedding_dim)\n    \n    def forward(self, user_ids, item_ids):\n        # 前向传播实现\n        return scores"
+            }, {
+                "file_name": "train.py",
+                "purpose": "训练流程实现",
+                "code_content": "# 训练代码\nimport torch\nimport torch.optim as optim\nfrom model import RecommendationModel\nfrom data_processor import load_data\n\ndef train(model, train_data, epochs=100, lr=0.001):\n    # 训练流程实现\n    optimizer = optim.Adam(model.parameters(), lr=lr)\n    # 训练循环\n    return model"
+            }]
+            result["codeSnippet"] = "# 核心模型实现\nclass RecommendationModel(nn.Module):\n    def __init__(self, user_num, item_num, embedding_dim):\n        super(RecommendationModel, self).__init__()\n        self.user_embedding = nn.Embedding(user_num, embedding_dim)\n        self.item_embedding = nn.Embedding(item_num, embedding_dim)\n    \n    def forward(self, user_ids, item_ids):\n        user_embeds = self.user_embedding(user_ids)\n        item_embeds = self.item_embedding(item_ids)\n        scores = torch.sum(user_embeds * item_embeds, dim=1)\n        return scores"
+            result["usage_example"] = "# 模型使用示例\nmodel = RecommendationModel(user_num, item_num, embedding_dim=64)\ntrain_data, test_data = load_data('dataset.csv')\ntrained_model = train(model, train_data, epochs=100, lr=0.001)"
+            result["dependencies"] = ["numpy", "pandas", "torch", "scikit-learn", "matplotlib"]
+            return result
+        
+        # 各节点只依赖实际用到的上游结果，framework和data立即开始，
+        # 关键路径为 data -> methods -> ablation，code与之并行
+        scheduler = StageScheduler(max_concurrency=settings.ASSISTANT_FANOUT_CONCURRENCY)
+        scheduler.add_stage("framework", framework_node)
+        scheduler.add_stage("data", data_node)
+        scheduler.add_stage("methods", methods_node, depends_on=["framework", "data"])
+        scheduler.add_stage("ablation", ablation_node, depends_on=["framework", "methods"])
+        scheduler.add_stage("code", code_node, depends_on=["framework"])
+        
+        try:
+            results = await scheduler.run()
+            for node in EXPERIMENT_DESIGN_NODES:
+                if node in scheduler.errors and not isinstance(scheduler.errors[node], StageSkipped):
+                    raise scheduler.errors[node]
             
-            # 解析第五轮结果
-            round5_data = extract_json_from_response(round5_response)
-            if round5_data:
-                # 合并到总结果中
-                combined_result.update(round5_data)
-                logging.info(f"第五轮生成完成，已实现核心代码和分析方法")
-            else:
-                logging.warning("无法解析第五轮数据，使用简化版代码实现")
-                # 设置简化版代码实现，不影响前四轮的设计
-                combined_result["code_structure"] = [{
-                    "file_name": "data_processor.py",
-                    "purpose": "数据加载与预处理",
-                    "code_content": "# 完整代码将在API成功响应时提供\n# 这是占位代码\nimport torch\nimport pandas as pd\nimport numpy as np\n\ndef load_data(dataset_path, split_ratio=0.8):\n    print('加载数据集')\n    # 数据加载和预处理代码\n    return train_data, test_data"
-                }, {
-                    "file_name": "model.py",
-                    "purpose": "模型架构定义",
-                    "code_content": "# 模型定义代码\nimport torch\nimport torch.nn as nn\n\nclass RecommendationModel(nn.Module):\n    def __init__(self, user_num, item_num, embedding_dim):\n        super(RecommendationModel, self).__init__()\n        # 模型定义代码\n        self.user_embedding = nn.Embedding(user_num, embedding_dim)\n        self.item_embedding = nn.Embedding(item_num, embedding_dim)\n    \n    def forward(self, user_ids, item_ids):\n        # 前向传播实现\n        return scores"
-                }, {
-                    "file_name": "train.py",
-                    "purpose": "训练流程实现",
-                    "code_content": "# 训练代码\nimport torch\nimport torch.optim as optim\nfrom model import RecommendationModel\nfrom data_processor import load_data\n\ndef train(model, train_data, epochs=100, lr=0.001):\n    # 训练流程实现\n    optimizer = optim.Adam(model.parameters(), lr=lr)\n    # 训练循环\n    return model"
-                }]
-                combined_result["codeSnippet"] = "# 核心模型实现\nclass RecommendationModel(nn.Module):\n    def __init__(self, user_num, item_num, embedding_dim):\n        super(RecommendationModel, self).__init__()\n        self.user_embedding = nn.Embedding(user_num, embedding_dim)\n        self.item_embedding = nn.Embedding(item_num, embedding_dim)\n    \n    def forward(self, user_ids, item_ids):\n        user_embeds = self.user_embedding(user_ids)\n        item_embeds = self.item_embedding(item_ids)\n        scores = torch.sum(user_embeds * item_embeds, dim=1)\n        return scores"
-                combined_result["usage_example"] = "# 模型使用示例\nmodel = RecommendationModel(user_num, item_num, embedding_dim=64)\ntrain_data, test_data = load_data('dataset.csv')\ntrained_model = train(model, train_data, epochs=100, lr=0.001)"
-                combined_result["dependencies"] = ["numpy", "pandas", "torch", "scikit-learn", "matplotlib"]
+            # 按节点顺序合并，与逐轮生成的合并结果一致
+            combined_result = {}
+            for node in EXPERIMENT_DESIGN_NODES:
+                combined_result.update(results[node])
             
             # 整合结果，添加元数据
             combined_result["meta"] = {
-                "generation_approach": "multi_round",
-                "rounds_completed": 5,
+                "generation_approach": "dag",
+                "rounds_completed": len(EXPERIMENT_DESIGN_NODES),
+                "regenerated": sorted(regenerate),
                 "timestamp": datetime.now().isoformat(),
                 "processing_time": time.time() - start_time,
                 "experiment_name": experiment_name or "推荐系统实验",
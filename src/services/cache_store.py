@@ -0,0 +1,184 @@
+"""
+基于SQLite的单文件缓存存储
+
+所有条目保存在一个启用WAL的SQLite文件中，支持TTL过期、按字节预算的LRU淘汰
+以及后台压缩任务。数据库操作在专用线程中执行，不会阻塞事件循环。
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCacheStore:
+    """单文件、带索引、有界的键值缓存"""
+
+    def __init__(self, path: str, ttl: int, max_bytes: int, compact_interval: int = 600):
+        """
+        参数:
+            path: SQLite数据库文件路径
+            ttl: 条目默认过期时间（秒）
+            max_bytes: 所有条目值的总字节数上限，超出时按最近访问时间淘汰
+            compact_interval: 后台压缩任务的执行间隔（秒）
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.compact_interval = compact_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        # 单线程执行器：所有SQLite访问都串行地在该线程中完成
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-store")
+        self._compact_task: Optional[asyncio.Task] = None
+
+    # ---- 以下方法只在执行器线程中调用 ----
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def _get_sync(self, key: str) -> Optional[bytes]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return bytes(value)
+
+    def _set_sync(self, key: str, value: bytes, ttl: Optional[int]):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, sqlite3.Binary(value), len(value), now + (ttl or self.ttl), now)
+        )
+        self._evict_sync(conn)
+
+    def _evict_sync(self, conn: sqlite3.Connection) -> int:
+        """淘汰最近最少访问的条目，直到总大小不超过预算"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        cursor = conn.execute("SELECT key, size FROM cache_entries ORDER BY accessed_at ASC")
+        keys = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            keys.append((key,))
+            total -= size
+        cursor.close()
+        if keys:
+            conn.executemany("DELETE FROM cache_entries WHERE key = ?", keys)
+            evicted = len(keys)
+        return evicted
+
+    def _compact_sync(self) -> dict:
+        conn = self._connect()
+        expired = conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),)).rowcount
+        evicted = self._evict_sync(conn)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if expired or evicted:
+            conn.execute("VACUUM")
+        return {"expired": expired, "evicted": evicted}
+
+    def _stats_sync(self) -> dict:
+        conn = self._connect()
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+    # ---- 异步接口 ----
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """读取未过期的条目，命中时刷新其访问时间"""
+        self.ensure_compaction()
+        try:
+            return await self._run(self._get_sync, key)
+        except Exception as e:
+            logger.warning(f"读取缓存失败: {str(e)}")
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        """写入条目，必要时淘汰旧条目"""
+        try:
+            await self._run(self._set_sync, key, value, ttl)
+        except Exception as e:
+            logger.warning(f"写入缓存失败: {str(e)}")
+
+    async def compact(self) -> dict:
+        """清理过期条目并回收空间"""
+        return await self._run(self._compact_sync)
+
+    async def stats(self) -> dict:
+        return await self._run(self._stats_sync)
+
+    def ensure_compaction(self):
+        """在当前事件循环中启动后台压缩任务（如尚未启动）"""
+        if self._compact_task is not None and not self._compact_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._compact_task = loop.create_task(self._compaction_loop())
+
+    async def _compaction_loop(self):
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                result = await self.compact()
+                if result["expired"] or result["evicted"]:
+                    logger.info(f"缓存压缩完成: 过期{result['expired']}条, 淘汰{result['evicted']}条")
+            except Exception as e:
+                logger.warning(f"缓存压缩失败: {str(e)}")
+
+    async def close(self):
+        """停止后台任务并关闭数据库连接"""
+        if self._compact_task is not None:
+            self._compact_task.cancel()
+            try:
+                await self._compact_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._compact_task = None
+
+        def _close_sync():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await self._run(_close_sync)
@@ -0,0 +1,226 @@
+"""
+分析提示词的上下文选择
+
+论文正文只切分一次：先按章节标题分节，再把长章节按段落切成块。每个分析阶段用一组
+查询词对分块做BM25打分（章节标题与阶段相关时加权），按得分从高到低装入该阶段的
+token预算，最后按原文顺序拼接。这样方法论阶段能看到方法章节，而不是被截断后的开头。
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from src.core.config import settings
+from src.services.library_search import tokenize_text
+from src.services.token_budget import count_tokens
+
+# 分块目标长度（字符），按段落边界切分
+CHUNK_CHARS = 1200
+# BM25参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+# 章节标题与阶段相关时的得分加成
+SECTION_TITLE_BOOST = 1.5
+
+# 章节标题：编号标题（1 Introduction / 2.1 Model）、常见的无编号英文标题、中文标题
+_HEADING_RE = re.compile(
+    r"^\s*(?:"
+    r"(?:\d+(?:\.\d+){0,2}\.?|[IVX]+\.)\s+[A-Z][A-Za-z\- ]{0,60}"
+    r"|(?:abstract|introduction|related work|background|method(?:s|ology)?|approach|experiments?|"
+    r"evaluation|results?|discussion|limitations?|conclusions?|future work|references|appendix)\s*"
+    r"|[一二三四五六七八九十]+[、.．]\s*[^\n]{1,40}"
+    r"|第[一二三四五六七八九十\d]+[章节]\s*[^\n]{0,40}"
+    r")\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_ABSTRACT_RE = re.compile(r"abstract|摘要", re.IGNORECASE)
+
+# 各阶段的查询词和相关章节
+STAGE_QUERIES: Dict[str, Dict[str, str]] = {
+    "METHODOLOGY": {
+        "query": "method approach proposed model architecture framework module component algorithm "
+                 "layer encoder decoder loss objective training 方法 模型 架构 框架 模块 算法 损失 训练",
+        "sections": r"method|approach|model|architecture|framework|proposed|方法|模型",
+    },
+    "FINDINGS": {
+        "query": "results outperform improvement performance accuracy achieve state-of-the-art significant "
+                 "compared table finding conclusion 结果 提升 性能 优于 准确率 结论",
+        "sections": r"result|experiment|evaluation|discussion|conclusion|结果|实验|结论",
+    },
+    "EXPERIMENTS": {
+        "query": "experiment dataset benchmark baseline metric evaluation setup implementation details "
+                 "hyperparameter accuracy f1 bleu results table 实验 数据集 基线 指标 评估 设置",
+        "sections": r"experiment|evaluation|setup|implementation|result|实验|评估",
+    },
+    "WEAKNESSES": {
+        "query": "limitation limitations drawback however fail failure cannot only assume restricted "
+                 "costly expensive future discussion 局限 不足 缺点 然而 无法 假设",
+        "sections": r"limitation|discussion|conclusion|局限|讨论",
+    },
+    "FUTURE_WORK": {
+        "query": "future work direction extend extension plan explore open problem conclusion "
+                 "未来 工作 方向 扩展 展望 结论",
+        "sections": r"future|conclusion|discussion|未来|结论|展望",
+    },
+    "CODE": {
+        "query": "algorithm implementation architecture layer module equation step input output "
+                 "hyperparameter training procedure pseudo code 算法 实现 结构 步骤 公式 输入 输出",
+        "sections": r"method|approach|model|architecture|implementation|algorithm|方法|模型|实现",
+    },
+}
+
+
+class Chunk:
+    """论文的一个分块"""
+
+    def __init__(self, index: int, section: str, text: str):
+        self.index = index
+        self.section = section
+        self.text = text
+        self.term_counts = Counter(tokenize_text(text))
+        self.length = sum(self.term_counts.values())
+        self.tokens = count_tokens(text)
+
+
+def section_offsets(content: str) -> List[Dict[str, object]]:
+    """章节标题及其在正文中的字符位置"""
+    return [{"title": match.group(0).strip(), "offset": match.start()} for match in _HEADING_RE.finditer(content or "")]
+
+
+def split_sections(content: str) -> List[Dict[str, str]]:
+    """按章节标题切分正文，标题之前的内容（标题、作者、摘要）作为第一节"""
+    sections = []
+    matches = list(_HEADING_RE.finditer(content))
+    start, title = 0, "开头"
+    for match in matches:
+        if match.start() > start:
+            sections.append({"title": title, "text": content[start:match.start()]})
+        title = match.group(0).strip()
+        start = match.end()
+    sections.append({"title": title, "text": content[start:]})
+    return [section for section in sections if section["text"].strip()]
+
+
+def split_chunks(content: str, chunk_chars: int = CHUNK_CHARS) -> List[Chunk]:
+    """章节内按段落合并为接近 chunk_chars 的分块，超长段落直接切开"""
+    chunks: List[Chunk] = []
+    for section in split_sections(content):
+        buffer = ""
+        for paragraph in re.split(r"\n\s*\n", section["text"]):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            while len(paragraph) > chunk_chars:
+                if buffer:
+                    chunks.append(Chunk(len(chunks), section["title"], buffer))
+                    buffer = ""
+                chunks.append(Chunk(len(chunks), section["title"], paragraph[:chunk_chars]))
+                paragraph = paragraph[chunk_chars:]
+            if buffer and len(buffer) + len(paragraph) > chunk_chars:
+                chunks.append(Chunk(len(chunks), section["title"], buffer))
+                buffer = ""
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if buffer:
+            chunks.append(Chunk(len(chunks), section["title"], buffer))
+    return chunks
+
+
+def render_chunks(chunks: List[Chunk]) -> str:
+    """按原文顺序拼接，标注章节，不相邻的分块之间用省略号分隔"""
+    parts, previous = [], None
+    for chunk in sorted(chunks, key=lambda item: item.index):
+        if previous is not None and chunk.index != previous.index + 1:
+            parts.append("……")
+        if previous is None or chunk.section != previous.section:
+            parts.append(f"[{chunk.section}]")
+        parts.append(chunk.text)
+        previous = chunk
+    return "\n\n".join(parts)
+
+
+def split_windows(content: str, token_budget: int) -> List[str]:
+    """把全文按顺序切成若干不超过 token_budget 的连续片段（以分块为单位），用于逐段处理长论文"""
+    windows: List[List[Chunk]] = []
+    used = 0
+    for chunk in split_chunks(content or ""):
+        if not windows or used + chunk.tokens > token_budget:
+            windows.append([])
+            used = 0
+        windows[-1].append(chunk)
+        used += chunk.tokens
+    return [render_chunks(window) for window in windows]
+
+
+class PaperContext:
+    """一篇论文的分块和BM25统计，创建一次后供各阶段选择上下文"""
+
+    def __init__(self, content: str, chunk_chars: int = CHUNK_CHARS):
+        self.chunks = split_chunks(content or "", chunk_chars)
+        self.avg_length = (sum(chunk.length for chunk in self.chunks) / len(self.chunks)) if self.chunks else 0
+        document_frequency: Counter = Counter()
+        for chunk in self.chunks:
+            document_frequency.update(chunk.term_counts.keys())
+        total = len(self.chunks)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def _bm25(self, chunk: Chunk, terms: List[str]) -> float:
+        score = 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / (self.avg_length or 1))
+        for term in terms:
+            freq = chunk.term_counts.get(term)
+            if freq:
+                score += self.idf.get(term, 0.0) * freq * (BM25_K1 + 1) / (freq + norm)
+        return score
+
+    def score(self, stage: str) -> List[float]:
+        """各分块对某阶段的相关度"""
+        spec = STAGE_QUERIES[stage]
+        terms = list(dict.fromkeys(tokenize_text(spec["query"])))
+        section_re = re.compile(spec["sections"], re.IGNORECASE)
+        scores = []
+        for chunk in self.chunks:
+            score = self._bm25(chunk, terms)
+            if section_re.search(chunk.section):
+                score = score * SECTION_TITLE_BOOST + 1.0
+            scores.append(score)
+        return scores
+
+    def _pack(self, ordered: List[Chunk], token_budget: int) -> List[Chunk]:
+        selected, used_tokens = [], 0
+        for chunk in ordered:
+            if used_tokens + chunk.tokens > token_budget:
+                continue
+            selected.append(chunk)
+            used_tokens += chunk.tokens
+        return selected
+
+    def outline(self, token_budget: Optional[int] = None) -> str:
+        """章节结构阶段：每节取开头的分块，覆盖全文结构"""
+        token_budget = token_budget or settings.ANALYSIS_CONTEXT_TOKEN_BUDGET
+        firsts, seen = [], set()
+        for chunk in self.chunks:
+            if chunk.section not in seen:
+                seen.add(chunk.section)
+                firsts.append(chunk)
+        return render_chunks(self._pack(firsts, token_budget))
+
+    def select(self, stage: str, token_budget: Optional[int] = None) -> str:
+        """为某阶段选出得分最高的分块，始终包含开头和摘要"""
+        if stage == "SECTIONS":
+            return self.outline(token_budget)
+        if not self.chunks:
+            return ""
+        token_budget = token_budget or settings.ANALYSIS_CONTEXT_TOKEN_BUDGET
+        scores = self.score(stage)
+        anchors = [chunk for chunk in self.chunks if chunk.index == 0 or _ABSTRACT_RE.match(chunk.section)][:2]
+        ranked = sorted((chunk for chunk in self.chunks if chunk not in anchors), key=lambda chunk: -scores[chunk.index])
+        return render_chunks(self._pack(anchors + ranked, token_budget))
+
+    def select_all(self, stages: List[str]) -> Dict[str, str]:
+        contexts = {stage: self.select(stage) for stage in stages}
+        for stage, context in contexts.items():
+            print(f"{stage}阶段上下文: {len(context)}字符, {count_tokens(context)} tokens")
+        return contexts
@@ -0,0 +1,275 @@
+"""
+论文库全文检索
+
+PostgreSQL 使用 papers.search_vector（tsvector + GIN索引），SQLite 使用 FTS5 虚拟表 paper_fts，
+其他数据库退回 ILIKE。中文没有空格分词，索引和查询两侧都先在Python中用jieba切词
+（未安装jieba时按字二元组切分），再以空格拼接交给数据库，因此文本搜索配置使用 simple 即可。
+
+索引由应用在论文创建、更新和内容变更后写入。已有数据可通过以下命令重建：
+
+    python -m src.services.library_search --rebuild
+"""
+import argparse
+import html
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DDL, bindparam, case, column, event, func, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.models.paper import Paper
+
+try:
+    import jieba
+    jieba.setLogLevel(60)  # 屏蔽加载词典时的日志
+except ImportError:
+    jieba = None
+
+# 单词/汉字串的匹配规则，其余字符（标点、tsquery和FTS5的运算符）一律丢弃
+_WORD_RE = re.compile(r"[0-9a-zA-Z_À-ɏ]+|[㐀-鿿豈-﫿]+")
+_CJK_RE = re.compile(r"[㐀-鿿豈-﫿]")
+
+# 查询最多使用的词数，避免超长查询生成巨大的tsquery
+MAX_QUERY_TERMS = 16
+# 摘要片段在命中词前后保留的字符数
+SNIPPET_RADIUS = 60
+
+# SQLite 下的FTS5索引表，随papers表一起创建
+FTS_TABLE = "paper_fts"
+paper_fts = table(FTS_TABLE, column("paper_id"), column("rank"))
+
+event.listen(
+    Paper.__table__,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        "USING fts5(paper_id UNINDEXED, title, abstract, content)"
+    ).execute_if(dialect="sqlite"),
+)
+
+
+def _cut(segment: str) -> List[str]:
+    """切分一段连续的汉字"""
+    if jieba is not None and settings.LIBRARY_SEARCH_TOKENIZER == "jieba":
+        return [word for word in jieba.cut_for_search(segment) if word.strip()]
+    if len(segment) == 1:
+        return [segment]
+    return [segment[i:i + 2] for i in range(len(segment) - 1)]
+
+
+def tokenize_text(value: Optional[str]) -> List[str]:
+    """将文本切分为小写词序列，索引和查询共用同一规则"""
+    if not value:
+        return []
+    tokens: List[str] = []
+    for match in _WORD_RE.finditer(value):
+        word = match.group(0)
+        if _CJK_RE.match(word):
+            tokens.extend(_cut(word))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def query_terms(query: str) -> List[str]:
+    """去重后的查询词，保持原有顺序"""
+    return list(dict.fromkeys(tokenize_text(query)))[:MAX_QUERY_TERMS]
+
+
+def dialect_name(db) -> str:
+    """当前会话连接的数据库类型（同步和异步会话均可）"""
+    return db.get_bind().dialect.name
+
+
+def _index_text(paper: Paper) -> Dict[str, str]:
+    content = (paper.content or "")[:settings.LIBRARY_SEARCH_MAX_CONTENT_CHARS]
+    return {
+        "title": " ".join(tokenize_text(paper.title)),
+        "abstract": " ".join(tokenize_text(paper.abstract)),
+        "content": " ".join(tokenize_text(content)),
+    }
+
+
+def build_search_clause(db, query: str) -> Tuple[Optional[Any], Optional[Any]]:
+    """
+    生成论文库搜索的过滤条件和相关度表达式
+
+    返回 (where, rank)，可直接用于 Query.filter / Select.where 和 order_by；
+    查询中没有可用的词时返回 (None, None)，退回ILIKE时 rank 为 None。
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None, None
+
+    dialect = dialect_name(db)
+    if dialect == "postgresql":
+        # 最后一个词按前缀匹配，输入过程中即可命中
+        tsquery_text = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        tsquery = func.to_tsquery(settings.LIBRARY_SEARCH_TS_CONFIG, tsquery_text)
+        return Paper.search_vector.op("@@")(tsquery), func.ts_rank_cd(Paper.search_vector, tsquery)
+
+    if dialect == "sqlite":
+        fts_query = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        match = literal_column(FTS_TABLE).op("MATCH")(bindparam("fts_query", fts_query.strip()))
+        where = Paper.id.in_(select(paper_fts.c.paper_id).where(match))
+        # FTS5的rank为bm25得分，越小越相关
+        rank = -select(paper_fts.c.rank).where(paper_fts.c.paper_id == Paper.id, match).scalar_subquery()
+        return where, rank
+
+    search = f"%{query}%"
+    return or_(
+        Paper.title.ilike(search),
+        Paper.abstract.ilike(search),
+        Paper.content.ilike(search),
+    ), None
+
+
+def index_paper(db: Session, paper: Paper, commit: bool = True):
+    """写入（或刷新）单篇论文的全文索引"""
+    dialect = dialect_name(db)
+    if dialect not in ("postgresql", "sqlite"):
+        return
+    try:
+        params = {"paper_id": paper.id, **_index_text(paper)}
+        if dialect == "postgresql":
+            db.execute(text(
+                "UPDATE papers SET search_vector = "
+                "setweight(to_tsvector(CAST(:config AS regconfig), :title), 'A') || "
+                "setweight(to_tsvector(CAST(:config AS regconfig), :abstract), 'B') || "
+                "setweight(to_tsvector(CAST(:config AS regconfig), :content), 'C') "
+                "WHERE id = :paper_id"
+            ), {**params, "config": settings.LIBRARY_SEARCH_TS_CONFIG})
+        else:
+            _ensure_fts_table(db)
+            db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE paper_id = :paper_id"), params)
+            db.execute(text(
+                f"INSERT INTO {FTS_TABLE} (paper_id, title, abstract, content) "
+                "VALUES (:paper_id, :title, :abstract, :content)"
+            ), params)
+        if commit:
+            db.commit()
+    except Exception as e:
+        # 索引失败不影响论文本身的保存，可通过 --rebuild 补建
+        if commit:
+            db.rollback()
+        print(f"更新论文全文索引失败: paper_id={paper.id}, error={str(e)}")
+
+
+def remove_paper_from_index(db: Session, paper_id: str):
+    """删除论文的全文索引（PostgreSQL的索引列随行删除，只需处理FTS5表）"""
+    if dialect_name(db) == "sqlite":
+        _ensure_fts_table(db)
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE paper_id = :paper_id"), {"paper_id": paper_id})
+
+
+def _ensure_fts_table(db: Session):
+    db.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        "USING fts5(paper_id UNINDEXED, title, abstract, content)"
+    ))
+
+
+def make_snippet(value: Optional[str], terms: Iterable[str], radius: int = SNIPPET_RADIUS) -> Optional[str]:
+    """截取第一个命中词附近的文本并用<mark>高亮所有命中词，没有命中时返回None"""
+    if not value:
+        return None
+    terms = sorted({term for term in terms if term}, key=len, reverse=True)
+    if not terms:
+        return None
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    first = pattern.search(value)
+    if first is None:
+        return None
+
+    start = max(0, first.start() - radius)
+    end = min(len(value), first.end() + radius)
+    window = value[start:end]
+
+    parts: List[str] = []
+    last = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last = match.end()
+    parts.append(html.escape(window[last:]))
+
+    snippet = " ".join("".join(parts).split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(value) else "")
+
+
+def content_window_statement(db, paper_ids: List[str], term: str, radius: int = SNIPPET_RADIUS):
+    """
+    在数据库中截取正文里命中词附近的片段，避免把整篇正文读回应用
+
+    返回 select(id, 片段) 语句，由调用方以同步或异步会话执行。
+    """
+    position_func = func.strpos if dialect_name(db) == "postgresql" else func.instr
+    position = position_func(func.lower(Paper.content), term.lower())
+    start = case((position > radius, position - radius), else_=1)
+    return (
+        select(Paper.id, func.substr(Paper.content, start, radius * 2 + len(term)))
+        .where(Paper.id.in_(paper_ids), position > 0)
+    )
+
+
+def snippet_candidates(papers: Iterable[Paper], query: str) -> Tuple[Dict[str, str], List[str]]:
+    """
+    先用标题和摘要生成片段
+
+    返回 (已生成的片段, 需要从正文中截取片段的论文ID)
+    """
+    terms = query_terms(query)
+    snippets: Dict[str, str] = {}
+    missing: List[str] = []
+    for paper in papers:
+        snippet = make_snippet(paper.abstract, terms) or make_snippet(paper.title, terms)
+        if snippet:
+            snippets[paper.id] = snippet
+        else:
+            missing.append(paper.id)
+    return snippets, missing
+
+
+def rebuild_library_index(db: Session, batch_size: int = 100) -> int:
+    """重建所有论文的全文索引"""
+    if dialect_name(db) == "sqlite":
+        _ensure_fts_table(db)
+        db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        db.commit()
+
+    total = 0
+    last_id = ""
+    while True:
+        papers = db.query(Paper).filter(Paper.id > last_id).order_by(Paper.id).limit(batch_size).all()
+        if not papers:
+            break
+        for paper in papers:
+            index_paper(db, paper, commit=False)
+        db.commit()
+        total += len(papers)
+        last_id = papers[-1].id
+        db.expunge_all()
+        print(f"已重建{total}篇论文的全文索引")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="论文库全文索引")
+    parser.add_argument("--rebuild", action="store_true", help="重建所有论文的全文索引")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    from src.db.session import SessionLocal
+    db = SessionLocal()
+    try:
+        total = rebuild_library_index(db)
+        print(f"全文索引重建完成，共{total}篇论文")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+LLM响应缓存
+
+以 (provider, model, system_prompt, prompt, temperature, max_tokens) 的哈希为键，
+缓存确定性（低温度）调用的响应。一级为进程内LRU缓存，二级为可选的Redis缓存。
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(provider: str, model: str, system_prompt: Optional[str], prompt: str,
+                   temperature: float, max_tokens: Optional[int]) -> str:
+    """根据请求参数生成内容寻址的缓存键"""
+    payload = json.dumps(
+        [str(provider), model, system_prompt or "", prompt, round(float(temperature), 4), max_tokens],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUCache:
+    """进程内LRU缓存，支持TTL以及条目数/字节数上限"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        # key -> (过期时间, 值, 字节数)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value, size = entry
+        if expires_at < time.time():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.time() + self.ttl, value, size)
+        self.total_bytes += size
+        # 超出上限时淘汰最久未使用的条目
+        while self._data and (len(self._data) > self.max_entries or self.total_bytes > self.max_bytes):
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+
+    def _remove(self, key: str):
+        _, _, size = self._data.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        self._data.clear()
+        self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """基于Redis的共享缓存层，连接失败时自动降级为不可用"""
+
+    key_prefix = "recagent:llm:"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._client = None
+        try:
+            import redis.asyncio as redis_asyncio
+            self._client = redis_asyncio.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD or None,
+                decode_responses=True,
+            )
+        except ImportError:
+            logger.warning("未安装redis包，LLM缓存的Redis层不可用")
+
+    async def get(self, key: str) -> Optional[str]:
+        if self._client is None:
+            return None
+        try:
+            return await self._client.get(self.key_prefix + key)
+        except Exception as e:
+            logger.warning(f"读取Redis缓存失败: {str(e)}")
+            return None
+
+    async def set(self, key: str, value: str):
+        if self._client is None:
+            return
+        try:
+            await self._client.set(self.key_prefix + key, value, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"写入Redis缓存失败: {str(e)}")
+
+
+class LLMResponseCache:
+    """两级LLM响应缓存，并记录命中统计"""
+
+    def __init__(self, enabled: bool = True, backend: str = "memory", ttl: int = 86400,
+                 max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 max_temperature: float = 0.5):
+        self.enabled = enabled
+        self.max_temperature = max_temperature
+        self.memory = MemoryLRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self.remote = RedisCache(ttl=ttl) if backend == "redis" else None
+        self.stats = {"hits": 0, "memory_hits": 0, "remote_hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+    def should_cache(self, temperature: float) -> bool:
+        """高温度的调用结果有随机性，不进行缓存"""
+        return self.enabled and float(temperature) <= self.max_temperature
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            self.stats["memory_hits"] += 1
+            return value
+
+        if self.remote is not None:
+            value = await self.remote.get(key)
+            if value is not None:
+                # 回填到进程内缓存
+                self.memory.set(key, value)
+                self.stats["hits"] += 1
+                self.stats["remote_hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        if not isinstance(value, str) or not value:
+            return
+        self.memory.set(key, value)
+        if self.remote is not None:
+            await self.remote.set(key, value)
+        self.stats["stores"] += 1
+
+    def record_bypass(self):
+        self.stats["bypassed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self.memory),
+            "bytes": self.memory.total_bytes,
+            "backend": "redis" if self.remote is not None else "memory",
+            "enabled": self.enabled,
+        }
+
+    def clear(self):
+        self.memory.clear()
+
+
+# 全局缓存实例
+llm_cache = LLMResponseCache(
+    enabled=settings.LLM_CACHE_ENABLED,
+    backend=settings.LLM_CACHE_BACKEND,
+    ttl=settings.LLM_CACHE_TTL,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+    max_temperature=settings.LLM_CACHE_MAX_TEMPERATURE,
+)
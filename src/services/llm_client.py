@@ -0,0 +1,271 @@
+"""
+LLM HTTP客户端池
+
+为每个AI提供商维护一个进程级共享、保持长连接的 httpx.AsyncClient，
+避免每次调用（以及每次重试）都重新建立TCP/TLS连接。
+流式调用（SSE）也通过这里的客户端发出，按行解析增量输出。
+chat_completion_once 对指定提供商发出单次（不重试的）请求，重试和切换提供商由调用方决定。
+"""
+import asyncio
+import json
+import logging
+import random
+import urllib.parse
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# provider -> (client, 创建该客户端的事件循环)
+_clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+
+def _http2_available() -> bool:
+    """检查是否安装了HTTP/2支持（h2包）"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client(provider: str) -> httpx.AsyncClient:
+    """按配置创建带连接池的客户端"""
+    limits = httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+    # 默认超时，单次请求可以通过 timeout 参数覆盖
+    timeout = httpx.Timeout(connect=20.0, read=60.0, write=20.0, pool=20.0)
+
+    http2 = settings.LLM_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("已启用LLM_HTTP2但未安装h2包，回退到HTTP/1.1")
+        http2 = False
+
+    logger.info(
+        f"创建LLM连接池: provider={provider}, http2={http2}, "
+        f"max_connections={settings.LLM_HTTP_MAX_CONNECTIONS}"
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def get_llm_client(provider: str = None) -> httpx.AsyncClient:
+    """
+    获取指定提供商的共享HTTP客户端
+
+    客户端的连接池绑定在创建它的事件循环上，如果当前事件循环已变化
+    （例如脚本中多次调用 asyncio.run），则重新创建客户端。
+
+    参数:
+        provider: AI提供商名称，默认使用配置中的默认提供商
+
+    返回:
+        共享的 httpx.AsyncClient 实例
+    """
+    provider = str(provider or settings.DEFAULT_AI_PROVIDER)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    entry = _clients.get(provider)
+    if entry is not None:
+        client, client_loop = entry
+        if not client.is_closed and (loop is None or client_loop is loop):
+            return client
+
+    client = _build_client(provider)
+    _clients[provider] = (client, loop)
+    return client
+
+
+async def close_llm_clients():
+    """关闭所有共享客户端，在应用关闭时调用"""
+    entries = list(_clients.items())
+    _clients.clear()
+    for provider, (client, _) in entries:
+        try:
+            await client.aclose()
+            logger.info(f"已关闭LLM连接池: {provider}")
+        except Exception as e:
+            logger.error(f"关闭LLM连接池失败 ({provider}): {str(e)}")
+
+
+class LLMStreamError(Exception):
+    """流式调用失败（已开始输出后不再重试）"""
+
+
+def _parse_sse_line(line: str) -> Optional[str]:
+    """解析一行SSE数据，返回增量文本；流结束返回 None，非数据行返回空字符串"""
+    if not line.startswith("data:"):
+        return ""
+    payload = line[5:].strip()
+    if payload == "[DONE]":
+        return None
+    try:
+        chunk = json.loads(payload)
+    except json.JSONDecodeError:
+        logger.warning(f"无法解析的流式数据: {payload[:200]}")
+        return ""
+    choices = chunk.get("choices") or []
+    if not choices:
+        return ""
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or ""
+
+
+async def stream_chat_completion(
+    provider: str,
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    read_timeout: float = 60.0,
+    max_retries: int = 3,
+) -> AsyncIterator[str]:
+    """
+    以SSE方式调用OpenAI兼容的 chat/completions 接口，逐段产出模型输出的文本
+
+    连接失败、超时、429和5xx在收到第一段输出之前按指数退避重试；已经开始输出后
+    出错直接抛出 LLMStreamError，避免重复输出。read_timeout 是相邻两段数据之间的最长间隔。
+    """
+    payload = dict(payload, stream=True)
+    timeout = httpx.Timeout(connect=20.0, read=read_timeout, write=20.0, pool=20.0)
+    for attempt in range(max_retries):
+        started = False
+        try:
+            async with get_llm_client(provider).stream(
+                "POST", url, json=payload, headers=headers, timeout=timeout
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    error_msg = f"流式API请求失败: 状态码 {response.status_code}, 响应: {body[:500]}"
+                    if response.status_code == 429 or response.status_code >= 500:
+                        raise httpx.HTTPStatusError(error_msg, request=response.request, response=response)
+                    raise LLMStreamError(error_msg)
+                async for line in response.aiter_lines():
+                    text = _parse_sse_line(line)
+                    if text is None:
+                        return
+                    if text:
+                        started = True
+                        yield text
+                return
+        except LLMStreamError:
+            raise
+        except (httpx.TimeoutException, httpx.TransportError, httpx.HTTPStatusError) as e:
+            if started:
+                raise LLMStreamError(f"流式输出中断: {str(e)}")
+            if attempt == max_retries - 1:
+                raise LLMStreamError(f"流式API请求在 {max_retries} 次尝试后仍然失败: {str(e)}")
+            wait_time = 2 ** attempt + random.random() * 2
+            logger.warning(f"流式API请求失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}，等待 {wait_time:.1f} 秒后重试")
+            await asyncio.sleep(wait_time)
+
+
+# Anthropic Messages API 版本
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+class LLMProviderError(Exception):
+    """单次调用失败；retryable 表示稍后或换一个提供商重试可能成功（429、5xx、超时、连接错误）"""
+
+    def __init__(self, message: str, retryable: bool = True, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+
+
+def chat_completions_url(api_base: str) -> str:
+    """OpenAI兼容的 chat/completions 接口地址，API基础URL已包含v1时不再重复添加"""
+    base_url = api_base.rstrip('/')
+    path_parts = urllib.parse.urlparse(base_url).path.strip('/').split('/')
+    if 'v1' in path_parts:
+        return f"{base_url}/chat/completions"
+    return f"{base_url}/v1/chat/completions"
+
+
+def _build_request(provider: str, config: Dict[str, Any], prompt: str, max_tokens: int,
+                   temperature: float, system_prompt: Optional[str]) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """按提供商的接口格式构建 (url, headers, payload)"""
+    if provider == "claude":
+        payload = {
+            "model": config["model"],
+            "max_tokens": int(max_tokens),
+            "temperature": float(temperature),
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": config["api_key"],
+            "anthropic-version": ANTHROPIC_VERSION,
+        }
+        return f"{config['api_base'].rstrip('/')}/messages", headers, payload
+
+    messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    messages.append({"role": "user", "content": prompt})
+    payload = {
+        "model": config["model"],
+        "messages": messages,
+        "temperature": float(temperature),
+        "max_tokens": int(max_tokens),
+        "stream": False,
+    }
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {config['api_key']}"}
+    return chat_completions_url(config["api_base"]), headers, payload
+
+
+def _parse_content(provider: str, result: Dict[str, Any]) -> Optional[str]:
+    if provider == "claude":
+        blocks = [block.get("text", "") for block in result.get("content") or [] if block.get("type") == "text"]
+        return "".join(blocks) if blocks else None
+    choices = result.get("choices") or []
+    if choices:
+        return (choices[0].get("message") or {}).get("content")
+    return None
+
+
+async def chat_completion_once(
+    provider: str,
+    prompt: str,
+    max_tokens: int,
+    temperature: float,
+    system_prompt: Optional[str] = None,
+    read_timeout: float = 60.0,
+) -> str:
+    """
+    向指定提供商发出一次非流式请求，返回模型输出的文本
+
+    使用 settings.AI_PROVIDERS 中该提供商的密钥、地址和模型；Claude使用Messages API，
+    其余提供商使用OpenAI兼容接口。失败时抛出 LLMProviderError，不在这里重试。
+    """
+    config = settings.AI_PROVIDERS[provider]
+    url, headers, payload = _build_request(provider, config, prompt, max_tokens, temperature, system_prompt)
+    timeout = httpx.Timeout(connect=20.0, read=read_timeout, write=20.0, pool=20.0)
+    try:
+        response = await get_llm_client(provider).post(url, json=payload, headers=headers, timeout=timeout)
+    except httpx.TimeoutException as e:
+        raise LLMProviderError(f"{provider} 请求超时: {str(e) or type(e).__name__}")
+    except httpx.TransportError as e:
+        raise LLMProviderError(f"{provider} 连接错误: {str(e) or type(e).__name__}")
+
+    if response.status_code != 200:
+        retryable = response.status_code == 429 or response.status_code >= 500
+        raise LLMProviderError(
+            f"{provider} 请求失败: 状态码 {response.status_code}, 响应: {response.text[:500]}",
+            retryable=retryable,
+            status_code=response.status_code,
+        )
+    try:
+        content = _parse_content(provider, response.json())
+    except ValueError:
+        content = None
+    if content is None:
+        raise LLMProviderError(f"{provider} 响应格式异常: {response.text[:500]}")
+    return content
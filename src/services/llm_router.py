@@ -0,0 +1,178 @@
+"""
+LLM多提供商路由
+
+在配置了API密钥的提供商（DeepSeek、OpenAI、Claude）之间为每次调用选择提供商：
+按提供商和任务类型记录EWMA延迟，按提供商记录EWMA错误率；连续失败达到阈值后熔断一段时间。
+首选提供商按「配置权重 × 健康分」加权随机选出（权重用于控制各提供商的流量和成本，
+权重为0的提供商只用于故障切换），其余健康的提供商按健康分排序作为切换顺序。
+"""
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK = "default"
+# 还没有延迟数据时假定的延迟（秒），新加入的提供商也能分到流量
+INITIAL_LATENCY = 10.0
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """解析 deepseek:3,openai:1 格式的权重"""
+    weights = {}
+    for item in (value or "").split(","):
+        name, _, weight = item.partition(":")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = max(0.0, float(weight))
+    return weights
+
+
+def _parse_task_providers(value: str) -> Dict[str, List[str]]:
+    """解析 code:openai|claude;analysis:deepseek|openai 格式的任务类型路由"""
+    routes = {}
+    for item in (value or "").split(";"):
+        task, _, providers = item.partition(":")
+        names = [name.strip() for name in providers.split("|") if name.strip()]
+        if task.strip() and names:
+            routes[task.strip()] = names
+    return routes
+
+
+class ProviderHealth:
+    """单个提供商的延迟、错误率和熔断状态"""
+
+    def __init__(self, name: str):
+        self.name = name
+        # 任务类型 -> EWMA延迟（秒）
+        self.latency: Dict[str, float] = {}
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def expected_latency(self, task: str) -> float:
+        """该任务类型的EWMA延迟；没有数据时取其他任务类型的平均值"""
+        if task in self.latency:
+            return self.latency[task]
+        if self.latency:
+            return sum(self.latency.values()) / len(self.latency)
+        return INITIAL_LATENCY
+
+
+class LLMRouter:
+    """按延迟、错误率和权重在多个提供商之间路由LLM调用"""
+
+    def __init__(self, providers: List[str], enabled: bool = True,
+                 weights: Optional[Dict[str, float]] = None,
+                 task_providers: Optional[Dict[str, List[str]]] = None,
+                 alpha: float = 0.3, failure_threshold: int = 3, cooldown: float = 60.0):
+        self.enabled = enabled
+        self.providers = providers
+        self.weights = weights or {}
+        self.task_providers = task_providers or {}
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health = {name: ProviderHealth(name) for name in providers}
+
+    @classmethod
+    def from_settings(cls) -> "LLMRouter":
+        """只使用配置中已设置API密钥的提供商"""
+        providers = [
+            name.strip() for name in settings.LLM_ROUTER_PROVIDERS.split(",")
+            if name.strip() in settings.AI_PROVIDERS and settings.AI_PROVIDERS[name.strip()].get("api_key")
+        ]
+        return cls(
+            providers=providers,
+            enabled=settings.LLM_ROUTER_ENABLED,
+            weights=_parse_weights(settings.LLM_ROUTER_WEIGHTS),
+            task_providers=_parse_task_providers(settings.LLM_ROUTER_TASK_PROVIDERS),
+            alpha=settings.LLM_ROUTER_EWMA_ALPHA,
+            failure_threshold=settings.LLM_ROUTER_FAILURE_THRESHOLD,
+            cooldown=settings.LLM_ROUTER_COOLDOWN,
+        )
+
+    @property
+    def active(self) -> bool:
+        """至少有两个可用的提供商时才进行路由，否则沿用单一提供商的调用方式"""
+        return self.enabled and len(self.providers) >= 2
+
+    def _score(self, name: str, task: str) -> float:
+        health = self.health[name]
+        return (1.0 - health.error_rate) / max(health.expected_latency(task), 0.1)
+
+    def candidates(self, task: str = DEFAULT_TASK) -> List[str]:
+        """本次调用依次尝试的提供商，第一个为首选"""
+        allowed = [name for name in self.task_providers.get(task, self.providers) if name in self.health]
+        allowed = allowed or list(self.providers)
+        now = time.time()
+        healthy = [name for name in allowed if self.health[name].available(now)]
+        if not healthy:
+            # 全部熔断时按熔断到期的先后尝试
+            return sorted(allowed, key=lambda name: self.health[name].open_until)
+
+        scores = {name: self._score(name, task) for name in healthy}
+        shares = [self.weights.get(name, 1.0) * scores[name] for name in healthy]
+        if sum(shares) > 0:
+            first = random.choices(healthy, weights=shares)[0]
+        else:
+            first = max(healthy, key=lambda name: scores[name])
+        return [first] + sorted((name for name in healthy if name != first), key=lambda name: -scores[name])
+
+    def record_success(self, name: str, task: str, latency: float):
+        health = self.health[name]
+        previous = health.latency.get(task)
+        health.latency[task] = latency if previous is None else self.alpha * latency + (1 - self.alpha) * previous
+        health.error_rate *= (1 - self.alpha)
+        health.consecutive_failures = 0
+        health.open_until = 0.0
+        health.calls += 1
+
+    def record_failure(self, name: str, penalize: bool = True):
+        """
+        记录一次失败
+
+        penalize=False 用于请求本身的问题（如400参数错误），只计数，不影响健康状态。
+        """
+        health = self.health[name]
+        health.calls += 1
+        health.failures += 1
+        if not penalize:
+            return
+        health.error_rate = self.alpha + (1 - self.alpha) * health.error_rate
+        health.consecutive_failures += 1
+        if health.consecutive_failures >= self.failure_threshold:
+            # 熔断期结束后的第一次调用再失败会立即重新熔断
+            health.open_until = time.time() + self.cooldown
+            logger.warning(f"提供商 {name} 连续失败{health.consecutive_failures}次，暂停路由{self.cooldown:.0f}秒")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "providers": {
+                name: {
+                    "weight": self.weights.get(name, 1.0),
+                    "latency": {task: round(value, 3) for task, value in health.latency.items()},
+                    "error_rate": round(health.error_rate, 4),
+                    "consecutive_failures": health.consecutive_failures,
+                    "available": health.available(now),
+                    "cooldown_remaining": round(max(0.0, health.open_until - now), 1),
+                    "calls": health.calls,
+                    "failures": health.failures,
+                } for name, health in self.health.items()
+            },
+            "task_providers": self.task_providers,
+        }
+
+
+# 全局路由实例
+llm_router = LLMRouter.from_settings()
@@ -0,0 +1,123 @@
+"""
+长论文的map-reduce分析
+
+超长论文（学位论文、综述）不再只保留首尾各两万字符：全文按顺序切成若干片段，每个片段
+用一次调用同时摘录各分析阶段需要的要点（map），多个片段并发执行并受并发上限约束；
+各阶段再以汇总后的要点作为输入，沿用原有的阶段函数各调用一次合并成最终结果（reduce）。
+"""
+import asyncio
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from src.core.config import settings
+from src.services.ai_assistant import AIAssistant
+from src.services.context_retrieval import split_windows
+
+MAP_TEMPERATURE = 0.2
+
+# map结果中的字段 -> 使用这些要点的分析阶段
+MAP_FIELDS = {
+    "sections": ["SECTIONS"],
+    "methodology": ["METHODOLOGY", "CODE"],
+    "findings": ["FINDINGS"],
+    "experiments": ["EXPERIMENTS"],
+    "weaknesses": ["WEAKNESSES"],
+    "future_work": ["FUTURE_WORK"],
+}
+
+MAP_PROMPT = """
+请阅读以下论文片段（第{index}/{total}部分），摘录其中与各分析方面相关的要点，供后续汇总整篇论文使用。
+论文标题: {title}
+
+以JSON格式返回，每个字段为字符串列表，片段中没有相关内容的字段返回空列表:
+{{
+  "sections": ["本片段出现的章节标题及一句话概括"],
+  "methodology": ["模型架构、关键组件、算法步骤、创新点等方法相关要点"],
+  "findings": ["主要结果和结论"],
+  "experiments": ["数据集、评价指标、基线方法和实验结果（保留具体数值）"],
+  "weaknesses": ["局限性、假设条件、不足之处"],
+  "future_work": ["作者提到的未来工作或可扩展方向"]
+}}
+
+论文片段:
+{content}
+
+请使用中文，每条要点简洁具体，只返回JSON对象，不要包含其他解释文字。
+"""
+
+
+def _parse_notes(response: str) -> Dict[str, List[str]]:
+    """解析map调用返回的JSON，只保留约定的字段"""
+    match = re.search(r'\{.*\}', response or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        data = json.loads(match.group(0).replace("，", ",").replace("：", ":"))
+    notes = {}
+    for field in MAP_FIELDS:
+        value = data.get(field) or []
+        if isinstance(value, str):
+            value = [value]
+        notes[field] = [str(item).strip() for item in value if str(item).strip()]
+    return notes
+
+
+async def _map_window(index: int, total: int, content: str, title: str, ai: AIAssistant) -> Dict[str, List[str]]:
+    prompt = MAP_PROMPT.format(index=index + 1, total=total, title=title, content=content)
+    system_message = "你是一个专业的学术论文分析助手，负责从长论文的片段中摘录要点。请使用中文以JSON格式返回结果。"
+    response = await ai.generate_completion(prompt, temperature=MAP_TEMPERATURE, system_prompt=system_message, task="analysis")
+    return _parse_notes(response)
+
+
+async def map_paper(content: str, title: str, ai: AIAssistant,
+                    global_semaphore: Optional[asyncio.Semaphore] = None,
+                    on_progress: Optional[Callable[[int, int], Any]] = None) -> Dict[str, str]:
+    """
+    对全文执行map阶段，返回各分析阶段的输入文本 {阶段名: 汇总要点}
+
+    单个片段失败只记录日志并跳过；所有片段都失败时返回空字典，由调用方退回原有流程。
+    """
+    windows = split_windows(content, settings.ANALYSIS_MAP_CHUNK_TOKENS)
+    total = len(windows)
+    print(f"map-reduce分析: 全文{len(content)}字符，切分为{total}个片段，并发上限{settings.ANALYSIS_MAP_CONCURRENCY}")
+    semaphore = asyncio.Semaphore(settings.ANALYSIS_MAP_CONCURRENCY)
+    finished = 0
+
+    async def run(index: int, window: str) -> Dict[str, List[str]]:
+        nonlocal finished
+        async with semaphore:
+            try:
+                if global_semaphore is not None:
+                    async with global_semaphore:
+                        notes = await _map_window(index, total, window, title, ai)
+                else:
+                    notes = await _map_window(index, total, window, title, ai)
+            except Exception as e:
+                print(f"第{index + 1}/{total}个片段摘录失败: {str(e)}")
+                notes = {}
+        finished += 1
+        if on_progress is not None:
+            on_progress(finished, total)
+        return notes
+
+    results = await asyncio.gather(*(run(index, window) for index, window in enumerate(windows)))
+    if not any(results):
+        return {}
+
+    stage_inputs: Dict[str, str] = {}
+    for field, stages in MAP_FIELDS.items():
+        parts = []
+        for index, notes in enumerate(results):
+            items = notes.get(field) or []
+            if items:
+                parts.append(f"[第{index + 1}/{total}部分]\n" + "\n".join(f"- {item}" for item in items))
+        if not parts:
+            continue
+        text = f"以下是从论文《{title}》全文各部分摘录的要点，请据此进行整体分析：\n\n" + "\n\n".join(parts)
+        for stage in stages:
+            stage_inputs[stage] = text
+    print(f"map阶段完成: {sum(1 for notes in results if notes)}/{total}个片段成功，覆盖阶段{list(stage_inputs)}")
+    return stage_inputs
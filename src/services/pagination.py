@@ -0,0 +1,180 @@
+"""
+游标（keyset）分页与列表总数缓存
+
+列表按 (排序字段, id) 排序，游标记录上一页最后一行的这两个值，下一页用
+(排序字段, id) < (值, id) 直接从复合索引 (owner_id, 排序字段, id) 上定位，
+代价与翻到第几页无关。排序字段为NULL的行统一排在降序的最前、升序的最后
+（与PostgreSQL默认一致，索引可直接使用）。
+
+总数按 (列表, 用户, 过滤条件) 缓存一小段时间，且最多数到 PAGINATION_COUNT_LIMIT，
+超出时返回上限并标记为估计值，避免每翻一页都重新扫描整个结果集。
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.orm import Query
+
+from src.core.config import settings
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析或与当前排序方式不匹配"""
+
+
+def encode_cursor(sort_by: str, descending: bool, sort_value: Any, row_id: str) -> str:
+    """将上一页最后一行的排序值和id编码为不透明的游标字符串"""
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    payload = {"s": sort_by, "d": descending, "k": value, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, descending: bool) -> Tuple[Any, str]:
+    """解析游标，返回 (排序值, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = payload["k"]
+        sort_value = datetime.fromisoformat(value["dt"]) if "dt" in value else value["v"]
+        row_id = payload["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"无效的分页游标: {str(e)}")
+    if payload.get("s") != sort_by or payload.get("d") != descending:
+        raise InvalidCursorError("分页游标与当前排序方式不一致")
+    return sort_value, row_id
+
+
+def keyset_order(sort_column, id_column, descending: bool) -> List[Any]:
+    """与游标条件配套的排序：降序时NULL在前，升序时NULL在后"""
+    if descending:
+        return [sort_column.desc().nulls_first(), id_column.desc()]
+    return [sort_column.asc().nulls_last(), id_column.asc()]
+
+
+def keyset_condition(sort_column, id_column, sort_value: Any, row_id: str, descending: bool):
+    """游标之后的行"""
+    if descending:
+        if sort_value is None:
+            # 仍在排序值为NULL的部分，或已进入非NULL部分
+            return or_(and_(sort_column.is_(None), id_column < row_id), sort_column.isnot(None))
+        return tuple_(sort_column, id_column) < tuple_(sort_value, row_id)
+    if sort_value is None:
+        return and_(sort_column.is_(None), id_column > row_id)
+    return or_(tuple_(sort_column, id_column) > tuple_(sort_value, row_id), sort_column.is_(None))
+
+
+def apply_keyset(stmt, sort_column, id_column, descending: bool, cursor_value: Optional[Tuple[Any, str]]):
+    """为查询添加游标条件和排序；Query 和 select 均可使用"""
+    if cursor_value is not None:
+        stmt = stmt.filter(keyset_condition(sort_column, id_column, *cursor_value, descending))
+    return stmt.order_by(*keyset_order(sort_column, id_column, descending))
+
+
+def next_cursor(rows: List[Any], limit: int, sort_by: str, descending: bool) -> Optional[str]:
+    """本页已满时返回下一页的游标"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(sort_by, descending, getattr(last, sort_by), last.id)
+
+
+def count_statement(filtered_query, id_column, limit: Optional[int] = None):
+    """
+    统计总数的语句，最多数到 limit+1 行
+
+    只选取id列，不受原查询的排序和预加载影响。
+    """
+    if limit is None:
+        limit = settings.PAGINATION_COUNT_LIMIT
+    if isinstance(filtered_query, Query):
+        ids = filtered_query.with_entities(id_column).order_by(None)
+    else:
+        ids = filtered_query.with_only_columns(id_column).order_by(None)
+    return select(func.count()).select_from(ids.limit(limit + 1).subquery())
+
+
+def capped_total(count: int, limit: Optional[int] = None) -> Tuple[int, bool]:
+    """返回 (总数, 是否为估计值)"""
+    if limit is None:
+        limit = settings.PAGINATION_COUNT_LIMIT
+    if count > limit:
+        return limit, True
+    return count, False
+
+
+class TotalCache:
+    """按 (列表, 用户, 过滤条件) 缓存总数的进程内TTL缓存"""
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Tuple[int, bool]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def filter_key(filters: Dict[str, Any]) -> str:
+        raw = json.dumps(filters, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, scope: str, user_id: str, filters: Dict[str, Any]) -> Optional[Tuple[int, bool]]:
+        key = (scope, user_id, self.filter_key(filters))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, scope: str, user_id: str, filters: Dict[str, Any], value: Tuple[int, bool]):
+        if self.ttl <= 0:
+            return
+        key = (scope, user_id, self.filter_key(filters))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scope: str, user_id: str):
+        """用户新增或删除记录后清除该列表的所有缓存总数"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == scope and key[1] == user_id]:
+                del self._entries[key]
+
+
+# 全局总数缓存
+total_cache = TotalCache(ttl=settings.PAGINATION_TOTAL_CACHE_TTL)
+
+
+def get_total(db, scope: str, user_id: str, filters: Dict[str, Any], filtered_query, id_column) -> Tuple[int, bool]:
+    """获取列表总数（优先使用缓存），返回 (总数, 是否为估计值)"""
+    cached = total_cache.get(scope, user_id, filters)
+    if cached is not None:
+        return cached
+    value = capped_total(db.scalar(count_statement(filtered_query, id_column)) or 0)
+    total_cache.set(scope, user_id, filters, value)
+    return value
+
+
+async def get_total_async(db, scope: str, user_id: str, filters: Dict[str, Any], filtered_query,
+                          id_column) -> Tuple[int, bool]:
+    """get_total 的异步版本"""
+    cached = total_cache.get(scope, user_id, filters)
+    if cached is not None:
+        return cached
+    value = capped_total(await db.scalar(count_statement(filtered_query, id_column)) or 0)
+    total_cache.set(scope, user_id, filters, value)
+    return value
@@ -1,10 +1,12 @@
 from typing import Optional, List, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc, asc, Boolean, Column, String, Integer, DateTime, ForeignKey, Text, Table, JSON, func, text
+from sqlalchemy.orm import Session, selectinload, load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, desc, asc, Boolean, Column, String, Integer, DateTime, ForeignKey, Text, Table, JSON, func, text
 from fastapi import UploadFile, HTTPException, status
 import uuid
 import os
 import json
+import asyncio
 from datetime import datetime
 import boto3
 from botocore.exceptions import ClientError
@@ -13,13 +15,34 @@ import io
 import shutil
 import pypdf
 import httpx
-from sqlalchemy import text
+from sqlalchemy import text, select
 from sqlalchemy.sql import func
 
 from src.models.paper import Paper, Tag, Note, paper_tags, Category
 from src.models.user import User
 from src.core.config import settings
 from src.db.base import Base
+from src.services import library_search, pagination, semantic_index, paper_storage
+from src.utils import pdf_extraction
+
+def _apply_library_search(db, paper_query, query: Optional[str]):
+    """为论文查询添加全文检索条件，返回 (查询, 相关度表达式)；Query 和 select 均可使用"""
+    if not query:
+        return paper_query, None
+    where, rank = library_search.build_search_clause(db, query)
+    if where is not None:
+        paper_query = paper_query.filter(where)
+    return paper_query, rank
+
+def _apply_sort(paper_query, sort_by: str, sort_order: str, rank=None):
+    """按指定字段排序；sort_by=relevance 时按检索相关度排序，没有检索词时退回更新时间"""
+    if sort_by == "relevance":
+        if rank is not None:
+            return paper_query.order_by(desc(rank), desc(Paper.updated_at))
+        sort_by = "updated_at"
+    if sort_order.lower() == "desc":
+        return paper_query.order_by(desc(getattr(Paper, sort_by)))
+    return paper_query.order_by(asc(getattr(Paper, sort_by)))
 
 # 论文CRUD操作
 def get_paper_by_id(db: Session, paper_id: str, user_id: Optional[str] = None) -> Optional[Paper]:
@@ -29,6 +52,47 @@ def get_paper_by_id(db: Session, paper_id: str, user_id: Optional[str] = None) -
         query = query.filter(Paper.owner_id == user_id)
     return query.first()
 
+# 构建论文响应时需要访问的关联对象，异步查询时必须预先加载（异步会话不支持隐式懒加载）
+PAPER_RESPONSE_LOAD_OPTIONS = (
+    selectinload(Paper.tags),
+    selectinload(Paper.categories),
+    selectinload(Paper.folder),
+    selectinload(Paper.notes),
+)
+
+# 论文列表只需要的列；正文、分析结果等大字段不读取
+PAPER_LIST_COLUMNS = (
+    Paper.id, Paper.title, Paper.abstract, Paper.authors, Paper.publication_date,
+    Paper.journal, Paper.conference, Paper.doi, Paper.url, Paper.file_path,
+    Paper.paper_metadata, Paper.source, Paper.is_favorite, Paper.created_at,
+    Paper.updated_at, Paper.analysis_status, Paper.analysis_progress,
+    Paper.owner_id, Paper.folder_id,
+)
+
+# 论文列表的加载选项：关联对象按页批量加载，避免逐行懒加载
+PAPER_LIST_LOAD_OPTIONS = (
+    load_only(*PAPER_LIST_COLUMNS),
+    selectinload(Paper.tags),
+    selectinload(Paper.categories),
+    selectinload(Paper.folder),
+)
+
+# 支持游标分页的排序字段（必须在列表投影中）
+PAPER_KEYSET_SORT_KEYS = frozenset(column.key for column in PAPER_LIST_COLUMNS)
+
+# 在数据库中判断是否有正文/文件，不把正文读回应用
+PAPER_HAS_CONTENT = and_(Paper.content.isnot(None), Paper.content != "").label("has_content")
+PAPER_HAS_FILE = and_(Paper.file_path.isnot(None), Paper.file_path != "").label("has_file")
+
+async def get_paper_by_id_async(db: AsyncSession, paper_id: str, user_id: Optional[str] = None) -> Optional[Paper]:
+    """通过ID获取论文（异步）"""
+    stmt = select(Paper).options(*PAPER_RESPONSE_LOAD_OPTIONS).where(Paper.id == paper_id)
+    if user_id:
+        stmt = stmt.where(Paper.owner_id == user_id)
+    # populate_existing：轮询分析进度时总是读取数据库中的最新值
+    result = await db.execute(stmt.execution_options(populate_existing=True))
+    return result.scalars().first()
+
 def get_papers(
     db: Session, 
     user_id: str, 
@@ -42,16 +106,8 @@ def get_papers(
     """获取用户的论文列表"""
     paper_query = db.query(Paper).filter(Paper.owner_id == user_id)
     
-    # 如果有搜索字符串
-    if query:
-        search = f"%{query}%"
-        paper_query = paper_query.filter(
-            or_(
-                Paper.title.ilike(search),
-                Paper.abstract.ilike(search),
-                Paper.content.ilike(search),
-            )
-        )
+    # 如果有搜索字符串（全文索引）
+    paper_query, rank = _apply_library_search(db, paper_query, query)
     
     # 如果有标签过滤
     if tag_ids:
@@ -59,10 +115,7 @@ def get_papers(
             paper_query = paper_query.filter(Paper.tags.any(Tag.id == tag_id))
     
     # 排序
-    if sort_order.lower() == "desc":
-        paper_query = paper_query.order_by(desc(getattr(Paper, sort_by)))
-    else:
-        paper_query = paper_query.order_by(asc(getattr(Paper, sort_by)))
+    paper_query = _apply_sort(paper_query, sort_by, sort_order, rank)
     
     return paper_query.offset(skip).limit(limit).all()
 
@@ -83,7 +136,8 @@ def create_paper(
     metadata: Optional[Dict[str, Any]] = None,
     content: Optional[str] = None,
     file_size: Optional[int] = None,
-    source: str = "upload"
+    source: str = "upload",
+    file_hash: Optional[str] = None
 ) -> Paper:
     """创建新论文"""
     # 确保数据库中存在analysis_progress字段
@@ -115,6 +169,7 @@ def create_paper(
             owner_id=user_id,
             content=content,
             file_size=file_size,
+            file_hash=file_hash,
             source=source,
             analysis_progress=0  # 初始化分析进度为0
         )
@@ -135,6 +190,9 @@ def create_paper(
         db.commit()
         print(f"刷新实例")
         db.refresh(db_paper)
+        library_search.index_paper(db, db_paper)
+        semantic_index.schedule_index_paper(user_id, db_paper.id, db_paper.title, db_paper.abstract, db_paper.content)
+        pagination.total_cache.invalidate("papers", user_id)
         return db_paper
     except Exception as e:
         print(f"创建论文记录时出错: {str(e)}")
@@ -224,6 +282,9 @@ def update_paper(
             if key in ["abstract", "journal", "conference", "doi", "url"]:
                 update_data[key] = ""  # 字符串字段用空字符串
     
+    # 标题、摘要或正文变化时需要刷新全文索引
+    reindex = any(key in update_data for key in ("title", "abstract", "content"))
+    
     # 更新其他字段
     for key, value in update_data.items():
         if hasattr(paper, key):
@@ -237,6 +298,9 @@ def update_paper(
     try:
         db.commit()
         db.refresh(paper)
+        if reindex:
+            library_search.index_paper(db, paper)
+            semantic_index.schedule_index_paper(user_id, paper.id, paper.title, paper.abstract, paper.content)
         print(f"已成功更新论文: {paper.id}")
         return paper
     except Exception as e:
@@ -265,6 +329,7 @@ def set_paper_favorite(
         paper.is_favorite = is_favorite
         db.commit()
         db.refresh(paper)
+        pagination.total_cache.invalidate("papers", user_id)
         print(f"成功更新论文 {paper_id} 的收藏状态为: {is_favorite}")
         return paper
     except Exception as e:
@@ -280,7 +345,7 @@ def delete_paper(db: Session, paper_id: str, user_id: str) -> bool:
     
     # 首先验证论文是否存在并属于当前用户 - 使用原生SQL避免任何懒加载
     check_paper_sql = text("""
-        SELECT id, title, file_path, thumbnail_path 
+        SELECT id, title, file_path, thumbnail_path, file_hash 
         FROM papers 
         WHERE id = :paper_id AND owner_id = :user_id
     """)
@@ -297,14 +362,15 @@ def delete_paper(db: Session, paper_id: str, user_id: str) -> bool:
         "id": paper_data[0],
         "title": paper_data[1],
         "file_path": paper_data[2],
-        "thumbnail_path": paper_data[3]
+        "thumbnail_path": paper_data[3],
+        "file_hash": paper_data[4]
     }
     
     try:
         print(f"准备删除论文: id={paper_info['id']}, title={paper_info['title']}")
         
-        # 1. 首先尝试删除物理文件
-        if paper_info["file_path"]:
+        # 1. 首先尝试删除物理文件（按内容哈希保存的文件由引用计数决定，在提交后处理）
+        if paper_info["file_path"] and not paper_info["file_hash"]:
             try:
                 delete_file_from_storage(paper_info["file_path"])
                 print(f"已删除物理文件: {paper_info['file_path']}")
@@ -434,6 +500,12 @@ def delete_paper(db: Session, paper_id: str, user_id: str) -> bool:
         except Exception as fk_query_error:
             print(f"查询外键关系失败(忽略): {fk_query_error}")
         
+        # 删除全文索引（SQLite的FTS5表）
+        try:
+            library_search.remove_paper_from_index(db, paper_id)
+        except Exception as e:
+            print(f"删除全文索引失败(忽略): {e}")
+        
         # 最后删除论文本身
         db.execute(
             text("DELETE FROM papers WHERE id = :paper_id AND owner_id = :user_id"),
@@ -441,8 +513,17 @@ def delete_paper(db: Session, paper_id: str, user_id: str) -> bool:
         )
         print(f"已删除论文记录")
         
+        # 释放共享文件的引用
+        orphan_path = None
+        if paper_info["file_hash"]:
+            orphan_path = paper_storage.release_file(db, paper_info["file_hash"])
+        
         # 提交事务
         db.commit()
+        if orphan_path:
+            _delete_orphan_file(db, paper_info["file_hash"], orphan_path)
+        pagination.total_cache.invalidate("papers", user_id)
+        semantic_index.schedule_remove_paper(user_id, paper_id)
         print(f"删除论文成功: {paper_id}")
         return True
             
@@ -455,6 +536,28 @@ def delete_paper(db: Session, paper_id: str, user_id: str) -> bool:
         # 继续抛出异常，以便上层处理
         raise e
 
+def _release_paper_file(db: Session, file_hash: str):
+    """论文记录创建失败时撤销对共享文件的引用"""
+    try:
+        db.rollback()
+        orphan_path = paper_storage.release_file(db, file_hash)
+        db.commit()
+        if orphan_path:
+            _delete_orphan_file(db, file_hash, orphan_path)
+    except Exception as e:
+        db.rollback()
+        print(f"释放文件引用失败(忽略): sha256={file_hash}, error={e}")
+
+def _delete_orphan_file(db: Session, file_hash: str, file_path: str):
+    """引用计数归零后删除文件；期间若有新的上传重新引用了该文件则保留"""
+    if paper_storage.get_cached_file(db, file_hash) is not None:
+        return
+    try:
+        delete_file_from_storage(file_path)
+        print(f"已删除无引用的文件: {file_path}")
+    except Exception as e:
+        print(f"删除物理文件失败 {file_path}: {e}")
+
 # 标签操作
 def get_tags(db: Session, user_id: str) -> List[Tuple[Tag, int]]:
     """获取用户的所有标签及每个标签的论文数量"""
@@ -670,146 +773,23 @@ def extract_paper_content(file_path: str) -> Tuple[str, Dict[str, Any]]:
         # 返回空内容而不是抛出异常，允许上传继续
         return "", {}
 
-# 添加缺失的PDF提取函数
+# PDF提取函数（同步版本，在当前进程中解析；上传流程使用进程池版本 pdf_extraction.extract_pdf）
 def extract_pdf_metadata(file_path: str) -> Dict[str, Any]:
     """提取PDF文件的元数据"""
     try:
-        with open(file_path, 'rb') as f:
-            reader = pypdf.PdfReader(f)
-            metadata = {}
-            if reader.metadata:
-                for key, value in reader.metadata.items():
-                    if key.startswith('/'):
-                        key = key[1:]
-                    if isinstance(value, str):
-                        value = ''.join(char for char in value if ord(char) >= 32 or char == '\n')
-                    metadata[key] = value
-            return metadata
+        return pdf_extraction.extract_document(file_path, include_text=False)["metadata"]
     except Exception as e:
         print(f"提取PDF元数据失败: {str(e)}")
         return {}
 
 def extract_pdf_text(file_path: str) -> str:
-    """提取PDF文件的文本内容，增强版"""
+    """提取PDF文件的文本内容"""
     try:
-        import pypdf
-        import re
-        
-        with open(file_path, 'rb') as f:
-            reader = pypdf.PdfReader(f)
-            
-            # 获取总页数
-            total_pages = len(reader.pages)
-            print(f"PDF文件共有 {total_pages} 页")
-            
-            content = ""
-            for page_num, page in enumerate(reader.pages):
-                # 提取原始文本
-                page_text = page.extract_text() or ""
-                
-                # 处理特殊字符
-                page_text = ''.join(char for char in page_text if ord(char) >= 32 or char == '\n')
-                
-                # 尝试检测和处理分栏
-                if '\n' in page_text:
-                    lines = page_text.split('\n')
-                    # 计算平均行长度
-                    avg_line_len = sum(len(line) for line in lines) / max(1, len(lines))
-                    # 如果平均行长度太短，可能是分栏，尝试合并
-                    if avg_line_len < 40 and len(lines) > 15:
-                        # 简单合并策略：尝试将偶数行和奇数行分别合并
-                        page_text = _merge_columns(lines)
-                
-                # 去除页码和页眉/页脚
-                page_text = _clean_page_text(page_text, page_num+1, total_pages)
-                
-                # 添加处理后的文本
-                content += page_text + "\n\n"
-            
-            # 后处理：清理过多的空行、连字符等
-            content = re.sub(r'\n{3,}', '\n\n', content)  # 替换多个连续空行为两个空行
-            content = re.sub(r'(\w)-\n(\w)', r'\1\2', content)  # 处理连字符
-            
-            print(f"成功提取文本，总长度: {len(content)} 字符")
-            return content
+        return pdf_extraction.extract_document(file_path)["content"] or ""
     except Exception as e:
         print(f"提取PDF文本内容失败: {str(e)}")
-        print(f"错误堆栈: {traceback.format_exc()}")
         return ""
 
-def _clean_page_text(text: str, page_num: int, total_pages: int) -> str:
-    """清理页面文本，去除页码和页眉/页脚"""
-    import re
-    
-    # 去除页码
-    text = re.sub(rf'\b{page_num}\b', '', text)
-    
-    # 尝试识别和去除页眉/页脚
-    lines = text.split('\n')
-    if len(lines) > 10:  # 只在有足够行数的页面处理
-        # 假设页眉是前1-2行，页脚是后1-3行
-        inner_lines = lines[2:-3]
-        # 如果页眉/页脚中含有论文ID、页码等，尝试去除
-        common_patterns = [
-            r'Page \d+ of \d+',
-            r'\d+/\d+',
-            r'©\d{4}',
-            r'ISBN:',
-            r'DOI:',
-            r'Vol\.\s*\d+',
-            r'No\.\s*\d+'
-        ]
-        
-        # 去除页眉页脚中的通用模式
-        for i in range(min(2, len(lines))):
-            for pattern in common_patterns:
-                lines[i] = re.sub(pattern, '', lines[i])
-        
-        for i in range(max(0, len(lines)-3), len(lines)):
-            for pattern in common_patterns:
-                if i < len(lines):  # 防止索引越界
-                    lines[i] = re.sub(pattern, '', lines[i])
-    
-    return '\n'.join(lines)
-
-def _merge_columns(lines: list) -> str:
-    """尝试合并分栏内容"""
-    # 估计每列的行数
-    num_lines = len(lines)
-    if num_lines < 10:  # 行数太少，可能不是分栏
-        return '\n'.join(lines)
-    
-    # 分别处理奇数和偶数行，这是最简单的列合并方法
-    left_column = []
-    right_column = []
-    mid_point = num_lines // 2
-    
-    for i, line in enumerate(lines):
-        if i < mid_point:
-            left_column.append(line)
-        else:
-            right_column.append(line)
-    
-    # 合并两列
-    merged_text = ""
-    for i in range(min(len(left_column), len(right_column))):
-        if left_column[i].strip() and right_column[i].strip():
-            # 两列都有内容，合并
-            merged_text += left_column[i] + " " + right_column[i] + "\n"
-        else:
-            # 任一列为空，使用非空列
-            merged_text += (left_column[i] if left_column[i].strip() else right_column[i]) + "\n"
-    
-    # 添加剩余行
-    if len(left_column) > len(right_column):
-        for i in range(len(right_column), len(left_column)):
-            merged_text += left_column[i] + "\n"
-    elif len(right_column) > len(left_column):
-        for i in range(len(left_column), len(right_column)):
-            merged_text += right_column[i] + "\n"
-    
-    return merged_text
-
 def upload_to_minio(file_path: str, object_name: str) -> str:
     """上传文件到MinIO存储（这里改为本地存储）"""
     # 确保上传目录存在
@@ -851,19 +831,30 @@ async def upload_paper_file(
     os.makedirs("temp", exist_ok=True)
     
     try:
-        # 写入临时文件
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 写入临时文件，同时计算内容哈希
+        file_hash, file_size = await paper_storage.save_upload_hashed(file, temp_file_path)
+        print(f"临时文件保存到: {temp_file_path}, sha256={file_hash}")
         
-        print(f"临时文件保存到: {temp_file_path}")
+        # 用户库中已有相同文件时仍然创建记录，但在响应中提示
+        duplicate = paper_storage.find_in_library(db, user_id, file_hash)
+        if duplicate:
+            print(f"警告：用户 {user_id} 的论文库中已有相同文件: paper_id={duplicate[0]}, title={duplicate[1]}")
         
-        # 提取文件元数据
+        # 相同文件已提取过时直接复用缓存，否则在进程池中解析一次PDF，同时提取元数据和内容（如果需要）
         file_metadata = {}
-        try:
-            file_metadata = extract_pdf_metadata(temp_file_path)
+        content = None
+        extracted = paper_storage.extraction_from_cache(paper_storage.get_cached_file(db, file_hash), extract_content)
+        if extracted is not None:
+            print(f"命中PDF提取缓存: sha256={file_hash}")
+        else:
+            try:
+                extracted = await pdf_extraction.extract_pdf(temp_file_path, include_text=extract_content)
+            except Exception as extract_error:
+                print(f"提取PDF失败: {str(extract_error)}")
+        if extracted is not None:
+            file_metadata = extracted["metadata"]
+            content = extracted["content"]
             print(f"提取到PDF元数据: {file_metadata}")
-        except Exception as metadata_error:
-            print(f"提取PDF元数据失败: {str(metadata_error)}")
         
         # 从元数据中提取论文标题（如果未提供）
         if not title and file_metadata.get('Title'):
@@ -875,22 +866,11 @@ async def upload_paper_file(
         
         print(f"使用标题: {title}")
         
-        # 提取PDF内容（如果需要）
-        content = None
-        if extract_content:
-            try:
-                content = extract_pdf_text(temp_file_path)
-                print(f"提取到PDF内容: {len(content)} 字符")
-            except Exception as extract_error:
-                print(f"提取PDF内容失败: {str(extract_error)}")
-        
-        # 获取文件大小
-        file_size = os.path.getsize(temp_file_path)
-        
-        # 上传到存储
+        # 按内容哈希保存文件（已存在则复用）并增加引用计数
         try:
-            file_path = upload_to_minio(temp_file_path, f"papers/{user_id}/{temp_file_id}.pdf")
-            print(f"文件上传到存储: {file_path}")
+            paper_file = paper_storage.acquire_file(db, temp_file_path, file_hash, file_size, extracted)
+            file_path = paper_file.file_path
+            print(f"文件保存到存储: {file_path}, 引用数: {paper_file.ref_count}")
         except Exception as storage_error:
             print(f"上传到存储失败: {str(storage_error)}")
             raise HTTPException(
@@ -912,13 +892,15 @@ async def upload_paper_file(
                 thumbnail_path=thumbnail_path,
                 file_size=file_size,
                 metadata=file_metadata,
-                source="upload"
+                source="upload",
+                file_hash=file_hash
             )
             print(f"论文记录创建成功: {paper.id}")
         except Exception as db_error:
             print(f"创建论文记录失败: {str(db_error)}")
             import traceback
             print(f"错误堆栈: {traceback.format_exc()}")
+            _release_paper_file(db, file_hash)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"创建论文记录失败: {str(db_error)}"
@@ -947,6 +929,9 @@ async def upload_paper_file(
             # 这里可以启动异步任务
             pass
         
+        # 供响应使用的附加信息
+        paper.page_count = paper_file.page_count
+        paper.duplicate_of = duplicate[0] if duplicate else None
         return paper
     finally:
         # 清理临时文件
@@ -1069,15 +1054,7 @@ def get_user_papers(
     paper_query = db.query(Paper).filter(Paper.owner_id == user_id)
     
     # 搜索
-    if query:
-        search = f"%{query}%"
-        paper_query = paper_query.filter(
-            or_(
-                Paper.title.ilike(search),
-                Paper.abstract.ilike(search),
-                Paper.content.ilike(search),
-            )
-        )
+    paper_query, rank = _apply_library_search(db, paper_query, query)
     
     # 标签过滤
     if tags:
@@ -1092,12 +1069,161 @@ def get_user_papers(
     total = paper_query.count()
     
     # 排序
-    if sort_order.lower() == "desc":
-        paper_query = paper_query.order_by(desc(getattr(Paper, sort_by)))
-    else:
-        paper_query = paper_query.order_by(asc(getattr(Paper, sort_by)))
+    paper_query = _apply_sort(paper_query, sort_by, sort_order, rank)
     
     # 分页
     papers = paper_query.offset(skip).limit(limit).all()
     
-    return papers, total 
\ No newline at end of file
+    return papers, total 
+
+async def get_user_papers_async(
+    db: AsyncSession,
+    user_id: str,
+    query: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    favorite: Optional[bool] = None,
+    sort_by: str = "updated_at",
+    sort_order: str = "desc",
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_total: bool = True
+) -> Tuple[List[Paper], Optional[int], bool, Optional[str]]:
+    """
+    获取用户的论文列表（异步）
+
+    按 (sort_by, id) 游标分页：传入上一页返回的 cursor 时忽略 skip。按相关度排序时
+    退回偏移分页，不返回游标。返回 (论文列表, 总数, 总数是否为估计值, 下一页游标)，
+    include_total=False 时总数为None。
+    """
+    paper_query = select(Paper).where(Paper.owner_id == user_id)
+    
+    # 搜索
+    paper_query, rank = _apply_library_search(db, paper_query, query)
+    
+    # 标签过滤
+    if tags:
+        for tag_name in tags:
+            paper_query = paper_query.where(Paper.tags.any(Tag.name == tag_name))
+    
+    # 收藏过滤
+    if favorite is not None:
+        paper_query = paper_query.where(Paper.is_favorite == favorite)
+    
+    # 计算总数（按用户和过滤条件缓存）
+    total, total_is_estimate = None, False
+    if include_total:
+        filters = {"query": query, "tags": tags, "favorite": favorite}
+        total, total_is_estimate = await pagination.get_total_async(
+            db, "papers", user_id, filters, paper_query, Paper.id
+        )
+    
+    # 排序与分页
+    descending = sort_order.lower() == "desc"
+    use_keyset = sort_by in PAPER_KEYSET_SORT_KEYS
+    if use_keyset:
+        cursor_value = pagination.decode_cursor(cursor, sort_by, descending) if cursor else None
+        paper_query = pagination.apply_keyset(paper_query, getattr(Paper, sort_by), Paper.id, descending, cursor_value)
+        if cursor_value is not None:
+            skip = 0
+    else:
+        paper_query = _apply_sort(paper_query, sort_by, sort_order, rank)
+    
+    # 列表投影：只读取列表所需的列，has_content/has_file 由数据库计算
+    result = await db.execute(
+        paper_query.add_columns(PAPER_HAS_CONTENT, PAPER_HAS_FILE)
+        .options(*PAPER_LIST_LOAD_OPTIONS)
+        .offset(skip)
+        .limit(limit)
+    )
+    papers = []
+    for paper, has_content, has_file in result.all():
+        paper.has_content = bool(has_content)
+        paper.has_file = bool(has_file)
+        papers.append(paper)
+    
+    cursor_out = pagination.next_cursor(papers, limit, sort_by, descending) if use_keyset else None
+    return papers, total, total_is_estimate, cursor_out
+
+async def attach_search_snippets_async(db: AsyncSession, papers: List[Paper], query: Optional[str]):
+    """
+    为搜索结果生成高亮片段，写入 paper.search_snippet
+
+    优先使用摘要和标题；只在正文中命中的论文，由数据库截取命中位置附近的片段，不读取整篇正文。
+    """
+    if not query or not papers:
+        return
+    snippets, missing = library_search.snippet_candidates(papers, query)
+    terms = library_search.query_terms(query)
+    if missing and terms:
+        # 最多尝试前几个词，每个词一条查询
+        for term in terms[:3]:
+            result = await db.execute(library_search.content_window_statement(db, missing, term))
+            for paper_id, window in result.all():
+                snippet = library_search.make_snippet(window, terms)
+                if snippet:
+                    snippets[paper_id] = snippet
+            missing = [paper_id for paper_id in missing if paper_id not in snippets]
+            if not missing:
+                break
+    for paper in papers:
+        paper.search_snippet = snippets.get(paper.id)
+
+async def get_papers_by_ids_async(db: AsyncSession, user_id: str, paper_ids: List[str]) -> List[Paper]:
+    """按给定顺序获取用户的多篇论文（列表投影）"""
+    if not paper_ids:
+        return []
+    result = await db.execute(
+        select(Paper)
+        .add_columns(PAPER_HAS_CONTENT, PAPER_HAS_FILE)
+        .options(*PAPER_LIST_LOAD_OPTIONS)
+        .where(Paper.owner_id == user_id, Paper.id.in_(paper_ids))
+    )
+    papers = {}
+    for paper, has_content, has_file in result.all():
+        paper.has_content = bool(has_content)
+        paper.has_file = bool(has_file)
+        papers[paper.id] = paper
+    return [papers[paper_id] for paper_id in paper_ids if paper_id in papers]
+
+async def _keyword_ranking_async(db: AsyncSession, user_id: str, query: str, limit: int) -> List[str]:
+    """全文检索的论文ID排名"""
+    where, rank = library_search.build_search_clause(db, query)
+    if where is None:
+        return []
+    stmt = select(Paper.id).where(Paper.owner_id == user_id, where)
+    stmt = stmt.order_by(desc(rank)) if rank is not None else stmt.order_by(desc(Paper.updated_at))
+    result = await db.execute(stmt.limit(limit))
+    return list(result.scalars().all())
+
+async def semantic_search_papers_async(
+    db: AsyncSession,
+    user_id: str,
+    query: str,
+    limit: int = 20,
+    mode: str = "hybrid"
+) -> List[Tuple[Paper, float]]:
+    """
+    语义检索用户的论文库
+
+    mode=semantic 只按向量相似度排序；mode=hybrid 与全文检索结果做倒数排名融合。
+    返回 [(论文, 得分)]。
+    """
+    candidates = limit * 2 if mode == "hybrid" else limit
+    semantic = await asyncio.to_thread(semantic_index.semantic_index.search, user_id, query, candidates)
+    if mode == "hybrid":
+        keyword = await _keyword_ranking_async(db, user_id, query, candidates)
+        ranked = semantic_index.fuse_rankings([paper_id for paper_id, _ in semantic], keyword)[:limit]
+    else:
+        ranked = semantic[:limit]
+
+    scores = dict(ranked)
+    papers = await get_papers_by_ids_async(db, user_id, [paper_id for paper_id, _ in ranked])
+    return [(paper, scores[paper.id]) for paper in papers]
+
+async def get_similar_papers_async(db: AsyncSession, user_id: str, paper_id: str, limit: int = 10) -> List[Tuple[Paper, float]]:
+    """与指定论文语义最相似的论文，返回 [(论文, 相似度)]"""
+    similar = await asyncio.to_thread(semantic_index.semantic_index.similar, user_id, paper_id, limit)
+    scores = dict(similar)
+    papers = await get_papers_by_ids_async(db, user_id, [similar_id for similar_id, _ in similar])
+    return [(paper, scores[paper.id]) for paper in papers]
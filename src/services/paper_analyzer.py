@@ -1,4 +1,4 @@
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import httpx
@@ -10,6 +10,11 @@ import traceback
 from src.models.paper import Paper
 from src.core.config import settings
 from src.services.ai_assistant import AIAssistant
+from src.services.stage_scheduler import StageScheduler
+from src.services.progress_bus import publish_analysis_event
+from src.services import library_search
+from src.services.context_retrieval import PaperContext
+from src.services.map_reduce_analysis import map_paper
 import asyncio
 import hashlib
 import random
@@ -60,6 +65,9 @@ ANALYSIS_STAGES = {
     "COMPLETE": 100         # 完成
 }
 
+# 按阶段检索上下文的分析阶段（SECTIONS 取各章节开头，其余按阶段查询词打分）
+CONTEXT_STAGES = ["SECTIONS", "METHODOLOGY", "FINDINGS", "WEAKNESSES", "FUTURE_WORK", "EXPERIMENTS", "CODE"]
+
 # 创建全局AI助手实例
 ai_assistant_instance = None
 try:
@@ -70,7 +78,9 @@ except Exception as e:
 
 # 主分析入口函数
 async def analyze_paper(db: Session, paper_id: str, user_id: str, extract_core_content: bool = True, 
-                  analyze_experiments: bool = False, analyze_references: bool = False) -> Paper:
+                  analyze_experiments: bool = False, analyze_references: bool = False,
+                  completed_stages: Optional[Iterable[str]] = None,
+                  on_stage_complete: Optional[Callable[[str], None]] = None) -> Paper:
     """
     分析论文，提取结构、方法论、实验设计等信息
     使用增强的错误处理和内容管理策略
@@ -82,6 +92,9 @@ async def analyze_paper(db: Session, paper_id: str, user_id: str, extract_core_c
         extract_core_content: 是否只提取核心内容进行分析，减少处理时间
         analyze_experiments: 是否分析实验部分，默认为False
         analyze_references: 是否分析参考文献部分，默认为False
+        completed_stages: 已完成的阶段名（任务队列的断点），提供时按阶段名精确跳过，
+            不提供时按analysis_progress跳过
+        on_stage_complete: 阶段成功且结果写入数据库后的回调，参数为阶段名；使用默认值的阶段不会回调
     """
     # 添加调试日志
     print(f"开始分析论文，paper_id={paper_id}, user_id={user_id}")
@@ -120,38 +133,58 @@ async def analyze_paper(db: Session, paper_id: str, user_id: str, extract_core_c
         db.commit()
         print(f"更新论文状态为PROCESSING，进度为{ANALYSIS_STAGES['INIT']}%: paper_id={paper_id}")
         
-        # 内容太长时进行预处理
-        if content_length > 100000:
+        # 超长论文使用map-reduce模式分析全文，不再过滤掉中间部分
+        map_reduce = (settings.ANALYSIS_MAP_REDUCE_ENABLED
+                      and content_length > settings.ANALYSIS_MAP_REDUCE_THRESHOLD)
+        completed_stages = set(completed_stages) if completed_stages is not None else None
+        # 断点续跑时本次要执行的阶段都已完成，就不再重复map阶段
+        scheduled_stages = [name for name in CONTEXT_STAGES if name != "EXPERIMENTS" or analyze_experiments]
+        run_map = map_reduce and not (completed_stages is not None and set(scheduled_stages) <= completed_stages)
+        
+        # 内容太长时进行预处理（map-reduce模式保留全文，不做过滤）
+        if content_length > 100000 and not map_reduce:
             print(f"论文内容过长，进行智能过滤")
             paper.content = smart_filter_paper_content(paper.content)
             print(f"过滤后内容长度: {len(paper.content)} 字符")
-            # 更新进度到5%
+            library_search.index_paper(db, paper, commit=False)
+            # 更新进度到5%（只推送事件，随后续阶段结果一起写入数据库）
             setattr(paper, 'analysis_progress', ANALYSIS_STAGES["PREPARE"])
-            db.commit()
+            publish_analysis_event(paper_id, "progress", progress=ANALYSIS_STAGES["PREPARE"])
             print(f"更新进度：论文内容过滤完成，进度{ANALYSIS_STAGES['PREPARE']}%")
         
         # 提取核心内容
         paper_content = paper.content
         core_content = paper_content
+        stage_contexts: Dict[str, str] = {}
         
-        if extract_core_content:
+        if extract_core_content and not map_reduce:
             print(f"启用核心内容提取，原始内容长度: {len(paper_content)}")
             # 更新进度
             setattr(paper, 'analysis_progress', ANALYSIS_STAGES["FILTER"])
-            db.commit()
+            publish_analysis_event(paper_id, "progress", progress=ANALYSIS_STAGES["FILTER"])
             print(f"更新进度：开始核心内容提取，进度{ANALYSIS_STAGES['FILTER']}%")
             
-            try:
-                # 包装在try-except中以防提取失败
-                core_content = extract_paper_core_content(paper_content)
-                print(f"核心内容提取完成，提取后长度: {len(core_content)}")
-            except Exception as e:
-                print(f"核心内容提取失败，将使用原始内容: {str(e)}")
-                core_content = paper_content
+            if settings.ANALYSIS_CONTEXT_RETRIEVAL:
+                try:
+                    # 正文只切分一次，各阶段按自己的查询选出最相关的分块
+                    stage_contexts = PaperContext(paper_content).select_all(CONTEXT_STAGES)
+                    stage_contexts = {name: value for name, value in stage_contexts.items() if value}
+                except Exception as e:
+                    print(f"分块检索失败，将使用正则提取核心内容: {str(e)}")
+                    stage_contexts = {}
+            
+            if not stage_contexts:
+                try:
+                    # 包装在try-except中以防提取失败
+                    core_content = extract_paper_core_content(paper_content)
+                    print(f"核心内容提取完成，提取后长度: {len(core_content)}")
+                except Exception as e:
+                    print(f"核心内容提取失败，将使用原始内容: {str(e)}")
+                    core_content = paper_content
             
             # 更新进度到章节分析起点
             setattr(paper, 'analysis_progress', ANALYSIS_STAGES["SECTIONS"])
-            db.commit()
+            publish_analysis_event(paper_id, "progress", progress=ANALYSIS_STAGES["SECTIONS"])
             print(f"更新进度：核心内容提取完成，进度{ANALYSIS_STAGES['SECTIONS']}%")
         
         try:
@@ -166,6 +199,21 @@ async def analyze_paper(db: Session, paper_id: str, user_id: str, extract_core_c
                     print(f"错误堆栈: {traceback.format_exc()}")
                     raise ai_init_error
             
+            if run_map:
+                def report_map_progress(finished, total):
+                    publish_analysis_event(paper_id, "progress", progress=ANALYSIS_STAGES["FILTER"],
+                                           stage="MAP", completed=finished, total=total)
+                
+                try:
+                    stage_contexts = await map_paper(paper_content, paper.title, ai,
+                                                     global_semaphore=_get_global_stage_semaphore(),
+                                                     on_progress=report_map_progress)
+                except Exception as e:
+                    print(f"map阶段失败: {str(e)}")
+                    stage_contexts = {}
+                # 没有摘录到要点的阶段（或map整体失败时）退回过滤后的核心内容
+                core_content = extract_paper_core_content(smart_filter_paper_content(paper_content))
+            
             # 获取现有分析进度
             current_stage = getattr(paper, 'analysis_progress', 0)
             print(f"当前分析进度: {current_stage}%")
@@ -174,26 +222,26 @@ async def analyze_paper(db: Session, paper_id: str, user_id: str, extract_core_c
             tasks = [
                 # 元组格式: (阶段名称, 阶段进度值, 异步函数, 函数参数, 结果字段名, 是否必需)
                 ("SECTIONS", ANALYSIS_STAGES["SECTIONS"], 
-                 extract_paper_sections, (core_content, paper.title, ai), 'sections', False),
+                 extract_paper_sections, (stage_contexts.get('SECTIONS', core_content), paper.title, ai), 'sections', False),
                  
                 ("METHODOLOGY", ANALYSIS_STAGES["METHODOLOGY"], 
-                 extract_methodology, (core_content, paper.title, ai), 'methodology', True),
+                 extract_methodology, (stage_contexts.get('METHODOLOGY', core_content), paper.title, ai), 'methodology', True),
                  
                 ("FINDINGS", ANALYSIS_STAGES["FINDINGS"], 
-                 extract_key_findings, (core_content, ai), 'key_findings', True),
+                 extract_key_findings, (stage_contexts.get('FINDINGS', core_content), ai), 'key_findings', True),
                  
                 ("WEAKNESSES", ANALYSIS_STAGES["WEAKNESSES"], 
-                 extract_weaknesses, (core_content, paper.title, ai), 'weaknesses', False),
+                 extract_weaknesses, (stage_contexts.get('WEAKNESSES', core_content), paper.title, ai), 'weaknesses', False),
                  
                 ("FUTURE_WORK", ANALYSIS_STAGES["FUTURE_WORK"], 
-                 extract_future_work, (core_content, paper.title, ai), 'future_work', False),
+                 extract_future_work, (stage_contexts.get('FUTURE_WORK', core_content), paper.title, ai), 'future_work', False),
             ]
                  
             # 添加实验部分分析（可选）
             if analyze_experiments:
                 tasks.append(
                 ("EXPERIMENTS", ANALYSIS_STAGES["EXPERIMENTS"], 
-                     extract_experiments, (core_content, ai), 'experiment_data', False)
+                     extract_experiments, (stage_contexts.get('EXPERIMENTS', core_content), ai), 'experiment_data', False)
                 )
             else:
                 # 不分析实验，直接设置默认值
@@ -205,152 +253,79 @@ async def analyze_paper(db: Session, paper_id: str, user_id: str, extract_core_c
                 paper.references = []
                 print(f"跳过参考文献分析，设置为空列表")
             
-            # 逐个执行分析任务
+            # 构建阶段DAG：各分析阶段相互独立，只有代码生成依赖方法论结果
+            stage_progress_map = {}
+            stage_field_map = {"CODE": "code_implementation"}
+            scheduler = StageScheduler(
+                max_concurrency=settings.ANALYSIS_STAGE_CONCURRENCY,
+                global_semaphore=_get_global_stage_semaphore(),
+            )
+            
             for stage_name, stage_progress, stage_func, stage_args, result_field, is_required in tasks:
+                if completed_stages is not None:
+                    if stage_name in completed_stages:
+                        print(f"跳过断点中已完成的阶段 {stage_name}")
+                        continue
                 # 如果当前进度已经超过这个阶段，则跳过
-                if current_stage >= stage_progress:
+                elif current_stage >= stage_progress:
                     print(f"跳过已完成的阶段 {stage_name}，当前进度 {current_stage}% >= {stage_progress}%")
                     continue
                 
-                # 更新进度为该阶段的起始值
-                setattr(paper, 'analysis_progress', stage_progress)
-                db.commit()
-                print(f"开始{stage_name}阶段分析，进度: {stage_progress}%")
-                
-                # 特别处理方法论分析阶段
-                if stage_name == "METHODOLOGY":
-                    # 设置准备方法论分析进度
-                    setattr(paper, 'analysis_progress', ANALYSIS_STAGES["METHOD_PREPARE"])
-                    db.commit()
-                    print(f"更新进度：准备方法论分析，进度{ANALYSIS_STAGES['METHOD_PREPARE']}%")
-                
-                # 执行这个阶段的分析，支持重试
-                print(f"开始{stage_name}阶段分析: paper_id={paper_id}")
-                stage_successful = False
-                retry_count = 0
-                stage_result = None
-                
-                while not stage_successful and retry_count < max_stage_retries:
-                    try:
-                        # 如果有重试，添加重试信息
-                        if retry_count > 0:
-                            print(f"重试{stage_name}阶段分析 (第{retry_count+1}次): paper_id={paper_id}")
-                            
-                            # 对于必需阶段，每次重试都减少内容长度
-                            if is_required and retry_count > 1:
-                                args_list = list(stage_args)
-                                # 减少内容长度
-                                if len(args_list) > 0 and isinstance(args_list[0], str) and len(args_list[0]) > 10000:
-                                    # 每次重试减少25%内容
-                                    reduction_factor = 0.75
-                                    new_content = args_list[0][:int(len(args_list[0]) * reduction_factor)]
-                                    args_list[0] = new_content
-                                    print(f"内容太长，减少到 {len(new_content)} 字符 ({int(reduction_factor*100)}%)")
-                                    stage_args = tuple(args_list)
-                        
-                        # 调用相应的分析函数
-                        stage_result = await stage_func(*stage_args)
-                        
-                        # 检查结果是否有效
-                        if is_valid_result(stage_result, result_field):
-                            # 将结果保存到论文对象中
-                            setattr(paper, result_field, stage_result)
-                            db.commit()
-                            print(f"{stage_name}阶段分析完成，结果有效")
-                            stage_successful = True
-                        else:
-                            # 结果无效，可能需要重试
-                            print(f"{stage_name}阶段结果无效，可能需要重试")
-                            retry_count += 1
-                    except Exception as e:
-                        print(f"{stage_name}阶段分析失败: {str(e)}")
-                        print(f"错误堆栈: {traceback.format_exc()}")
-                        retry_count += 1
-                
-                # 如果所有重试都失败，但这个阶段是必需的，则设置默认值
-                if not stage_successful and is_required:
-                    print(f"{stage_name}阶段分析失败后设置默认值")
-                    if result_field == 'methodology':
-                        default_value = {
-                            "modelArchitecture": "未能从论文中提取方法论信息。",
-                            "keyComponents": [{"name": "未能提取组件", "description": "无法从论文中提取组件信息"}],
-                            "algorithm": "未能提取算法流程信息。",
-                            "innovations": ["未能提取创新点信息"]
-                        }
-                    elif result_field == 'key_findings':
-                        default_value = ["未能从论文中提取关键发现。"]
-                    elif result_field == 'weaknesses':
-                        default_value = [{"type": "未知", "description": "未能从论文中提取弱点信息。", 
-                                          "impact": "无法评估影响", "improvement": "无法提供改进建议"}]
-                    elif result_field == 'future_work':
-                        default_value = [{"direction": "未知", "description": "未能从论文中提取未来工作方向。"}]
-                    elif result_field == 'sections':
-                        default_value = [{"title": "未能提取章节结构", "level": 1, "summary": "无法从论文中提取章节结构信息。"}]
-                    else:
-                        default_value = None
-                    
-                    if default_value is not None:
-                        setattr(paper, result_field, default_value)
-                        db.commit()
-                        print(f"为{result_field}设置了默认值")
-                
-                # 特别处理方法论分析后的代码实现环节
-                if stage_name == "METHODOLOGY" and (stage_successful or is_required):
-                    # 方法论分析完成后，更新进度
-                    setattr(paper, 'analysis_progress', ANALYSIS_STAGES["METHODOLOGY"])
-                    db.commit()
-                    print(f"方法论分析完成，进度{ANALYSIS_STAGES['METHODOLOGY']}%")
+                stage_progress_map[stage_name] = stage_progress
+                stage_field_map[stage_name] = result_field
+                scheduler.add_stage(
+                    stage_name,
+                    _make_analysis_stage(db, paper, stage_name, stage_func, stage_args,
+                                         result_field, is_required, max_stage_retries)
+                )
             
-            # 所有主要分析完成后，生成代码实现
-            try:
-                # 更新进度到代码生成阶段
-                setattr(paper, 'analysis_progress', ANALYSIS_STAGES["CODE"])
-                db.commit()
-                print(f"开始代码实现生成，进度{ANALYSIS_STAGES['CODE']}%")
-                
-                # 获取方法论信息
-                methodology_info = {}
-                if hasattr(paper, 'methodology') and paper.methodology:
-                    if isinstance(paper.methodology, str):
-                        try:
-                            methodology_info = json.loads(paper.methodology)
-                        except:
-                            methodology_info = {"modelArchitecture": paper.methodology}
-                    elif isinstance(paper.methodology, dict):
-                        methodology_info = paper.methodology
-                
-                # 生成代码实现
-                code_implementation = await extract_code_implementation(
-                    core_content,
-                    paper.title,
-                    methodology_info,
-                    ai
+            if completed_stages is None or "CODE" not in completed_stages:
+                stage_progress_map["CODE"] = ANALYSIS_STAGES["CODE"]
+                scheduler.add_stage(
+                    "CODE",
+                    _make_code_stage(db, paper, stage_contexts.get('CODE', core_content), ai),
+                    depends_on=["METHODOLOGY"] if "METHODOLOGY" in stage_progress_map else []
                 )
-                
-                # 保存代码实现
-                paper.code_implementation = code_implementation
-                db.commit()
-                print(f"代码实现生成完成，长度: {len(code_implementation)}")
-            except Exception as e:
-                print(f"代码实现生成失败: {str(e)}")
-                print(f"错误堆栈: {traceback.format_exc()}")
-                # 设置默认代码
-                paper.code_implementation = f"""# {paper.title} - 代码框架
-# 提取代码实现时出错: {str(e)}
-
-import torch
-import torch.nn as nn
-
-# 请根据论文内容自行实现模型
-"""
-                db.commit()
-                print("设置了默认代码实现")
+            
+            # 进度只推进到"其之前的所有阶段均已完成"的位置，保证断点续跑时不会跳过未完成的阶段
+            # 阶段结果已在阶段内提交，进度值随下一次提交写入数据库，实时进度通过事件推送
+            def report_stage_progress(stage_name, stage_successful):
+                finished = set(scheduler.results)
+                progress = getattr(paper, 'analysis_progress', 0) or 0
+                for name, value in sorted(stage_progress_map.items(), key=lambda item: item[1]):
+                    if name not in finished:
+                        break
+                    progress = max(progress, value)
+                setattr(paper, 'analysis_progress', progress)
+                result_field = stage_field_map.get(stage_name)
+                publish_analysis_event(
+                    paper_id, "stage",
+                    stage=stage_name,
+                    progress=progress,
+                    field=result_field,
+                    result=getattr(paper, result_field, None) if result_field else None,
+                )
+                print(f"{stage_name}阶段结束（{len(finished)}/{len(stage_progress_map)}），进度{progress}%")
+                # 使用默认值的阶段不记录断点，重试时重新执行
+                if on_stage_complete is not None and stage_successful:
+                    on_stage_complete(stage_name)
+            
+            scheduler.on_complete = report_stage_progress
+            print(f"并发执行分析阶段: {scheduler.stage_names}，单篇并发上限{settings.ANALYSIS_STAGE_CONCURRENCY}")
+            await scheduler.run()
+            
+            if scheduler.errors:
+                # 阶段函数内部已处理重试和默认值，这里只会是意外错误
+                stage_name, stage_error = next(iter(scheduler.errors.items()))
+                raise Exception(f"{stage_name}阶段执行异常: {str(stage_error)}")
             
             # 所有分析完成，标记为已完成状态
             setattr(paper, 'analysis_progress', ANALYSIS_STAGES["COMPLETE"])
             paper.analysis_status = AnalysisStatus.COMPLETED
             paper.analysis_completed_at = datetime.utcnow()
             db.commit()
+            publish_analysis_event(paper_id, "completed", status=AnalysisStatus.COMPLETED,
+                                   progress=ANALYSIS_STAGES["COMPLETE"])
             
             print(f"论文分析全部完成: paper_id={paper_id}")
             
@@ -409,6 +384,140 @@ import torch.nn as nn
         
         raise e
 
+# 全局阶段并发信号量，限制所有论文同时进行的LLM阶段数
+_global_stage_semaphore = None
+
+def _get_global_stage_semaphore() -> asyncio.Semaphore:
+    """获取（懒创建）全局阶段并发信号量"""
+    global _global_stage_semaphore
+    if _global_stage_semaphore is None:
+        _global_stage_semaphore = asyncio.Semaphore(settings.ANALYSIS_GLOBAL_STAGE_CONCURRENCY)
+    return _global_stage_semaphore
+
+def get_stage_default_value(result_field: str):
+    """必需阶段在所有重试失败后使用的默认值"""
+    if result_field == 'methodology':
+        return {
+            "modelArchitecture": "未能从论文中提取方法论信息。",
+            "keyComponents": [{"name": "未能提取组件", "description": "无法从论文中提取组件信息"}],
+            "algorithm": "未能提取算法流程信息。",
+            "innovations": ["未能提取创新点信息"]
+        }
+    elif result_field == 'key_findings':
+        return ["未能从论文中提取关键发现。"]
+    elif result_field == 'weaknesses':
+        return [{"type": "未知", "description": "未能从论文中提取弱点信息。", 
+                 "impact": "无法评估影响", "improvement": "无法提供改进建议"}]
+    elif result_field == 'future_work':
+        return [{"direction": "未知", "description": "未能从论文中提取未来工作方向。"}]
+    elif result_field == 'sections':
+        return [{"title": "未能提取章节结构", "level": 1, "summary": "无法从论文中提取章节结构信息。"}]
+    return None
+
+def _make_analysis_stage(db: Session, paper: Paper, stage_name: str, stage_func, stage_args: tuple,
+                         result_field: str, is_required: bool, max_stage_retries: int):
+    """
+    构造一个可由调度器执行的分析阶段，包含重试与默认值逻辑
+    
+    阶段结束后结果写入paper对应字段；返回值为是否成功提取。
+    """
+    async def run_stage(_inputs: Dict[str, Any]) -> bool:
+        args = stage_args
+        print(f"开始{stage_name}阶段分析: paper_id={paper.id}")
+        stage_successful = False
+        retry_count = 0
+        
+        while not stage_successful and retry_count < max_stage_retries:
+            try:
+                # 如果有重试，添加重试信息
+                if retry_count > 0:
+                    print(f"重试{stage_name}阶段分析 (第{retry_count+1}次): paper_id={paper.id}")
+                    
+                    # 对于必需阶段，每次重试都减少内容长度
+                    if is_required and retry_count > 1:
+                        args_list = list(args)
+                        if len(args_list) > 0 and isinstance(args_list[0], str) and len(args_list[0]) > 10000:
+                            # 每次重试减少25%内容
+                            reduction_factor = 0.75
+                            new_content = args_list[0][:int(len(args_list[0]) * reduction_factor)]
+                            args_list[0] = new_content
+                            print(f"内容太长，减少到 {len(new_content)} 字符 ({int(reduction_factor*100)}%)")
+                            args = tuple(args_list)
+                
+                stage_result = await stage_func(*args)
+                
+                if is_valid_result(stage_result, result_field):
+                    setattr(paper, result_field, stage_result)
+                    db.commit()
+                    print(f"{stage_name}阶段分析完成，结果有效")
+                    stage_successful = True
+                else:
+                    print(f"{stage_name}阶段结果无效，可能需要重试")
+                    retry_count += 1
+            except Exception as e:
+                print(f"{stage_name}阶段分析失败: {str(e)}")
+                print(f"错误堆栈: {traceback.format_exc()}")
+                retry_count += 1
+        
+        # 如果所有重试都失败，但这个阶段是必需的，则设置默认值
+        if not stage_successful and is_required:
+            print(f"{stage_name}阶段分析失败后设置默认值")
+            default_value = get_stage_default_value(result_field)
+            if default_value is not None:
+                setattr(paper, result_field, default_value)
+                db.commit()
+                print(f"为{result_field}设置了默认值")
+        
+        return stage_successful
+    
+    return run_stage
+
+def _make_code_stage(db: Session, paper: Paper, core_content: str, ai: AIAssistant):
+    """构造代码实现生成阶段，在方法论阶段完成后执行"""
+    async def run_stage(_inputs: Dict[str, Any]) -> bool:
+        try:
+            print(f"开始代码实现生成: paper_id={paper.id}")
+            
+            # 获取方法论信息
+            methodology_info = {}
+            if hasattr(paper, 'methodology') and paper.methodology:
+                if isinstance(paper.methodology, str):
+                    try:
+                        methodology_info = json.loads(paper.methodology)
+                    except:
+                        methodology_info = {"modelArchitecture": paper.methodology}
+                elif isinstance(paper.methodology, dict):
+                    methodology_info = paper.methodology
+            
+            code_implementation = await extract_code_implementation(
+                core_content,
+                paper.title,
+                methodology_info,
+                ai
+            )
+            
+            paper.code_implementation = code_implementation
+            db.commit()
+            print(f"代码实现生成完成，长度: {len(code_implementation)}")
+            return True
+        except Exception as e:
+            print(f"代码实现生成失败: {str(e)}")
+            print(f"错误堆栈: {traceback.format_exc()}")
+            # 设置默认代码
+            paper.code_implementation = f"""# {paper.title} - 代码框架
+# 提取代码实现时出错: {str(e)}
+
+import torch
+import torch.nn as nn
+
+# 请根据论文内容自行实现模型
+"""
+            db.commit()
+            print("设置了默认代码实现")
+            return False
+    
+    return run_stage
+
 def is_valid_result(result, field_name):
     """检查分析结果是否有效"""
     if result is None:
@@ -589,7 +698,8 @@ async def extract_paper_sections(content: str, title: str, ai: AIAssistant) -> L
         response = await ai.generate_completion(
             prompt, 
             temperature=ANALYSIS_TEMPERATURE,
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="analysis"
         )
         
         # 打印返回的原始结果，用于调试
@@ -713,7 +823,8 @@ async def extract_methodology(content: str, title: str, ai: AIAssistant) -> Dict
         response = await ai.generate_completion(
             prompt, 
             temperature=ANALYSIS_TEMPERATURE,
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="analysis"
         )
         
         # 打印响应开头，便于调试
@@ -847,7 +958,8 @@ async def extract_key_findings(content: str, ai: AIAssistant) -> List[str]:
         response = await ai.generate_completion(
             prompt, 
             temperature=ANALYSIS_TEMPERATURE,
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="analysis"
         )
         
         # 打印原始响应开头
@@ -955,7 +1067,8 @@ async def extract_weaknesses(content: str, title: str, ai: AIAssistant) -> List[
         response = await ai.generate_completion(
             prompt, 
             temperature=ANALYSIS_TEMPERATURE,
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="analysis"
         )
         
         # 打印原始响应开头
@@ -1074,7 +1187,8 @@ async def extract_future_work(content: str, title: str, ai: AIAssistant) -> List
         response = await ai.generate_completion(
             prompt, 
             temperature=ANALYSIS_TEMPERATURE,
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="analysis"
         )
         
         # 打印原始响应开头
@@ -1190,7 +1304,8 @@ async def extract_experiments(content: str, ai: AIAssistant) -> Dict[str, Any]:
         response = await ai.generate_completion(
             prompt, 
             temperature=ANALYSIS_TEMPERATURE,
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="analysis"
         )
         
         # 提取JSON部分
@@ -1289,7 +1404,8 @@ async def extract_code_implementation(content: str, title: str, methodology: Dic
         code = await ai.generate_completion(
             prompt, 
             temperature=0.3,  # 较低的温度以保证代码质量
-            system_prompt=system_message
+            system_prompt=system_message,
+            task="code"
         )
         
         print(f"代码生成原始结果长度: {len(code)}")
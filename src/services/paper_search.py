@@ -1,27 +1,30 @@
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, AsyncIterator
 import httpx
 import re
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import asyncio
 from lxml import etree
 import xmltodict
 from urllib.parse import quote_plus
-import time
 import traceback
 import os
-import pickle
+import zlib
 from functools import lru_cache
 
 from src.schemas.paper import SearchSourceEnum, ExternalSearchResult, ExternalSearchResponse
 from src.core.config import settings
+from src.services.cache_store import SQLiteCacheStore
+from src.services.search_fusion import fuse_search_results, result_identity_keys
+from src.services.rate_limit import TokenBucket, CircuitBreaker, backoff_with_jitter, parse_retry_after
 
 # 添加常量配置，便于统一管理和调整
 TIMEOUT_DEFAULT = 30.0  # 默认超时时间（秒）
 RETRY_ATTEMPTS = 3      # 默认重试次数
 RETRY_DELAY_BASE = 2    # 基础重试延迟（秒）
 CACHE_EXPIRY = 3600     # 缓存过期时间（秒）
-MAX_CONCURRENT_REQUESTS = 3  # 最大并发请求数
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # 缓存总大小上限（字节），超出后按LRU淘汰
+CACHE_COMPACT_INTERVAL = 600  # 后台缓存压缩间隔（秒）
 
 class PaperSearchService:
     """论文检索服务，提供对多个学术数据库的检索功能"""
@@ -40,18 +43,43 @@ class PaperSearchService:
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         self.headers = {"User-Agent": self.user_agent}
         
-        # 创建缓存目录
+        # 单文件缓存存储（SQLite WAL），替代每个查询一个pickle文件
         self.cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
-        os.makedirs(self.cache_dir, exist_ok=True)
-        
-        # 初始化健康状态跟踪
-        self.source_health = {
-            source: {"status": True, "last_check": datetime.now(), "failures": 0} 
-            for source in SearchSourceEnum
-        }
+        self.cache = SQLiteCacheStore(
+            os.path.join(self.cache_dir, "search_cache.db"),
+            ttl=CACHE_EXPIRY,
+            max_bytes=CACHE_MAX_BYTES,
+            compact_interval=CACHE_COMPACT_INTERVAL
+        )
         
-        # 限制并发请求的信号量
-        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        # 每个检索源独立的限流器、并发限制和熔断器，一个源变慢不会占用其他源的并发名额
+        self.rate_limiters = {}
+        self.source_semaphores = {}
+        self.breakers = {}
+        for source in SearchSourceEnum:
+            limits = self._get_source_limits(source)
+            self.rate_limiters[source] = TokenBucket(rate=limits["rate"], capacity=limits["burst"])
+            self.source_semaphores[source] = asyncio.Semaphore(int(limits["concurrency"]))
+            self.breakers[source] = CircuitBreaker(
+                failure_threshold=settings.SEARCH_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.SEARCH_BREAKER_RECOVERY_SECONDS
+            )
+        default_limits = self._get_source_limits(None)
+        self.default_rate_limiter = TokenBucket(rate=default_limits["rate"], capacity=default_limits["burst"])
+        self.default_semaphore = asyncio.Semaphore(int(default_limits["concurrency"]))
+    
+    @staticmethod
+    def _get_source_limits(source: Optional[SearchSourceEnum]) -> Dict[str, float]:
+        """从配置读取检索源的限流参数"""
+        limits = settings.SEARCH_SOURCE_RATE_LIMITS
+        default = limits.get("default", {"rate": 2.0, "burst": 2, "concurrency": 2})
+        if source is None:
+            return default
+        return {**default, **limits.get(source.value, {})}
+    
+    def get_source_health(self) -> Dict[str, Dict[str, Any]]:
+        """各检索源的熔断器状态"""
+        return {source.value: breaker.snapshot() for source, breaker in self.breakers.items()}
     
     def __del__(self):
         """析构函数，确保客户端正确关闭"""
@@ -80,59 +108,55 @@ class PaperSearchService:
         import hashlib
         return hashlib.md5(param_str.encode()).hexdigest()
     
-    def _get_cache_path(self, cache_key: str):
-        """获取缓存文件路径"""
-        return os.path.join(self.cache_dir, f"{cache_key}.pkl")
-    
     async def _get_from_cache(self, cache_key: str):
         """从缓存中获取数据"""
-        cache_path = self._get_cache_path(cache_key)
-        if os.path.exists(cache_path):
-            try:
-                # 检查文件是否过期
-                modified_time = os.path.getmtime(cache_path)
-                if time.time() - modified_time > CACHE_EXPIRY:
-                    print(f"缓存已过期: {cache_key}")
-                    return None
-                
-                # 读取缓存文件
-                with open(cache_path, 'rb') as f:
-                    cached_data = pickle.load(f)
-                print(f"使用缓存数据: {cache_key}")
-                return cached_data
-            except Exception as e:
-                print(f"读取缓存错误: {e}")
-        return None
+        payload = await self.cache.get(cache_key)
+        if payload is None:
+            return None
+        try:
+            items = json.loads(zlib.decompress(payload).decode("utf-8"))
+            cached_data = [ExternalSearchResult.model_validate(item) for item in items]
+            print(f"使用缓存数据: {cache_key}")
+            return cached_data
+        except Exception as e:
+            print(f"读取缓存错误: {e}")
+            return None
     
     async def _save_to_cache(self, cache_key: str, data):
         """保存数据到缓存"""
         if not data:  # 不缓存空结果
             return
         
-        cache_path = self._get_cache_path(cache_key)
         try:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(data, f)
+            items = [item.model_dump(mode="json") for item in data]
+            payload = zlib.compress(json.dumps(items, ensure_ascii=False).encode("utf-8"))
+            await self.cache.set(cache_key, payload)
             print(f"数据已缓存: {cache_key}")
         except Exception as e:
             print(f"缓存数据错误: {e}")
     
     async def _safe_request(self, method: str, url: str, **kwargs):
-        """安全的HTTP请求封装，添加重试逻辑和错误处理"""
-        # 提取源信息，用于健康检查
+        """安全的HTTP请求封装：按源限流、熔断，带抖动的指数退避重试"""
+        # 提取源信息，用于限流和熔断
         source = kwargs.pop('source', None)
-        
-        # 如果源已经标记为不健康，直接返回None
-        if source and not self.source_health[source]['status']:
-            last_failure = self.source_health[source]['last_check']
-            # 如果失败时间超过5分钟，重试
-            if datetime.now() - last_failure > timedelta(minutes=5):
-                print(f"源 {source.value} 之前失败，尝试恢复...")
-                self.source_health[source]['status'] = True
-            else:
-                print(f"源 {source.value} 不健康，跳过请求")
-                return None
-                
+        breaker = self.breakers.get(source) if source else None
+        limiter = self.rate_limiters.get(source, self.default_rate_limiter) if source else self.default_rate_limiter
+        semaphore = self.source_semaphores.get(source, self.default_semaphore) if source else self.default_semaphore
+        
+        # 熔断器打开时直接跳过请求
+        if breaker and not breaker.allow_request():
+            print(f"源 {source.value} 熔断中，跳过请求")
+            return None
+        # 半开状态下本次请求是探测请求，无论如何结束（包括被取消）都要释放探测名额
+        is_probe = breaker is not None and breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            return await self._request_with_retries(method, url, source, breaker, limiter, semaphore, **kwargs)
+        finally:
+            if is_probe:
+                breaker.release_probe()
+    
+    async def _request_with_retries(self, method: str, url: str, source, breaker, limiter, semaphore, **kwargs):
+        """按源限流，带抖动的指数退避重试，并记录熔断器的成功/失败"""
         max_retries = kwargs.pop('max_retries', RETRY_ATTEMPTS)
         retry_delay = kwargs.pop('retry_delay', RETRY_DELAY_BASE)
         
@@ -148,76 +172,63 @@ class PaperSearchService:
         kwargs['follow_redirects'] = True
         
         for attempt in range(max_retries):
+            retry_after = None
             try:
-                # 使用信号量限制并发请求
-                async with self.semaphore:
+                # 每个源使用自己的并发名额和令牌桶
+                async with semaphore:
+                    await limiter.acquire()
                     if method.lower() == 'get':
                         response = await self.client.get(url, **kwargs)
                     elif method.lower() == 'post':
                         response = await self.client.post(url, **kwargs)
                     else:
                         raise ValueError(f"不支持的HTTP方法: {method}")
-                    
-                    # 检查HTTP状态码
-                    response.raise_for_status()
-                    
-                    # 成功请求，更新源健康状态
-                    if source:
-                        self.source_health[source] = {
-                            "status": True,
-                            "last_check": datetime.now(),
-                            "failures": 0
-                        }
-                    
-                    return response
+                
+                # 服务端限流：遵守Retry-After，并暂停该源的令牌发放
+                if response.status_code == 429 or (response.status_code == 503 and 'retry-after' in response.headers):
+                    retry_after = parse_retry_after(response.headers.get('retry-after'))
+                    if retry_after is None:
+                        retry_after = backoff_with_jitter(attempt + 1, retry_delay)
+                    limiter.penalize(retry_after)
+                    print(f"源 {source.value if source else url} 被限流 ({response.status_code})，{retry_after:.1f} 秒内暂停请求")
+                
+                # 检查HTTP状态码
+                response.raise_for_status()
+                
+                # 成功请求，关闭熔断器
+                if breaker:
+                    breaker.record_success()
+                
+                return response
             except httpx.TimeoutException:
                 print(f"请求超时 ({attempt+1}/{max_retries}): {url}")
             except httpx.HTTPStatusError as e:
                 print(f"HTTP错误 {e.response.status_code} ({attempt+1}/{max_retries}): {url}")
-                # 对于某些状态码不重试
+                # 对于某些状态码不重试，也不计入源故障
                 if e.response.status_code in [401, 403, 404]:
+                    if breaker:
+                        breaker.record_success()
                     break
             except Exception as e:
                 print(f"请求错误 ({attempt+1}/{max_retries}): {url} - {str(e)}")
             
-            # 记录源故障
-            if source:
-                self.source_health[source]['failures'] += 1
-                self.source_health[source]['last_check'] = datetime.now()
-                # 如果连续失败超过阈值，标记源为不健康
-                if self.source_health[source]['failures'] >= 3:
-                    self.source_health[source]['status'] = False
-                    print(f"源 {source.value} 标记为不健康")
+            # 记录源故障；被限流（429 / Retry-After）不算故障，由令牌桶负责降速
+            if breaker and retry_after is None:
+                breaker.record_failure()
+                if breaker.is_open:
+                    print(f"源 {source.value} 连续失败，熔断器打开")
+                    break
             
-            # 如果不是最后一次尝试，等待后重试
-            if attempt < max_retries - 1:
-                # 使用指数退避策略
-                wait_time = retry_delay * (2 ** attempt)
-                print(f"等待 {wait_time} 秒后重试...")
+            # 如果不是最后一次尝试，等待后重试（限流时令牌桶已负责等待）
+            if attempt < max_retries - 1 and retry_after is None:
+                wait_time = backoff_with_jitter(attempt, retry_delay)
+                print(f"等待 {wait_time:.1f} 秒后重试...")
                 await asyncio.sleep(wait_time)
         
         return None
     
-    async def search_papers(
-        self,
-        query: str,
-        sources: List[SearchSourceEnum] = [SearchSourceEnum.ARXIV, SearchSourceEnum.SEMANTICSCHOLAR, 
-                                          SearchSourceEnum.CORE, SearchSourceEnum.OPENALEX],
-        limit: int = 10,
-        offset: int = 0,
-        year_from: Optional[int] = None,
-        year_to: Optional[int] = None,
-        full_text: bool = False,
-        domain: Optional[str] = None,
-        venues: Optional[List[str]] = None
-    ) -> ExternalSearchResponse:
-        """从多个学术数据库搜索论文"""
-        print(f"开始搜索，关键词: '{query}', 来源: {sources}, 限制: {limit}, 偏移: {offset}")
-        print(f"搜索条件：年份范围: {year_from}-{year_to}, 全文搜索: {full_text}, 领域: {domain}, 会议/期刊: {venues}")
-        
-        all_results = []
-        search_tasks = []
-        
+    def _prepare_sources(self, sources: List[SearchSourceEnum]) -> List[SearchSourceEnum]:
+        """校验并过滤搜索源"""
         # 确保sources是有效的枚举值
         valid_sources = []
         for source in sources:
@@ -250,9 +261,11 @@ class PaperSearchService:
             print("没有指定支持的搜索源，使用默认配置")
             valid_sources = [SearchSourceEnum.ARXIV]
         
-        sources = valid_sources
-        print(f"最终使用的搜索源: {sources}")
-        
+        print(f"最终使用的搜索源: {valid_sources}")
+        return valid_sources
+    
+    def _prepare_query(self, query: str, domain: Optional[str]) -> str:
+        """净化搜索查询，空查询时回退到领域或默认查询"""
         # 净化搜索查询
         clean_query = query.strip()
         
@@ -266,6 +279,51 @@ class PaperSearchService:
             clean_query = "recommendation system"
             print(f"查询和领域都为空，使用默认查询 '{clean_query}'")
         
+        return clean_query
+    
+    def _create_source_search(self, source: SearchSourceEnum, clean_query: str, limit: int, offset: int,
+                              year_from: Optional[int], year_to: Optional[int], domain: Optional[str]):
+        """为单个搜索源创建搜索协程，不支持的源返回None"""
+        if source == SearchSourceEnum.ARXIV:
+            print(f"添加arXiv搜索任务")
+            return self.search_arxiv(clean_query, limit, offset, year_from, year_to, domain)
+        elif source == SearchSourceEnum.SEMANTICSCHOLAR:
+            print(f"添加Semantic Scholar搜索任务")
+            return self.search_semantic_scholar_crawler(clean_query, limit, offset, year_from, year_to)
+        elif source == SearchSourceEnum.CORE:
+            print(f"添加CORE搜索任务")
+            return self.search_core_crawler(clean_query, limit, offset, year_from, year_to)
+        elif source == SearchSourceEnum.OPENALEX:
+            print(f"添加OpenAlex搜索任务")
+            return self.search_openalex_crawler(clean_query, limit, offset, year_from, year_to)
+        elif source == SearchSourceEnum.LOCAL:
+            # 本地搜索在另一个服务中实现
+            print(f"跳过LOCAL搜索源(未实现)")
+        return None
+    
+    async def search_papers(
+        self,
+        query: str,
+        sources: List[SearchSourceEnum] = [SearchSourceEnum.ARXIV, SearchSourceEnum.SEMANTICSCHOLAR, 
+                                          SearchSourceEnum.CORE, SearchSourceEnum.OPENALEX],
+        limit: int = 10,
+        offset: int = 0,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        full_text: bool = False,
+        domain: Optional[str] = None,
+        venues: Optional[List[str]] = None
+    ) -> ExternalSearchResponse:
+        """从多个学术数据库搜索论文"""
+        print(f"开始搜索，关键词: '{query}', 来源: {sources}, 限制: {limit}, 偏移: {offset}")
+        print(f"搜索条件：年份范围: {year_from}-{year_to}, 全文搜索: {full_text}, 领域: {domain}, 会议/期刊: {venues}")
+        
+        all_results = []
+        search_tasks = []
+        
+        sources = self._prepare_sources(sources)
+        clean_query = self._prepare_query(query, domain)
+        
         # 对于每个源，首先尝试从缓存获取结果
         for source in sources:
             # 生成缓存键
@@ -289,30 +347,15 @@ class PaperSearchService:
                 continue
             
             # 如果缓存未命中，创建搜索任务
-            if source == SearchSourceEnum.ARXIV:
-                print(f"添加arXiv搜索任务")
-                search_tasks.append((source, self.search_arxiv(clean_query, limit, offset, year_from, year_to, domain), cache_key))
-            elif source == SearchSourceEnum.SEMANTICSCHOLAR:
-                print(f"添加Semantic Scholar搜索任务")
-                search_tasks.append((source, self.search_semantic_scholar_crawler(clean_query, limit, offset, year_from, year_to), cache_key))
-            elif source == SearchSourceEnum.CORE:
-                print(f"添加CORE搜索任务")
-                search_tasks.append((source, self.search_core_crawler(clean_query, limit, offset, year_from, year_to), cache_key))
-            elif source == SearchSourceEnum.OPENALEX:
-                print(f"添加OpenAlex搜索任务")
-                search_tasks.append((source, self.search_openalex_crawler(clean_query, limit, offset, year_from, year_to), cache_key))
-            elif source == SearchSourceEnum.LOCAL:
-                # 本地搜索在另一个服务中实现
-                print(f"跳过LOCAL搜索源(未实现)")
+            search_coro = self._create_source_search(source, clean_query, limit, offset, year_from, year_to, domain)
+            if search_coro is not None:
+                search_tasks.append((source, search_coro, cache_key))
         
         # 如果所有结果都从缓存获取，且至少有一个结果，直接返回
         if all_results and not search_tasks:
             print(f"所有结果都从缓存获取，共 {len(all_results)} 条")
-            # 排序并限制结果
-            all_results.sort(
-                key=lambda x: x.publication_date if x.publication_date else datetime.min,
-                reverse=True
-            )
+            # 跨来源去重合并，按RRF排序
+            all_results = fuse_search_results(all_results)
             total_count = len(all_results)
             limited_results = all_results[offset:offset+limit] if offset < len(all_results) else []
             
@@ -369,12 +412,11 @@ class PaperSearchService:
                 except Exception as e:
                     print(f"放宽条件搜索错误: {e}")
             
-            # 默认按发布时间从新到旧排序
+            # 跨来源去重合并，按倒数排名融合(RRF)排序
             if all_results:
-                all_results.sort(
-                    key=lambda x: x.publication_date if x.publication_date else datetime.min,
-                    reverse=True
-                )
+                merged_count = len(all_results)
+                all_results = fuse_search_results(all_results)
+                print(f"结果融合: {merged_count} 条合并为 {len(all_results)} 条")
             
             # 限制结果数量
             total_count = len(all_results)
@@ -392,11 +434,8 @@ class PaperSearchService:
             # 即使有错误，也返回已经获取到的结果
             if all_results:
                 print(f"尽管有错误，仍然返回已获取的 {len(all_results)} 条结果")
-                # 排序并限制结果
-                all_results.sort(
-                    key=lambda x: x.publication_date if x.publication_date else datetime.min,
-                    reverse=True
-                )
+                # 去重合并并限制结果
+                all_results = fuse_search_results(all_results)
                 total_count = len(all_results)
                 limited_results = all_results[offset:offset+limit] if offset < len(all_results) else []
                 
@@ -412,6 +451,123 @@ class PaperSearchService:
                 query=query
             )
     
+    async def search_papers_stream(
+        self,
+        query: str,
+        sources: List[SearchSourceEnum] = [SearchSourceEnum.ARXIV, SearchSourceEnum.SEMANTICSCHOLAR, 
+                                          SearchSourceEnum.CORE, SearchSourceEnum.OPENALEX],
+        limit: int = 10,
+        offset: int = 0,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        full_text: bool = False,
+        domain: Optional[str] = None,
+        venues: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式搜索：每个来源返回后立即产出该来源去重后的新结果
+        
+        产出的事件:
+            {"event": "batch", "source": ..., "cached": bool, "results": [...]}
+            {"event": "error", "source": ..., "detail": ...}
+            {"event": "summary", "results": [...], "total": int, "query": str, "sources": {...}}
+        """
+        print(f"开始流式搜索，关键词: '{query}', 来源: {sources}, 限制: {limit}, 偏移: {offset}")
+        
+        sources = self._prepare_sources(sources)
+        clean_query = self._prepare_query(query, domain)
+        
+        all_results = []
+        emitted_keys = set()
+        source_counts = {}
+        
+        def new_batch(results: List[ExternalSearchResult]) -> List[ExternalSearchResult]:
+            """合并批次内重复项，并剔除之前批次已经发送过的论文"""
+            fresh = []
+            for result in fuse_search_results(results):
+                keys = result_identity_keys(result)
+                if keys & emitted_keys:
+                    continue
+                emitted_keys.update(keys)
+                fresh.append(result)
+            return fresh
+        
+        async def run_source(source, search_coro, cache_key):
+            return source, cache_key, await search_coro
+        
+        pending = []
+        for source in sources:
+            cache_key = self._get_cache_key(
+                clean_query, 
+                source,
+                limit=limit,
+                offset=offset,
+                year_from=year_from,
+                year_to=year_to,
+                full_text=full_text,
+                domain=domain,
+                venues=venues
+            )
+            
+            cached_results = await self._get_from_cache(cache_key)
+            if cached_results:
+                print(f"使用 {source.value} 的缓存结果")
+                all_results.extend(cached_results)
+                source_counts[source.value] = len(cached_results)
+                yield {
+                    "event": "batch",
+                    "source": source.value,
+                    "cached": True,
+                    "results": [r.model_dump(mode="json") for r in new_batch(cached_results)]
+                }
+                continue
+            
+            search_coro = self._create_source_search(source, clean_query, limit, offset, year_from, year_to, domain)
+            if search_coro is not None:
+                pending.append(asyncio.ensure_future(run_source(source, search_coro, cache_key)))
+        
+        try:
+            # 按完成顺序处理各来源，最快的来源最先返回给用户
+            for next_done in asyncio.as_completed(pending):
+                try:
+                    source, cache_key, result = await next_done
+                except Exception as e:
+                    print(f"流式搜索任务发生错误: {e}")
+                    yield {"event": "error", "source": None, "detail": str(e)}
+                    continue
+                
+                if not isinstance(result, list):
+                    print(f"搜索任务 {source.value} 返回了意外的类型: {type(result)}")
+                    source_counts[source.value] = 0
+                    continue
+                
+                print(f"搜索任务 {source.value} 完成, 返回 {len(result)} 条结果")
+                source_counts[source.value] = len(result)
+                if result:
+                    all_results.extend(result)
+                    await self._save_to_cache(cache_key, result)
+                yield {
+                    "event": "batch",
+                    "source": source.value,
+                    "cached": False,
+                    "results": [r.model_dump(mode="json") for r in new_batch(result)]
+                }
+        finally:
+            # 客户端断开时取消仍在进行的搜索
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+        
+        fused = fuse_search_results(all_results)
+        limited_results = fused[offset:offset+limit] if offset < len(fused) else []
+        yield {
+            "event": "summary",
+            "results": [r.model_dump(mode="json") for r in limited_results],
+            "total": len(fused),
+            "query": query,
+            "sources": source_counts
+        }
+    
     async def search_arxiv(
         self,
         query: str,
@@ -981,12 +1137,15 @@ class PaperSearchService:
         
         try:
             print(f"CORE API请求URL: {api_endpoint}，请求体: {json.dumps(payload)}")
-            response = await self.client.post(
+            response = await self._safe_request(
+                'post',
                 api_endpoint, 
                 json=payload,
-                headers={**self.headers, "Content-Type": "application/json"}
+                headers={"Content-Type": "application/json"},
+                source=SearchSourceEnum.CORE
             )
-            response.raise_for_status()
+            if not response:
+                raise Exception("CORE API请求失败")
             
             data = response.json()
             
@@ -1068,8 +1227,10 @@ class PaperSearchService:
         
         try:
             print(f"CORE网页爬虫请求URL: {url}")
-            response = await self.client.get(url, headers=self.headers)
-            response.raise_for_status()
+            response = await self._safe_request('get', url, source=SearchSourceEnum.CORE)
+            if not response:
+                print("CORE网页爬虫请求失败，返回空结果")
+                return []
             
             # 解析HTML响应
             html = etree.HTML(response.text)
@@ -1241,11 +1402,15 @@ class PaperSearchService:
         
         try:
             print(f"OpenAlex API请求URL: {url}")
-            response = await self.client.get(
+            response = await self._safe_request(
+                'get',
                 url, 
-                headers={**self.headers, "Accept": "application/json"}
+                headers={"Accept": "application/json"},
+                source=SearchSourceEnum.OPENALEX
             )
-            response.raise_for_status()
+            if not response:
+                print("OpenAlex API请求失败，返回空结果")
+                return []
             
             data = response.json()
             
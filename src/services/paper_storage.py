@@ -0,0 +1,135 @@
+"""
+按内容哈希保存上传的论文文件，并缓存提取结果
+
+上传时边写临时文件边计算SHA-256，文件保存在 uploads/papers/sha256/<前两位>/<哈希>.pdf，
+同一文件无论被多少用户上传只保存一份。paper_files 表记录每个文件的引用计数和提取结果
+（正文、元数据、页数、章节偏移），重复上传直接复用，不再解析PDF；删除论文时引用计数减一，
+降为0时才删除文件。
+"""
+import hashlib
+import os
+import shutil
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.paper import Paper, PaperFile
+from src.services.context_retrieval import section_offsets
+
+# 流式读取上传文件的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+STORAGE_ROOT = os.path.join("uploads", "papers", "sha256")
+
+
+async def save_upload_hashed(file: UploadFile, temp_path: str) -> Tuple[str, int]:
+    """将上传文件写入临时路径，同时计算SHA-256，返回 (哈希, 字节数)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(temp_path, "wb") as buffer:
+        while True:
+            chunk = await file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            buffer.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def storage_path(file_hash: str) -> str:
+    return os.path.join(STORAGE_ROOT, file_hash[:2], f"{file_hash}.pdf")
+
+
+def find_in_library(db: Session, user_id: str, file_hash: str) -> Optional[Tuple[str, str]]:
+    """用户库中已有的相同文件，返回 (论文ID, 标题)"""
+    row = db.query(Paper.id, Paper.title).filter(
+        Paper.owner_id == user_id,
+        Paper.file_hash == file_hash
+    ).first()
+    return (row[0], row[1]) if row else None
+
+
+def get_cached_file(db: Session, file_hash: str) -> Optional[PaperFile]:
+    return db.query(PaperFile).filter(PaperFile.sha256 == file_hash).first()
+
+
+def extraction_from_cache(paper_file: PaperFile, include_text: bool) -> Optional[Dict[str, Any]]:
+    """缓存中有可用的提取结果时返回，与 pdf_extraction.extract_pdf 的返回格式一致"""
+    if paper_file is None or paper_file.file_metadata is None:
+        return None
+    if include_text and paper_file.content is None:
+        return None
+    return {
+        "backend": paper_file.extraction_backend,
+        "metadata": dict(paper_file.file_metadata or {}),
+        "page_count": paper_file.page_count,
+        "content": paper_file.content if include_text else None,
+    }
+
+
+def _place_file(temp_path: str, path: str):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 先复制到同目录的临时文件再原子替换，并发上传同一文件时不会读到写了一半的文件
+    staging = f"{path}.{os.getpid()}.tmp"
+    shutil.copyfile(temp_path, staging)
+    os.replace(staging, path)
+
+
+def acquire_file(db: Session, temp_path: str, file_hash: str, file_size: int,
+                 extraction: Optional[Dict[str, Any]] = None) -> PaperFile:
+    """
+    保存文件（已存在则复用）并将引用计数加一，同时写入尚未缓存的提取结果
+
+    只刷新不提交，由调用方随论文记录一起提交。
+    """
+    path = storage_path(file_hash)
+    _place_file(temp_path, path)
+
+    for attempt in range(2):
+        paper_file = db.query(PaperFile).filter(PaperFile.sha256 == file_hash).with_for_update().first()
+        if paper_file is None:
+            paper_file = PaperFile(sha256=file_hash, file_path=path, file_size=file_size, ref_count=0)
+            db.add(paper_file)
+        paper_file.ref_count = (paper_file.ref_count or 0) + 1
+        if extraction is not None and (paper_file.file_metadata is None or
+                                       (paper_file.content is None and extraction.get("content") is not None)):
+            paper_file.content = extraction.get("content")
+            paper_file.file_metadata = extraction.get("metadata") or {}
+            paper_file.page_count = extraction.get("page_count")
+            paper_file.extraction_backend = extraction.get("backend")
+            paper_file.section_offsets = section_offsets(paper_file.content) if paper_file.content else None
+        try:
+            db.flush()
+            break
+        except IntegrityError:
+            # 另一个请求同时插入了该文件的记录，重新读取后累加
+            db.rollback()
+            if attempt == 1:
+                raise
+
+    # 文件可能在引用计数归零后被并发删除，这里确保记录对应的文件存在
+    _place_file(temp_path, path)
+    return paper_file
+
+
+def release_file(db: Session, file_hash: str) -> Optional[str]:
+    """
+    引用计数减一；降为0时删除记录，并返回需要删除的文件路径
+
+    只刷新不提交，调用方在提交成功后再删除文件。
+    """
+    paper_file = db.query(PaperFile).filter(PaperFile.sha256 == file_hash).with_for_update().first()
+    if paper_file is None:
+        return None
+    paper_file.ref_count = (paper_file.ref_count or 0) - 1
+    if paper_file.ref_count > 0:
+        db.flush()
+        return None
+    path = paper_file.file_path
+    db.delete(paper_file)
+    db.flush()
+    return path
@@ -0,0 +1,169 @@
+"""
+分析进度发布/订阅总线
+
+分析流程在每个阶段结束时发布事件（包含该阶段的部分结果），API通过SSE推送给前端，
+取代对 GET /papers/{id} 的轮询。分析在Web进程内执行时使用进程内实现；由独立worker进程
+执行时通过Redis频道跨进程转发（PROGRESS_BUS_BACKEND=redis，见 progress_bus_backend）。
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 订阅者无事件时的心跳间隔（秒），迭代器在超时时产出None
+HEARTBEAT_INTERVAL = 15.0
+
+
+def analysis_channel(paper_id: str) -> str:
+    return f"analysis:{paper_id}"
+
+
+class MemoryProgressBus:
+    """进程内总线，每个订阅者一个有界队列，队列满时丢弃最旧的事件"""
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def publish(self, channel: str, event: Dict[str, Any]):
+        for queue in list(self._subscribers.get(channel, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, heartbeat: float = HEARTBEAT_INTERVAL):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield self._iterate(queue, heartbeat)
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    @staticmethod
+    async def _iterate(queue: asyncio.Queue, heartbeat: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    async def close(self):
+        self._subscribers.clear()
+
+
+class RedisProgressBus:
+    """基于Redis发布/订阅的跨进程总线"""
+
+    key_prefix = "recagent:progress:"
+
+    def __init__(self, client):
+        self._client = client
+        # 保存未完成的发布任务，防止被垃圾回收
+        self._pending: Set[asyncio.Task] = set()
+
+    def publish(self, channel: str, event: Dict[str, Any]):
+        data = json.dumps(event, ensure_ascii=False, default=str)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"没有运行中的事件循环，丢弃进度事件: {channel}")
+            return
+        task = loop.create_task(self._publish(channel, data))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self, channel: str, data: str):
+        try:
+            await self._client.publish(self.key_prefix + channel, data)
+        except Exception as e:
+            logger.warning(f"发布进度事件失败: {str(e)}")
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, heartbeat: float = HEARTBEAT_INTERVAL):
+        pubsub = self._client.pubsub()
+        await pubsub.subscribe(self.key_prefix + channel)
+        try:
+            yield self._iterate(pubsub, heartbeat)
+        finally:
+            try:
+                await pubsub.unsubscribe()
+                await pubsub.close()
+            except Exception as e:
+                logger.warning(f"关闭进度订阅失败: {str(e)}")
+
+    @staticmethod
+    async def _iterate(pubsub, heartbeat: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                yield None
+                continue
+            try:
+                yield json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+
+    async def close(self):
+        """等待未完成的发布并关闭连接"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        await self._client.close()
+
+
+def progress_bus_backend() -> str:
+    """
+    进度总线后端：未显式配置时，启用了任务队列且分析由独立worker进程执行
+    （ANALYSIS_EMBEDDED_WORKER=False）则使用redis，否则使用进程内实现
+    """
+    if settings.PROGRESS_BUS_BACKEND:
+        return settings.PROGRESS_BUS_BACKEND
+    if settings.ANALYSIS_QUEUE_ENABLED and not settings.ANALYSIS_EMBEDDED_WORKER:
+        return "redis"
+    return "memory"
+
+
+def _create_progress_bus():
+    if progress_bus_backend() == "redis":
+        try:
+            import redis.asyncio as redis_asyncio
+            client = redis_asyncio.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD or None,
+                decode_responses=True,
+            )
+            return RedisProgressBus(client)
+        except ImportError:
+            logger.warning("未安装redis包，进度总线使用进程内实现")
+    return MemoryProgressBus()
+
+
+# 全局进度总线
+progress_bus = _create_progress_bus()
+
+
+def publish_analysis_event(paper_id: str, event_type: str, **fields):
+    """
+    发布论文分析事件
+
+    event_type:
+        stage: 阶段完成，携带 stage、field、result（该阶段的部分结果）和 progress
+        progress: 预处理进度
+        retrying: 任务失败，等待重试
+        completed / failed: 分析结束
+    """
+    event = {"type": event_type, "paper_id": paper_id, **fields}
+    try:
+        progress_bus.publish(analysis_channel(paper_id), event)
+    except Exception as e:
+        logger.warning(f"发布分析事件失败: {str(e)}")
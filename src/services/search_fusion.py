@@ -0,0 +1,235 @@
+"""
+多源检索结果融合
+
+将来自arXiv、Semantic Scholar、CORE、OpenAlex等来源的结果按DOI、arXiv ID
+以及标题MinHash/LSH合并为同一篇论文，合并各来源的字段，并使用倒数排名融合
+（Reciprocal Rank Fusion）排序。整体为线性时间复杂度。
+"""
+import re
+import zlib
+from typing import Dict, List, Optional
+
+from src.schemas.paper import ExternalSearchResult, SearchSourceEnum
+
+RRF_K = 60                  # RRF平滑常数
+MINHASH_PERMUTATIONS = 32   # MinHash签名长度
+LSH_BANDS = 8               # LSH分段数（每段 MINHASH_PERMUTATIONS / LSH_BANDS 行）
+TITLE_SIMILARITY = 0.8      # 判定为同一标题的Jaccard相似度阈值
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (1 + 2 * i * 0x9E3779B1 % _MERSENNE_PRIME, 7 + i * 0x85EBCA77 % _MERSENNE_PRIME)
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+# 合并字段时各来源的优先级（越靠前越优先）
+PDF_SOURCE_PRIORITY = [SearchSourceEnum.ARXIV, SearchSourceEnum.CORE, SearchSourceEnum.OPENALEX,
+                       SearchSourceEnum.SEMANTICSCHOLAR]
+VENUE_SOURCE_PRIORITY = [SearchSourceEnum.OPENALEX, SearchSourceEnum.SEMANTICSCHOLAR, SearchSourceEnum.CORE,
+                         SearchSourceEnum.ARXIV]
+
+_ARXIV_ID_PATTERN = re.compile(r'(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?', re.IGNORECASE)
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """规范化DOI：去掉URL前缀并转为小写"""
+    if not doi:
+        return None
+    doi = doi.strip().lower()
+    doi = re.sub(r'^(https?://)?(dx\.)?doi\.org/', '', doi)
+    doi = re.sub(r'^doi:\s*', '', doi)
+    return doi or None
+
+
+def normalize_arxiv_id(arxiv_id: Optional[str], url: Optional[str] = None) -> Optional[str]:
+    """规范化arXiv ID：去掉前缀和版本号，缺失时尝试从arXiv链接中提取"""
+    candidates = [arxiv_id]
+    if url and "arxiv.org" in url:
+        candidates.append(url.rsplit("/", 1)[-1].replace(".pdf", ""))
+    for candidate in candidates:
+        if not candidate:
+            continue
+        candidate = re.sub(r'^arxiv:\s*', '', candidate.strip(), flags=re.IGNORECASE)
+        match = _ARXIV_ID_PATTERN.search(candidate)
+        if match:
+            return match.group(1).lower()
+    return None
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """规范化标题：小写、去标点、合并空白"""
+    if not title:
+        return ""
+    title = re.sub(r'[^\w\s]', ' ', title.lower())
+    return re.sub(r'\s+', ' ', title).strip()
+
+
+def _title_shingles(title: str) -> set:
+    """标题的字符3-gram集合"""
+    if len(title) < 3:
+        return {title} if title else set()
+    return {title[i:i + 3] for i in range(len(title) - 2)}
+
+
+def _minhash(shingles: set) -> List[int]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 保留较早出现的记录作为根
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+
+def _ids_conflict(a: dict, b: dict) -> bool:
+    """两条记录都带有ID但ID不同，说明不是同一篇论文"""
+    for field in ("doi", "arxiv_id"):
+        if a[field] and b[field] and a[field] != b[field]:
+            return True
+    return False
+
+
+def _pick_by_priority(members: List[ExternalSearchResult], field: str,
+                      priority: List[SearchSourceEnum]) -> Optional[str]:
+    ranked = sorted(
+        (m for m in members if getattr(m, field)),
+        key=lambda m: priority.index(m.source) if m.source in priority else len(priority)
+    )
+    return getattr(ranked[0], field) if ranked else None
+
+
+def _merge_group(members: List[ExternalSearchResult]) -> ExternalSearchResult:
+    """合并同一篇论文的多条记录，members按排名从高到低排列"""
+    primary = members[0]
+    if len(members) == 1:
+        return primary
+
+    abstracts = [m.abstract for m in members if m.abstract]
+    authors = max((m.authors for m in members), key=lambda a: len(a or []))
+    dates = [m.publication_date for m in members if m.publication_date]
+
+    return primary.model_copy(update={
+        "title": primary.title or next((m.title for m in members if m.title), ""),
+        "authors": authors or [],
+        "abstract": max(abstracts, key=len) if abstracts else None,
+        "publication_date": min(dates) if dates else None,
+        "venue": _pick_by_priority(members, "venue", VENUE_SOURCE_PRIORITY),
+        "url": next((m.url for m in members if m.url), None),
+        "pdf_url": _pick_by_priority(members, "pdf_url", PDF_SOURCE_PRIORITY),
+        "doi": next((m.doi for m in members if m.doi), None),
+        "arxiv_id": next((m.arxiv_id for m in members if m.arxiv_id), None),
+    })
+
+
+def result_identity_keys(result: ExternalSearchResult) -> set:
+    """一条结果的所有身份键（DOI、arXiv ID、规范化标题），用于增量去重"""
+    keys = set()
+    doi = normalize_doi(result.doi)
+    if doi:
+        keys.add(("doi", doi))
+    arxiv_id = normalize_arxiv_id(result.arxiv_id, result.pdf_url or result.url)
+    if arxiv_id:
+        keys.add(("arxiv", arxiv_id))
+    title = normalize_title(result.title)
+    if title:
+        keys.add(("title", title))
+    return keys
+
+
+def fuse_search_results(results: List[ExternalSearchResult]) -> List[ExternalSearchResult]:
+    """
+    去重、合并并按RRF排序多源检索结果
+
+    每个来源的结果需保持其原始排名顺序（同一来源内越靠前排名越高）。
+
+    Args:
+        results: 各来源结果按来源依次拼接后的列表
+
+    Returns:
+        合并后按融合得分从高到低排列的结果列表
+    """
+    if not results:
+        return []
+
+    # 计算每条记录在其来源内的排名
+    source_counters: Dict[SearchSourceEnum, int] = {}
+    records = []
+    for result in results:
+        rank = source_counters.get(result.source, 0) + 1
+        source_counters[result.source] = rank
+        title = normalize_title(result.title)
+        records.append({
+            "rank": rank,
+            "doi": normalize_doi(result.doi),
+            "arxiv_id": normalize_arxiv_id(result.arxiv_id, result.pdf_url or result.url),
+            "title": title,
+            "shingles": _title_shingles(title),
+        })
+
+    uf = _UnionFind(len(records))
+
+    # 1. 按标识符合并
+    for field in ("doi", "arxiv_id"):
+        first_seen: Dict[str, int] = {}
+        for index, record in enumerate(records):
+            key = record[field]
+            if not key:
+                continue
+            if key in first_seen:
+                uf.union(first_seen[key], index)
+            else:
+                first_seen[key] = index
+
+    # 2. 按标题MinHash/LSH合并，只比较落入同一桶的候选对
+    rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+    buckets: Dict[tuple, List[int]] = {}
+    for index, record in enumerate(records):
+        if not record["shingles"]:
+            continue
+        signature = _minhash(record["shingles"])
+        for band in range(LSH_BANDS):
+            band_key = (band, tuple(signature[band * rows_per_band:(band + 1) * rows_per_band]))
+            candidates = buckets.setdefault(band_key, [])
+            for other in candidates:
+                if uf.find(other) == uf.find(index):
+                    continue
+                if _ids_conflict(records[other], record):
+                    continue
+                if _jaccard(records[other]["shingles"], record["shingles"]) >= TITLE_SIMILARITY:
+                    uf.union(other, index)
+            candidates.append(index)
+
+    # 3. 合并分组并计算RRF得分
+    groups: Dict[int, List[int]] = {}
+    for index in range(len(records)):
+        groups.setdefault(uf.find(index), []).append(index)
+
+    fused = []
+    for root, members in groups.items():
+        members.sort(key=lambda i: (records[i]["rank"], i))
+        score = sum(1.0 / (RRF_K + records[i]["rank"]) for i in members)
+        fused.append((score, root, _merge_group([results[i] for i in members])))
+
+    fused.sort(key=lambda item: (-item[0], item[1]))
+    return [item[2] for item in fused]
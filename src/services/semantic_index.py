@@ -0,0 +1,442 @@
+"""
+论文库语义检索索引
+
+每个用户一个FAISS HNSW索引（内积，向量已归一化即余弦相似度），向量来自论文的
+标题+摘要以及分块后的正文，使用sentence-transformers在CPU上批量计算。
+
+存储布局（SEMANTIC_INDEX_DIR/<user_id>/）：
+    meta.json           版本号、索引文件名、行号到 (paper_id, 分块序号) 的映射、已删除的行、
+                        各论文最近一次写入时的版本号
+    index-<版本>.faiss  HNSW索引
+
+查询进程以内存映射方式只读加载索引，发现 meta.json 版本变化时重新加载；写入在文件锁内
+读取最新版本、追加向量后写新文件并原子替换 meta.json，多个进程可同时使用。HNSW不支持
+删除，删除的论文先记为墓碑行，墓碑比例超过阈值时重建索引。全量重建的编码在锁外进行，
+期间写入的论文在替换前按最新索引合并进来。
+
+已有数据可通过以下命令重建：
+
+    python -m src.services.semantic_index --rebuild [--user-id USER_ID]
+"""
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.config import settings
+from src.services.search_fusion import RRF_K
+
+try:
+    import numpy as np
+    import faiss
+except ImportError:
+    np = None
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows下没有fcntl，只能保证单进程内的写入互斥
+    fcntl = None
+
+# 墓碑行超过该比例时重建索引
+COMPACT_DELETED_RATIO = 0.2
+# 查询时多取的候选数倍数（同一篇论文有多个分块）
+SEARCH_OVERSAMPLE = 8
+# 进程内最多缓存的用户索引数
+MAX_LOADED_INDEXES = 32
+
+
+def is_available() -> bool:
+    """语义检索依赖是否可用"""
+    if not settings.SEMANTIC_SEARCH_ENABLED or faiss is None:
+        return False
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_chunks(title: Optional[str], abstract: Optional[str], content: Optional[str]) -> List[str]:
+    """论文的待编码文本：第0块为标题+摘要，其后为正文分块"""
+    chunks = []
+    head = "\n".join(part for part in (title, abstract) if part)
+    if head.strip():
+        chunks.append(head)
+
+    if content:
+        size = settings.SEMANTIC_CHUNK_CHARS
+        step = max(1, size - size // 10)  # 相邻分块重叠10%
+        max_chunks = settings.SEMANTIC_MAX_CHUNKS_PER_PAPER
+        for start in range(0, len(content), step):
+            if len(chunks) >= max_chunks:
+                break
+            chunk = content[start:start + size].strip()
+            if chunk:
+                chunks.append(chunk)
+    return chunks
+
+
+def fuse_rankings(*rankings: Sequence[str]) -> List[Tuple[str, float]]:
+    """按倒数排名融合(RRF)合并多个有序ID列表"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class SemanticIndex:
+    """按用户划分的向量索引"""
+
+    def __init__(self, base_dir: str, model_name: str):
+        self.base_dir = base_dir
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # user_id -> (版本, 索引, 行映射, 已删除行)
+        self._loaded: "OrderedDict[str, Tuple[int, object, List[List], set]]" = OrderedDict()
+        self._loaded_lock = threading.Lock()
+
+    # ---- 向量计算 ----
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"加载向量模型: {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def embed(self, texts: List[str]):
+        """批量计算归一化向量，返回 float32 矩阵"""
+        vectors = self._get_model().encode(
+            texts,
+            batch_size=settings.SEMANTIC_EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors, dtype="float32")
+
+    # ---- 存储 ----
+
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.base_dir, user_id)
+
+    def _read_meta(self, user_id: str) -> Optional[Dict]:
+        path = os.path.join(self._user_dir(user_id), "meta.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _read_index(self, user_id: str, meta: Dict, mmap: bool):
+        path = os.path.join(self._user_dir(user_id), meta["index_file"])
+        if mmap:
+            try:
+                return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except Exception:
+                # 部分索引类型不支持内存映射
+                pass
+        return faiss.read_index(path)
+
+    def _load(self, user_id: str, retry: bool = True):
+        """获取用户索引的只读视图，版本变化时重新加载"""
+        meta = self._read_meta(user_id)
+        if meta is None:
+            return None
+        with self._loaded_lock:
+            loaded = self._loaded.get(user_id)
+            if loaded is not None and loaded[0] == meta["version"]:
+                self._loaded.move_to_end(user_id)
+                return loaded
+        try:
+            index = self._read_index(user_id, meta, mmap=True)
+        except (FileNotFoundError, RuntimeError):
+            # 读取meta后索引文件恰好被新版本替换，重新读取一次
+            if not retry:
+                raise
+            return self._load(user_id, retry=False)
+        loaded = (meta["version"], index, meta["rows"], set(meta["deleted"]))
+        with self._loaded_lock:
+            self._loaded[user_id] = loaded
+            self._loaded.move_to_end(user_id)
+            while len(self._loaded) > MAX_LOADED_INDEXES:
+                self._loaded.popitem(last=False)
+        return loaded
+
+    def _new_index(self, dim: int):
+        index = faiss.IndexHNSWFlat(dim, settings.SEMANTIC_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(40, settings.SEMANTIC_HNSW_M * 2)
+        return index
+
+    def _write(self, user_id: str, index, meta: Dict):
+        """写入新版本的索引文件，再原子替换meta.json，最后删除旧文件"""
+        user_dir = self._user_dir(user_id)
+        previous = self._read_meta(user_id)
+        meta["version"] = (previous["version"] if previous else 0) + 1
+        meta["index_file"] = f"index-{meta['version']}.faiss"
+        faiss.write_index(index, os.path.join(user_dir, meta["index_file"]))
+
+        tmp_path = os.path.join(user_dir, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(user_dir, "meta.json"))
+
+        if previous and previous["index_file"] != meta["index_file"]:
+            try:
+                # 已映射该文件的其他进程仍可继续读取，直到重新加载
+                os.remove(os.path.join(user_dir, previous["index_file"]))
+            except OSError:
+                pass
+
+    @contextmanager
+    def _locked(self, user_id: str):
+        """同一用户索引的写入互斥（进程内线程锁 + 跨进程文件锁）"""
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        with self._write_lock:
+            with open(os.path.join(user_dir, ".lock"), "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_for_write(self, user_id: str, dim: Optional[int] = None):
+        """在写锁内完整读取最新索引（不使用内存映射，以便追加）"""
+        meta = self._read_meta(user_id)
+        if meta is None:
+            if dim is None:
+                return None, None
+            return self._new_index(dim), {"model": self.model_name, "dim": dim, "rows": [], "deleted": []}
+        return self._read_index(user_id, meta, mmap=False), meta
+
+    @staticmethod
+    def _mark_deleted(meta: Dict, paper_id: str) -> int:
+        deleted = set(meta["deleted"])
+        before = len(deleted)
+        for row, (row_paper_id, _) in enumerate(meta["rows"]):
+            if row_paper_id == paper_id:
+                deleted.add(row)
+        meta["deleted"] = sorted(deleted)
+        return len(deleted) - before
+
+    def _compact(self, index, meta: Dict):
+        """去掉墓碑行重建索引"""
+        deleted = set(meta["deleted"])
+        live = [row for row in range(index.ntotal) if row not in deleted]
+        new_index = self._new_index(meta["dim"])
+        if live:
+            vectors = index.reconstruct_n(0, index.ntotal)[live]
+            new_index.add(np.ascontiguousarray(vectors))
+        meta["rows"] = [meta["rows"][row] for row in live]
+        meta["deleted"] = []
+        return new_index
+
+    @staticmethod
+    def _stamp(meta: Dict, paper_id: str):
+        """记录论文在即将写入的版本中发生了变化，供并发的全量重建合并"""
+        meta.setdefault("revisions", {})[paper_id] = meta.get("version", 0) + 1
+
+    def _merge_changes(self, user_id: str, since_version: int, current: Dict, index, meta: Dict):
+        """把 since_version 之后写入的论文（新增、替换、删除）从最新索引合并到重建结果中"""
+        changed = [paper_id for paper_id, version in current.get("revisions", {}).items() if version > since_version]
+        if not changed:
+            return
+        if current["dim"] != meta["dim"]:
+            print(f"重建期间写入的向量维度与重建结果不一致，忽略这些变化: user_id={user_id}")
+            return
+        current_index = self._read_index(user_id, current, mmap=False)
+        vectors = current_index.reconstruct_n(0, current_index.ntotal)
+        deleted = set(current["deleted"])
+        for paper_id in changed:
+            self._mark_deleted(meta, paper_id)
+            live = [row for row, (row_paper_id, _) in enumerate(current["rows"])
+                    if row_paper_id == paper_id and row not in deleted]
+            if live:
+                index.add(np.ascontiguousarray(vectors[live]))
+                meta["rows"].extend(current["rows"][row] for row in live)
+        print(f"重建期间有{len(changed)}篇论文的语义索引发生变化，已合并最新结果: user_id={user_id}")
+
+    # ---- 写入 ----
+
+    def add_paper(self, user_id: str, paper_id: str, title: Optional[str], abstract: Optional[str],
+                  content: Optional[str]):
+        """编码并加入论文（已存在时替换旧向量）"""
+        chunks = build_chunks(title, abstract, content)
+        if not chunks:
+            return
+        # 编码在锁外进行，锁内只做索引读写
+        vectors = self.embed(chunks)
+
+        with self._locked(user_id):
+            index, meta = self._load_for_write(user_id, dim=vectors.shape[1])
+            if meta["dim"] != vectors.shape[1]:
+                raise ValueError(f"向量维度与已有索引不一致（模型已更换？），请重建语义索引: user_id={user_id}")
+            self._mark_deleted(meta, paper_id)
+            index.add(vectors)
+            meta["rows"].extend([paper_id, chunk_no] for chunk_no in range(len(chunks)))
+            self._stamp(meta, paper_id)
+            if len(meta["deleted"]) > COMPACT_DELETED_RATIO * index.ntotal:
+                index = self._compact(index, meta)
+            self._write(user_id, index, meta)
+        print(f"论文已加入语义索引: paper_id={paper_id}, 分块数={len(chunks)}")
+
+    def remove_paper(self, user_id: str, paper_id: str):
+        """从索引中删除论文"""
+        with self._locked(user_id):
+            index, meta = self._load_for_write(user_id)
+            if index is None or not self._mark_deleted(meta, paper_id):
+                return
+            self._stamp(meta, paper_id)
+            if len(meta["deleted"]) > COMPACT_DELETED_RATIO * index.ntotal:
+                index = self._compact(index, meta)
+            self._write(user_id, index, meta)
+
+    def rebuild(self, user_id: str, papers: Iterable[Tuple[str, Optional[str], Optional[str], Optional[str]]]):
+        """
+        以 (paper_id, 标题, 摘要, 正文) 序列重建用户索引
+
+        编码在锁外进行，期间 add_paper/remove_paper 的写入在锁内合并后再替换，不会被覆盖。
+        """
+        start_meta = self._read_meta(user_id)
+        start_version = start_meta["version"] if start_meta else 0
+        index, meta = None, None
+        for paper_id, title, abstract, content in papers:
+            chunks = build_chunks(title, abstract, content)
+            if not chunks:
+                continue
+            vectors = self.embed(chunks)
+            if index is None:
+                index = self._new_index(vectors.shape[1])
+                meta = {"model": self.model_name, "dim": vectors.shape[1], "rows": [], "deleted": []}
+            index.add(vectors)
+            meta["rows"].extend([paper_id, chunk_no] for chunk_no in range(len(chunks)))
+        if index is None:
+            return
+        with self._locked(user_id):
+            current = self._read_meta(user_id)
+            if current is not None:
+                if current["version"] != start_version:
+                    self._merge_changes(user_id, start_version, current, index, meta)
+                meta["revisions"] = current.get("revisions", {})
+            if len(meta["deleted"]) > COMPACT_DELETED_RATIO * index.ntotal:
+                index = self._compact(index, meta)
+            self._write(user_id, index, meta)
+
+    # ---- 查询 ----
+
+    def _search_vector(self, loaded, vector, k: int, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        _, index, rows, deleted = loaded
+        if index.ntotal == 0:
+            return []
+        index.hnsw.efSearch = max(settings.SEMANTIC_HNSW_EF_SEARCH, k)
+        fetch = min(index.ntotal, k * SEARCH_OVERSAMPLE + len(deleted))
+        scores, ids = index.search(vector.reshape(1, -1), fetch)
+
+        # 按论文聚合，取最相似分块的得分
+        best: Dict[str, float] = {}
+        for score, row in zip(scores[0], ids[0]):
+            if row < 0 or row in deleted:
+                continue
+            paper_id = rows[row][0]
+            if paper_id == exclude:
+                continue
+            if paper_id not in best:
+                best[paper_id] = float(score)
+        return sorted(best.items(), key=lambda item: -item[1])[:k]
+
+    def search(self, user_id: str, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """按语义相似度检索论文，返回 [(paper_id, 相似度)]"""
+        loaded = self._load(user_id)
+        if loaded is None:
+            return []
+        return self._search_vector(loaded, self.embed([query])[0], k)
+
+    def similar(self, user_id: str, paper_id: str, k: int = 10) -> List[Tuple[str, float]]:
+        """与指定论文最相似的论文（以该论文各分块向量的均值为查询）"""
+        loaded = self._load(user_id)
+        if loaded is None:
+            return []
+        _, index, rows, deleted = loaded
+        own_rows = [row for row, (row_paper_id, _) in enumerate(rows) if row_paper_id == paper_id and row not in deleted]
+        if not own_rows:
+            return []
+        vector = np.mean([index.reconstruct(row) for row in own_rows], axis=0)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        return self._search_vector(loaded, vector.astype("float32"), k, exclude=paper_id)
+
+
+# 全局语义索引
+semantic_index = SemanticIndex(settings.SEMANTIC_INDEX_DIR, settings.SEMANTIC_EMBEDDING_MODEL)
+
+# 索引写入在后台单线程中执行，不阻塞上传和删除请求
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semantic-index")
+
+
+def _run_safely(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        print(f"更新语义索引失败: {str(e)}")
+
+
+def schedule_index_paper(user_id: str, paper_id: str, title: Optional[str], abstract: Optional[str],
+                         content: Optional[str]):
+    """在后台将论文加入（或刷新）语义索引"""
+    if is_available():
+        _index_executor.submit(_run_safely, semantic_index.add_paper, user_id, paper_id, title, abstract, content)
+
+
+def schedule_remove_paper(user_id: str, paper_id: str):
+    """在后台从语义索引删除论文"""
+    if is_available():
+        _index_executor.submit(_run_safely, semantic_index.remove_paper, user_id, paper_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="论文库语义索引")
+    parser.add_argument("--rebuild", action="store_true", help="重建语义索引")
+    parser.add_argument("--user-id", default=None, help="只重建指定用户的索引")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+    if not is_available():
+        print("语义检索不可用：请安装 sentence-transformers 和 faiss-cpu 并开启 SEMANTIC_SEARCH_ENABLED")
+        return
+
+    from src.db.session import SessionLocal
+    from src.models.paper import Paper
+    db = SessionLocal()
+    try:
+        user_query = db.query(Paper.owner_id).distinct()
+        if args.user_id:
+            user_query = user_query.filter(Paper.owner_id == args.user_id)
+        for (user_id,) in user_query.all():
+            # 分批读取正文，避免一次载入整个论文库
+            papers = db.query(Paper.id, Paper.title, Paper.abstract, Paper.content).filter(
+                Paper.owner_id == user_id
+            ).yield_per(50)
+            semantic_index.rebuild(user_id, (tuple(paper) for paper in papers))
+            print(f"已重建用户 {user_id} 的语义索引")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+合并并发的相同LLM请求
+
+同一个键（与 llm_cache 的缓存键相同）在请求进行中再次到达时，不再单独调用API，而是等待
+已有请求的结果。实际调用在独立的任务中执行，单个调用方取消只会让它自己退出；所有等待方
+都取消后才取消实际调用。请求完成后立即移除，之后的相同请求由响应缓存负责。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from src.core.config import settings
+
+
+class _Call:
+    """一个进行中的请求及其等待方数量"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并进行中的异步调用"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"calls": 0, "coalesced": 0, "cancelled": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 func，或等待相同键的进行中调用；异常会传给所有等待方"""
+        if not self.enabled:
+            return await func()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.stats["calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            # shield 保证当前调用方被取消时不会连带取消共享的任务
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 没有调用方再等待结果，取消实际调用；先移除，之后的相同请求重新发起
+                self._forget(key, call)
+                call.task.cancel()
+                self.stats["cancelled"] += 1
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self._calls), "enabled": self.enabled}
+
+
+# 全局实例，与 llm_cache 使用相同的键
+llm_singleflight = SingleFlight(enabled=settings.LLM_SINGLEFLIGHT_ENABLED)
@@ -0,0 +1,132 @@
+"""
+依赖感知的阶段调度器
+
+将一组异步阶段按依赖关系组织成DAG，依赖满足的阶段立即并发执行，
+并受单次运行和全局两级并发上限约束。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+class StageSkipped(Exception):
+    """依赖阶段失败导致当前阶段未执行"""
+    pass
+
+
+class Stage:
+    """调度器中的单个阶段"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+
+class StageScheduler:
+    """
+    阶段调度器
+
+    每个阶段函数接收一个字典参数，包含其依赖阶段的结果。
+    阶段失败时异常记录在 errors 中，依赖它的阶段不会执行并记为 StageSkipped。
+
+    用法:
+        scheduler = StageScheduler(max_concurrency=4)
+        scheduler.add_stage("a", func_a)
+        scheduler.add_stage("b", func_b, depends_on=["a"])
+        results = await scheduler.run()
+    """
+
+    def __init__(self, max_concurrency: int = 4,
+                 global_semaphore: Optional[asyncio.Semaphore] = None,
+                 on_complete: Optional[Callable[[str, Any], None]] = None):
+        """
+        参数:
+            max_concurrency: 本次运行内同时执行的最大阶段数
+            global_semaphore: 跨运行共享的全局并发信号量（可选）
+            on_complete: 阶段成功完成时的回调，参数为(阶段名, 结果)
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.global_semaphore = global_semaphore
+        self.on_complete = on_complete
+        self._stages: Dict[str, Stage] = {}
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+
+    def add_stage(self, name: str, func: Callable[[Dict[str, Any]], Awaitable[Any]],
+                  depends_on: Iterable[str] = ()) -> "StageScheduler":
+        """注册一个阶段"""
+        if name in self._stages:
+            raise ValueError(f"阶段重复注册: {name}")
+        self._stages[name] = Stage(name, func, depends_on)
+        return self
+
+    @property
+    def stage_names(self) -> List[str]:
+        return list(self._stages)
+
+    async def _execute(self, stage: Stage, semaphore: asyncio.Semaphore) -> Any:
+        inputs = {dep: self.results[dep] for dep in stage.depends_on}
+        async with semaphore:
+            if self.global_semaphore is not None:
+                async with self.global_semaphore:
+                    return await stage.func(inputs)
+            return await stage.func(inputs)
+
+    async def run(self) -> Dict[str, Any]:
+        """执行所有阶段，返回 {阶段名: 结果}（仅包含成功的阶段）"""
+        for stage in self._stages.values():
+            unknown = [dep for dep in stage.depends_on if dep not in self._stages]
+            if unknown:
+                raise ValueError(f"阶段 {stage.name} 依赖了未注册的阶段: {unknown}")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        pending = dict(self._stages)
+        running: Dict[asyncio.Task, str] = {}
+
+        try:
+            while pending or running:
+                # 启动所有依赖已满足的阶段，跳过依赖失败的阶段
+                changed = True
+                while changed:
+                    changed = False
+                    for name in list(pending):
+                        stage = pending[name]
+                        failed = [dep for dep in stage.depends_on if dep in self.errors]
+                        if failed:
+                            self.errors[name] = StageSkipped(f"依赖阶段失败: {failed}")
+                            del pending[name]
+                            changed = True
+                        elif all(dep in self.results for dep in stage.depends_on):
+                            task = asyncio.create_task(self._execute(stage, semaphore))
+                            running[task] = name
+                            del pending[name]
+
+                if not running:
+                    # 剩余阶段存在循环依赖，无法执行
+                    for name in pending:
+                        self.errors[name] = StageSkipped("阶段存在循环依赖")
+                    pending.clear()
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    if task.cancelled():
+                        self.errors[name] = asyncio.CancelledError()
+                        continue
+                    error = task.exception()
+                    if error is not None:
+                        self.errors[name] = error
+                        continue
+                    self.results[name] = task.result()
+                    if self.on_complete is not None:
+                        self.on_complete(name, self.results[name])
+        finally:
+            # 被取消或回调出错时，确保不遗留后台任务
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return self.results
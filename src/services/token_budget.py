@@ -0,0 +1,203 @@
+"""
+LLM调用的token预算
+
+按提供商和模型的上下文窗口为每次调用分配输入和输出预算：用tiktoken精确计算提示词
+token数，max_tokens 取输出上限与窗口剩余空间中的较小值，提示词超出输入预算时按段落
+边界截断（保留开头和结尾），不再按固定字符数切断。
+
+tiktoken没有DeepSeek和Claude的词表，这两类模型用 cl100k_base 计数，误差由安全余量吸收；
+tiktoken不可用（未安装或无法加载词表）时退回按字符估算。
+"""
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from src.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# 模型的 (上下文窗口, 最大输出token数)，按名称前缀匹配，较长的前缀优先
+MODEL_LIMITS = {
+    "deepseek-chat": (64000, 8192),
+    "deepseek-reasoner": (64000, 8192),
+    "deepseek": (64000, 8192),
+    "gpt-4o-mini": (128000, 16384),
+    "gpt-4o": (128000, 16384),
+    "gpt-4-turbo": (128000, 4096),
+    "gpt-4-32k": (32768, 8192),
+    "gpt-4": (8192, 8192),
+    "gpt-3.5-turbo": (16385, 4096),
+    "claude-3": (200000, 4096),
+    "claude": (200000, 4096),
+}
+# 未知模型按提供商取默认值
+PROVIDER_LIMITS = {
+    "deepseek": (64000, 8192),
+    "openai": (128000, 4096),
+    "claude": (200000, 4096),
+}
+DEFAULT_LIMITS = (8192, 4096)
+
+# 每条消息的格式开销（role、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+# 计数误差和回复起始标记的余量
+SAFETY_MARGIN_TOKENS = 64
+# 未指定max_tokens时，输出预算不低于该值
+MIN_OUTPUT_TOKENS = 1024
+# 截断时插入的省略标记
+OMISSION_MARK = "\n\n...[内容省略]...\n\n"
+# 截断时开头部分所占比例
+HEAD_RATIO = 0.6
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"加载tiktoken词表失败，改为按字符估算token数: {str(e)}")
+        return None
+
+
+def _estimate(text: str) -> int:
+    cjk = len(re.findall(r"[㐀-鿿]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    """文本的token数"""
+    if not text:
+        return 0
+    encoding = _encoding(model or settings.DEFAULT_LLM_MODEL)
+    if encoding is None:
+        return _estimate(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def model_limits(provider: Optional[str], model: Optional[str]) -> Tuple[int, int]:
+    """返回 (上下文窗口, 最大输出token数)，LLM_CONTEXT_WINDOW 可覆盖窗口大小"""
+    limits = None
+    name = (model or "").lower()
+    for prefix in sorted(MODEL_LIMITS, key=len, reverse=True):
+        if name.startswith(prefix):
+            limits = MODEL_LIMITS[prefix]
+            break
+    if limits is None:
+        limits = PROVIDER_LIMITS.get(provider or "", DEFAULT_LIMITS)
+    window, max_output = limits
+    if settings.LLM_CONTEXT_WINDOW > 0:
+        window = settings.LLM_CONTEXT_WINDOW
+    return window, max_output
+
+
+def _split_chunks(text: str) -> List[str]:
+    """按段落切分，保留分隔符，拼接后与原文一致"""
+    return [part for part in re.split(r"(?<=\n\n)", text) if part]
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None,
+                       head_ratio: float = HEAD_RATIO) -> str:
+    """
+    将文本截断到 max_tokens 以内
+
+    按段落为单位保留开头和结尾，中间用省略标记代替；单个段落超出剩余预算时在token边界处切开。
+    """
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return text
+    budget = max(max_tokens - count_tokens(OMISSION_MARK, model), 0)
+    head_budget = int(budget * head_ratio)
+    tail_budget = budget - head_budget
+
+    chunks = _split_chunks(text)
+    sizes = [count_tokens(chunk, model) for chunk in chunks]
+
+    head: List[str] = []
+    used = 0
+    start = 0
+    while start < len(chunks) and used + sizes[start] <= head_budget:
+        head.append(chunks[start])
+        used += sizes[start]
+        start += 1
+    if start < len(chunks) and used < head_budget:
+        head.append(_cut_tokens(chunks[start], head_budget - used, model, from_end=False))
+        start += 1
+
+    tail: List[str] = []
+    used = 0
+    end = len(chunks) - 1
+    while end >= start and used + sizes[end] <= tail_budget:
+        tail.insert(0, chunks[end])
+        used += sizes[end]
+        end -= 1
+    if end >= start and used < tail_budget:
+        tail.insert(0, _cut_tokens(chunks[end], tail_budget - used, model, from_end=True))
+
+    return "".join(head).rstrip() + OMISSION_MARK + "".join(tail).lstrip()
+
+
+def _cut_tokens(text: str, max_tokens: int, model: Optional[str], from_end: bool) -> str:
+    """在token边界处截取段落的开头或结尾"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model or settings.DEFAULT_LLM_MODEL)
+    if encoding is None:
+        # 按估算比例截取字符
+        chars = max(int(len(text) * max_tokens / max(_estimate(text), 1)), 1)
+        return text[-chars:] if from_end else text[:chars]
+    tokens = encoding.encode(text, disallowed_special=())
+    kept = tokens[-max_tokens:] if from_end else tokens[:max_tokens]
+    return encoding.decode(kept)
+
+
+class CallBudget:
+    """一次调用的预算分配结果"""
+
+    def __init__(self, prompt: str, prompt_tokens: int, max_tokens: int, truncated: bool):
+        self.prompt = prompt
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.truncated = truncated
+
+
+def plan_call(prompt: str, provider: Optional[str] = None, model: Optional[str] = None,
+              max_tokens: Optional[int] = None, system_prompt: Optional[str] = None) -> CallBudget:
+    """
+    为一次调用分配输入和输出预算
+
+    输出预算：调用方指定的 max_tokens，或按提示词长度自适应（不低于 MIN_OUTPUT_TOKENS），
+    均不超过模型的输出上限。输入预算：窗口减去输出预算和系统提示，且不超过
+    LLM_MAX_PROMPT_TOKENS（控制单次请求的延迟）。提示词超出输入预算时按段落截断。
+    """
+    window, max_output = model_limits(provider, model)
+    system_tokens = count_tokens(system_prompt, model) + MESSAGE_OVERHEAD_TOKENS if system_prompt else 0
+    prompt_tokens = count_tokens(prompt, model)
+
+    if max_tokens is None:
+        max_tokens = max(MIN_OUTPUT_TOKENS, prompt_tokens // 2)
+    max_tokens = min(int(max_tokens), max_output)
+
+    input_budget = window - max_tokens - system_tokens - MESSAGE_OVERHEAD_TOKENS - SAFETY_MARGIN_TOKENS
+    if settings.LLM_MAX_PROMPT_TOKENS > 0:
+        input_budget = min(input_budget, settings.LLM_MAX_PROMPT_TOKENS)
+
+    truncated = False
+    if prompt_tokens > input_budget > 0:
+        prompt = truncate_to_tokens(prompt, input_budget, model)
+        print(f"提示词超出输入预算({prompt_tokens} > {input_budget} tokens)，已按段落截断")
+        prompt_tokens = count_tokens(prompt, model)
+        truncated = True
+
+    # 输入与输出之和不超过上下文窗口
+    remaining = window - prompt_tokens - system_tokens - MESSAGE_OVERHEAD_TOKENS * 2 - SAFETY_MARGIN_TOKENS
+    max_tokens = max(min(max_tokens, remaining), 1)
+    return CallBudget(prompt, prompt_tokens, max_tokens, truncated)
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, asc
 import uuid
@@ -16,6 +16,7 @@ from src.models.paper import Paper, Tag
 from src.core.deps import get_db
 from src.core.config import settings
 from src.services import ai_assistant as assistant_service
+from src.services import pagination
 
 def get_project_by_id(db: Session, project_id: str, user_id: Optional[str] = None) -> Optional[WritingProject]:
     """通过ID获取写作项目"""
@@ -27,17 +28,13 @@ def get_project_by_id(db: Session, project_id: str, user_id: Optional[str] = Non
         )
     return query.first()
 
-def get_projects(
-    db: Session, 
-    user_id: str, 
-    skip: int = 0, 
-    limit: int = 100,
+def _build_projects_query(
+    db: Session,
+    user_id: str,
     query: Optional[str] = None,
-    sort_by: str = "created_at",
-    sort_order: str = "desc",
     include_collaborated: bool = True
-) -> List[WritingProject]:
-    """获取用户的写作项目列表"""
+):
+    """用户可见的写作项目查询（含搜索条件，不含排序和分页）"""
     if include_collaborated:
         project_query = db.query(WritingProject).filter(
             (WritingProject.owner_id == user_id) | 
@@ -53,6 +50,20 @@ def get_projects(
             (WritingProject.title.ilike(search)) |
             (WritingProject.description.ilike(search))
         )
+    return project_query
+
+def get_projects(
+    db: Session, 
+    user_id: str, 
+    skip: int = 0, 
+    limit: int = 100,
+    query: Optional[str] = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    include_collaborated: bool = True
+) -> List[WritingProject]:
+    """获取用户的写作项目列表"""
+    project_query = _build_projects_query(db, user_id, query, include_collaborated)
     
     # 排序
     if sort_order.lower() == "desc":
@@ -62,6 +73,43 @@ def get_projects(
     
     return project_query.offset(skip).limit(limit).all()
 
+def get_projects_page(
+    db: Session,
+    user_id: str,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    query: Optional[str] = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    include_collaborated: bool = True,
+    include_total: bool = True
+) -> Tuple[List[WritingProject], Optional[int], bool, Optional[str]]:
+    """
+    按 (sort_by, id) 游标分页获取写作项目
+
+    传入 cursor 时忽略 skip。返回 (项目列表, 总数, 总数是否为估计值, 下一页游标)。
+    """
+    project_query = _build_projects_query(db, user_id, query, include_collaborated)
+    
+    total, total_is_estimate = None, False
+    if include_total:
+        filters = {"query": query, "include_collaborated": include_collaborated}
+        total, total_is_estimate = pagination.get_total(
+            db, "writing_projects", user_id, filters, project_query, WritingProject.id
+        )
+    
+    descending = sort_order.lower() == "desc"
+    cursor_value = pagination.decode_cursor(cursor, sort_by, descending) if cursor else None
+    project_query = pagination.apply_keyset(
+        project_query, getattr(WritingProject, sort_by), WritingProject.id, descending, cursor_value
+    )
+    if cursor_value is not None:
+        skip = 0
+    
+    projects = project_query.offset(skip).limit(limit).all()
+    return projects, total, total_is_estimate, pagination.next_cursor(projects, limit, sort_by, descending)
+
 def create_project(
     db: Session, 
     owner_id: str,
@@ -150,6 +198,7 @@ def create_project(
     
     db.commit()
     db.refresh(project)
+    pagination.total_cache.invalidate("writing_projects", owner_id)
     return project
 
 def update_project(
@@ -195,6 +244,7 @@ def delete_project(db: Session, project_id: str, user_id: str) -> bool:
     
     db.delete(project)
     db.commit()
+    pagination.total_cache.invalidate("writing_projects", user_id)
     return True
 
 # 章节操作
@@ -411,14 +461,26 @@ def remove_collaborator(db: Session, project_id: str, owner_id: str, collaborato
     return False
 
 # AI 辅助写作
-async def generate_section_content(
+SECTION_GENERATION_SYSTEM_PROMPT = "你是一个专业的学术写作助手，擅长生成高质量的学术内容。"
+IMPROVEMENT_SYSTEM_PROMPT = "你是一个专业的学术写作助手，擅长改进学术文本。"
+
+# 不同改进类型的提示词
+IMPROVEMENT_PROMPTS = {
+    "grammar": "请修正以下文本中的语法错误，确保语言流畅、正确。不要改变原文的含义。",
+    "clarity": "请改进以下文本以增强其清晰度和可读性。使表达更加直接、精确，减少冗余和复杂性。",
+    "academic": "请将以下文本改写为更学术、更正式的风格。使用适当的学术术语，保持客观、精确的语言。",
+    "concise": "请将以下文本改写得更加简洁。去除不必要的词汇和冗余表达，但保留所有重要信息。",
+    "expand": "请扩展以下文本，添加更多细节、解释和论证。使内容更加全面、深入，但保持连贯性。"
+}
+
+def _build_section_generation_prompt(
     db: Session,
     section_id: str,
     user_id: str,
     prompt: str,
     paper_id: Optional[str] = None
-) -> Optional[str]:
-    """使用AI生成章节内容"""
+) -> Optional[Tuple[WritingSection, str]]:
+    """构建生成章节内容的提示词，返回 (章节, 提示词)，章节或项目不存在时返回None"""
     section = get_section_by_id(db, section_id, user_id)
     if not section:
         return None
@@ -452,14 +514,7 @@ async def generate_section_content(
         if paper and paper.content:
             paper_content = f"参考论文: {paper.title}\n{paper.content[:5000]}...\n"
     
-    # 调用AI助手
-    try:
-        # 这里使用OpenAI API生成内容
-        # 注意: 这里直接调用API而不是通过assistant_service
-        # 以避免循环导入的问题
-        
-        # 构建完整提示词
-        full_prompt = f"""
+    return section, f"""
         请根据以下信息和提示生成学术写作内容。
         
         {context}
@@ -470,46 +525,145 @@ async def generate_section_content(
         
         请生成适合{section.title}章节的内容。内容应该学术性强，逻辑清晰，符合该类型文档的写作规范。
         """
+
+def _build_improvement_prompt(section: WritingSection, improvement_type: str) -> str:
+    prompt = IMPROVEMENT_PROMPTS.get(improvement_type, "请改进以下文本，提高其质量和专业性。")
+    return f"{prompt}\n\n{section.content}"
+
+async def _call_writing_model(system_prompt: str, prompt: str, temperature: float) -> str:
+    # 直接调用OpenAI API，而不是通过assistant_service，以避免循环导入的问题
+    import httpx
+    
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"{settings.OPENAI_API_BASE}/chat/completions",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.OPENAI_API_KEY}"
+            },
+            json={
+                "model": settings.OPENAI_MODEL,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                "max_tokens": 2000,
+                "temperature": temperature
+            },
+            timeout=60.0
+        )
+        
+        response_data = response.json()
+        return response_data["choices"][0]["message"]["content"].strip()
+
+def _stream_writing_model(system_prompt: str, prompt: str, temperature: float) -> AsyncIterator[str]:
+    from src.services.llm_client import stream_chat_completion
+    
+    return stream_chat_completion(
+        "openai",
+        f"{settings.OPENAI_API_BASE}/chat/completions",
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {settings.OPENAI_API_KEY}"
+        },
+        payload={
+            "model": settings.OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 2000,
+            "temperature": temperature
+        }
+    )
+
+def _save_section_content(section_id: str, content: str, append: bool) -> None:
+    """
+    保存生成的章节内容
+
+    流式响应在请求依赖的会话关闭之后才结束，这里使用独立的会话写入。
+    """
+    from src.db.session import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        section = db.query(WritingSection).filter(WritingSection.id == section_id).first()
+        if not section:
+            return
+        if append and section.content:
+            section.content += "\n\n" + content
+        else:
+            section.content = content
+        db.commit()
+    finally:
+        db.close()
+
+async def _stream_section_update(
+    section_id: str,
+    system_prompt: str,
+    prompt: str,
+    temperature: float,
+    append: bool
+) -> AsyncIterator[Dict[str, Any]]:
+    parts = []
+    async for text in _stream_writing_model(system_prompt, prompt, temperature):
+        parts.append(text)
+        yield {"type": "delta", "content": text}
+    
+    # 只在完整生成后写入，客户端中途断开时不保存不完整的内容
+    content = "".join(parts).strip()
+    if content:
+        await asyncio.to_thread(_save_section_content, section_id, content, append)
+    yield {"type": "done", "section_id": section_id, "content": content}
+
+async def generate_section_content(
+    db: Session,
+    section_id: str,
+    user_id: str,
+    prompt: str,
+    paper_id: Optional[str] = None
+) -> Optional[str]:
+    """使用AI生成章节内容"""
+    built = _build_section_generation_prompt(db, section_id, user_id, prompt, paper_id)
+    if built is None:
+        return None
+    section, full_prompt = built
+    
+    try:
+        content = await _call_writing_model(SECTION_GENERATION_SYSTEM_PROMPT, full_prompt, 0.4)
         
-        # 直接调用OpenAI API
-        import httpx
+        # 更新章节内容
+        if section.content:
+            section.content += "\n\n" + content
+        else:
+            section.content = content
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.OPENAI_API_BASE}/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {settings.OPENAI_API_KEY}"
-                },
-                json={
-                    "model": settings.OPENAI_MODEL,
-                    "messages": [
-                        {"role": "system", "content": "你是一个专业的学术写作助手，擅长生成高质量的学术内容。"},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    "max_tokens": 2000,
-                    "temperature": 0.4
-                },
-                timeout=60.0
-            )
-            
-            response_data = response.json()
-            content = response_data["choices"][0]["message"]["content"].strip()
-            
-            # 更新章节内容
-            if section.content:
-                section.content += "\n\n" + content
-            else:
-                section.content = content
-            
-            db.commit()
-            db.refresh(section)
-            
-            return content
+        db.commit()
+        db.refresh(section)
+        
+        return content
             
     except Exception as e:
         raise Exception(f"生成内容失败: {str(e)}")
 
+def stream_section_content(
+    db: Session,
+    section_id: str,
+    user_id: str,
+    prompt: str,
+    paper_id: Optional[str] = None
+) -> Optional[AsyncIterator[Dict[str, Any]]]:
+    """
+    流式生成章节内容，章节不存在或无权访问时返回None
+
+    返回的事件流逐段产出 {"type": "delta", "content": 文本}，生成结束后把完整内容
+    追加到章节并产出 {"type": "done", "section_id", "content"}。
+    """
+    built = _build_section_generation_prompt(db, section_id, user_id, prompt, paper_id)
+    if built is None:
+        return None
+    return _stream_section_update(section_id, SECTION_GENERATION_SYSTEM_PROMPT, built[1], 0.4, append=True)
+
 async def improve_writing(
     db: Session,
     section_id: str,
@@ -521,53 +675,35 @@ async def improve_writing(
     if not section or not section.content:
         return None
     
-    # 根据不同改进类型构建提示词
-    prompts = {
-        "grammar": "请修正以下文本中的语法错误，确保语言流畅、正确。不要改变原文的含义。",
-        "clarity": "请改进以下文本以增强其清晰度和可读性。使表达更加直接、精确，减少冗余和复杂性。",
-        "academic": "请将以下文本改写为更学术、更正式的风格。使用适当的学术术语，保持客观、精确的语言。",
-        "concise": "请将以下文本改写得更加简洁。去除不必要的词汇和冗余表达，但保留所有重要信息。",
-        "expand": "请扩展以下文本，添加更多细节、解释和论证。使内容更加全面、深入，但保持连贯性。"
-    }
-    
-    prompt = prompts.get(improvement_type, "请改进以下文本，提高其质量和专业性。")
-    
     try:
-        # 调用OpenAI API
-        import httpx
+        improved_content = await _call_writing_model(
+            IMPROVEMENT_SYSTEM_PROMPT, _build_improvement_prompt(section, improvement_type), 0.3
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.OPENAI_API_BASE}/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {settings.OPENAI_API_KEY}"
-                },
-                json={
-                    "model": settings.OPENAI_MODEL,
-                    "messages": [
-                        {"role": "system", "content": "你是一个专业的学术写作助手，擅长改进学术文本。"},
-                        {"role": "user", "content": f"{prompt}\n\n{section.content}"}
-                    ],
-                    "max_tokens": 2000,
-                    "temperature": 0.3
-                },
-                timeout=60.0
-            )
-            
-            response_data = response.json()
-            improved_content = response_data["choices"][0]["message"]["content"].strip()
-            
-            # 更新章节内容
-            section.content = improved_content
-            db.commit()
-            db.refresh(section)
-            
-            return improved_content
+        # 更新章节内容
+        section.content = improved_content
+        db.commit()
+        db.refresh(section)
+        
+        return improved_content
             
     except Exception as e:
         raise Exception(f"改进内容失败: {str(e)}")
 
+def stream_improve_writing(
+    db: Session,
+    section_id: str,
+    user_id: str,
+    improvement_type: str
+) -> Optional[AsyncIterator[Dict[str, Any]]]:
+    """流式改进写作内容，章节不存在或没有内容时返回None；完整生成后替换章节内容"""
+    section = get_section_by_id(db, section_id, user_id)
+    if not section or not section.content:
+        return None
+    return _stream_section_update(
+        section_id, IMPROVEMENT_SYSTEM_PROMPT, _build_improvement_prompt(section, improvement_type), 0.3, append=False
+    )
+
 def export_project(db: Session, project_id: str, user_id: str, format: str = "markdown") -> Dict[str, Any]:
     """导出写作项目"""
     project = get_project_by_id(db, project_id, user_id)
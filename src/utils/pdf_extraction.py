@@ -0,0 +1,295 @@
+"""
+PDF文本与元数据提取
+
+解析在独立的进程池中执行，不占用事件循环：每个文档只打开一次，同时取出元数据和文本；
+页数较多的文档按页段拆分到多个进程并行提取。优先使用PyMuPDF，未安装或解析失败时退回pypdf。
+每个文档有整体超时，超时后重建进程池，避免卡住的解析进程长期占用worker；同时在旧进程池中
+提取的其他文档会被连带中断，它们在新进程池中重新提取，不会因为别人的超时而失败。
+
+进程池使用spawn方式启动，worker只导入本模块，因此这里不依赖 src.services 中的任何模块。
+"""
+import asyncio
+import io
+import math
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.config import settings
+
+# 尝试导入PyMuPDF作为快速解析后端
+try:
+    import fitz
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
+try:
+    import pypdf
+    HAS_PYPDF = True
+except ImportError:
+    HAS_PYPDF = False
+
+# 删除控制字符（保留换行）
+_CONTROL_CHARS = {code: None for code in range(32) if code != 10}
+
+# 页眉页脚中常见的编号信息
+_HEADER_FOOTER_PATTERNS = [
+    re.compile(pattern) for pattern in (
+        r'Page \d+ of \d+',
+        r'\d+/\d+',
+        r'©\d{4}',
+        r'ISBN:',
+        r'DOI:',
+        r'Vol\.\s*\d+',
+        r'No\.\s*\d+',
+    )
+]
+
+# 进程池因其他文档超时被重建时，被连带中断的提取最多重新执行的次数
+BROKEN_POOL_RETRIES = 2
+
+# PyMuPDF元数据键名 -> 与pypdf一致的键名
+_PYMUPDF_METADATA_KEYS = {
+    "title": "Title",
+    "author": "Author",
+    "subject": "Subject",
+    "keywords": "Keywords",
+    "creator": "Creator",
+    "producer": "Producer",
+    "creationDate": "CreationDate",
+    "modDate": "ModDate",
+}
+
+
+class PdfExtractionTimeout(Exception):
+    """单个文档的提取超过了 PDF_EXTRACTION_TIMEOUT"""
+
+
+def _remove_control_chars(text: str) -> str:
+    return text.translate(_CONTROL_CHARS)
+
+
+def _clean_page_text(text: str, page_num: int, total_pages: int) -> str:
+    """清理页面文本，去除页码和页眉/页脚"""
+    # 去除页码
+    text = re.sub(rf'\b{page_num}\b', '', text)
+
+    # 假设页眉是前1-2行，页脚是后1-3行，去除其中的通用模式
+    lines = text.split('\n')
+    if len(lines) > 10:
+        for i in list(range(min(2, len(lines)))) + list(range(max(0, len(lines) - 3), len(lines))):
+            for pattern in _HEADER_FOOTER_PATTERNS:
+                lines[i] = pattern.sub('', lines[i])
+
+    return '\n'.join(lines)
+
+
+def _merge_columns(lines: List[str]) -> str:
+    """尝试合并分栏内容（pypdf按行输出时，前后两半分别视为左右两栏）"""
+    num_lines = len(lines)
+    if num_lines < 10:
+        return '\n'.join(lines)
+
+    mid_point = num_lines // 2
+    left_column = lines[:mid_point]
+    right_column = lines[mid_point:]
+
+    merged = []
+    for left, right in zip(left_column, right_column):
+        if left.strip() and right.strip():
+            merged.append(left + " " + right)
+        else:
+            merged.append(left if left.strip() else right)
+    merged.extend(right_column[len(left_column):])
+    return '\n'.join(merged) + '\n'
+
+
+def _process_page(page_text: str, page_num: int, total_pages: int, merge_columns: bool) -> str:
+    page_text = _remove_control_chars(page_text or "")
+    if merge_columns and '\n' in page_text:
+        lines = page_text.split('\n')
+        avg_line_len = sum(len(line) for line in lines) / max(1, len(lines))
+        # 平均行长度太短，可能是分栏
+        if avg_line_len < 40 and len(lines) > 15:
+            page_text = _merge_columns(lines)
+    return _clean_page_text(page_text, page_num, total_pages) + "\n\n"
+
+
+def _postprocess(content: str) -> str:
+    content = re.sub(r'\n{3,}', '\n\n', content)  # 替换多个连续空行为两个空行
+    content = re.sub(r'(\w)-\n(\w)', r'\1\2', content)  # 处理连字符
+    return content
+
+
+def _clean_metadata(raw: Dict[str, Any], key_map: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    metadata = {}
+    for key, value in (raw or {}).items():
+        if key_map is not None:
+            if key not in key_map or not value:
+                continue
+            key = key_map[key]
+        elif key.startswith('/'):
+            key = key[1:]
+        # 只返回可跨进程传递、可存入JSON的值
+        value = _remove_control_chars(value) if isinstance(value, str) else str(value)
+        metadata[key] = value
+    return metadata
+
+
+def _pymupdf_pages(doc, start: int, end: int, total_pages: int) -> List[str]:
+    # PyMuPDF按文本块输出，分栏已按块分开，不需要再做行级合并
+    return [
+        _process_page(doc[index].get_text("text"), index + 1, total_pages, merge_columns=False)
+        for index in range(start, end)
+    ]
+
+
+def _pypdf_pages(reader, start: int, end: int, total_pages: int) -> List[str]:
+    return [
+        _process_page(reader.pages[index].extract_text() or "", index + 1, total_pages, merge_columns=True)
+        for index in range(start, end)
+    ]
+
+
+def extract_document(file_path: str, include_text: bool = True, max_inline_pages: int = 0) -> Dict[str, Any]:
+    """
+    在当前进程中解析一次文档（进程池worker的入口）
+
+    返回 backend、metadata、page_count 和 content。页数超过 max_inline_pages（>0）时
+    不在这里提取正文（content 为 None），由调用方按页段并行提取。
+    """
+    errors = []
+    if HAS_PYMUPDF:
+        try:
+            with fitz.open(file_path) as doc:
+                total_pages = doc.page_count
+                result = {
+                    "backend": "pymupdf",
+                    "metadata": _clean_metadata(doc.metadata, _PYMUPDF_METADATA_KEYS),
+                    "page_count": total_pages,
+                    "content": None,
+                }
+                if include_text and (max_inline_pages <= 0 or total_pages <= max_inline_pages):
+                    result["content"] = _postprocess("".join(_pymupdf_pages(doc, 0, total_pages, total_pages)))
+                return result
+        except Exception as e:
+            errors.append(f"PyMuPDF: {str(e)}")
+
+    if HAS_PYPDF:
+        with open(file_path, 'rb') as f:
+            reader = pypdf.PdfReader(io.BytesIO(f.read()))
+        total_pages = len(reader.pages)
+        result = {
+            "backend": "pypdf",
+            "metadata": _clean_metadata(dict(reader.metadata or {})),
+            "page_count": total_pages,
+            "content": None,
+        }
+        if include_text and (max_inline_pages <= 0 or total_pages <= max_inline_pages):
+            result["content"] = _postprocess("".join(_pypdf_pages(reader, 0, total_pages, total_pages)))
+        return result
+
+    raise RuntimeError("没有可用的PDF解析库: " + "; ".join(errors or ["未安装PyMuPDF和pypdf"]))
+
+
+def extract_page_range(file_path: str, backend: str, start: int, end: int, total_pages: int) -> str:
+    """提取 [start, end) 页的文本（进程池worker的入口）"""
+    if backend == "pymupdf":
+        with fitz.open(file_path) as doc:
+            return "".join(_pymupdf_pages(doc, start, end, total_pages))
+    with open(file_path, 'rb') as f:
+        reader = pypdf.PdfReader(io.BytesIO(f.read()))
+    return "".join(_pypdf_pages(reader, start, end, total_pages))
+
+
+def _page_ranges(total_pages: int, parts: int, min_pages: int) -> List[Tuple[int, int]]:
+    size = max(min_pages, math.ceil(total_pages / max(parts, 1)))
+    return [(start, min(start + size, total_pages)) for start in range(0, total_pages, size)]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """获取（懒创建）PDF提取进程池"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor):
+    """终止指定的进程池（包括仍在解析的worker）；它仍是当前进程池时，下次使用时重新创建"""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    # ProcessPoolExecutor 无法取消已开始的任务，只能直接结束worker进程
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    # 不取消排队中的任务：它们会以 BrokenProcessPool 结束，由 extract_pdf 在新进程池中重试，
+    # 被取消则会在调用方表现为 CancelledError
+    pool.shutdown(wait=False)
+
+
+async def extract_pdf(file_path: str, include_text: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    在进程池中提取PDF的元数据和文本
+
+    返回 {"backend", "metadata", "page_count", "content"}；include_text=False 时 content 为 None。
+    超时抛出 PdfExtractionTimeout，解析失败时抛出解析库的异常。
+    """
+    loop = asyncio.get_running_loop()
+    timeout = timeout if timeout is not None else settings.PDF_EXTRACTION_TIMEOUT
+
+    async def run(pool: ProcessPoolExecutor) -> Dict[str, Any]:
+        result = await loop.run_in_executor(
+            pool, extract_document, file_path, include_text, settings.PDF_PARALLEL_MIN_PAGES
+        )
+        if include_text and result["content"] is None:
+            if pool is not _pool:
+                # 元数据阶段结束后进程池已被重建（其他文档超时），旧进程池不再接受新任务
+                raise BrokenProcessPool("PDF提取进程池已被重建")
+            total_pages = result["page_count"]
+            ranges = _page_ranges(total_pages, settings.PDF_EXTRACTION_WORKERS, settings.PDF_PAGES_PER_TASK)
+            print(f"PDF共{total_pages}页，拆分为{len(ranges)}段并行提取")
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(pool, extract_page_range, file_path, result["backend"], start, end, total_pages)
+                for start, end in ranges
+            ))
+            result["content"] = _postprocess("".join(parts))
+        return result
+
+    for attempt in range(BROKEN_POOL_RETRIES + 1):
+        pool = _get_pool()
+        try:
+            result = await asyncio.wait_for(run(pool), timeout=timeout)
+            break
+        except asyncio.TimeoutError:
+            _reset_pool(pool)
+            raise PdfExtractionTimeout(f"PDF提取超过{timeout}秒: {file_path}")
+        except (BrokenProcessPool, RuntimeError) as e:
+            # 通常是其他文档超时后终止了进程池，在新进程池中重新提取（超时重新计时）；
+            # 向已关闭的进程池提交任务会抛出 RuntimeError，只在进程池已被替换时按同样方式处理
+            if not isinstance(e, BrokenProcessPool) and pool is _pool:
+                raise
+            _reset_pool(pool)
+            if attempt == BROKEN_POOL_RETRIES:
+                raise
+            print(f"PDF提取进程池已重建，重新提取 ({attempt + 1}/{BROKEN_POOL_RETRIES}): {file_path}")
+    if result["content"] is not None:
+        print(f"成功提取文本（{result['backend']}，{result['page_count']}页），总长度: {len(result['content'])} 字符")
+    return result
+
+
+def shutdown_pool():
+    """应用关闭时释放进程池"""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,34 @@
+"""
+Server-Sent Events 响应
+
+事件统一为带 type 字段的字典，type 作为SSE事件名，整个字典序列化为 data。
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+# 禁止缓存，并关闭Nginx的响应缓冲，保证事件立即送达
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse_event(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """
+    将事件流包装为SSE响应
+
+    响应头发出后无法再返回错误状态码，生成过程中的异常转为一条 error 事件后结束。
+    """
+    async def event_stream():
+        try:
+            async for event in events:
+                yield format_sse_event(event)
+        except Exception as e:
+            logging.error(f"SSE事件流出错: {str(e)}", exc_info=True)
+            yield format_sse_event({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
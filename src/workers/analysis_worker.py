@@ -0,0 +1,266 @@
+"""
+论文分析worker进程
+
+从analysis_jobs队列领取任务并执行论文分析，与Web进程相互独立。可启动多个进程水平扩展：
+
+    python -m src.workers.analysis_worker --concurrency 4
+
+未部署独立worker时，Web进程在启动时运行一个内嵌worker（ANALYSIS_EMBEDDED_WORKER）。
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.core.config import settings
+from src.db.session import SessionLocal
+from src.models.analysis_job import AnalysisJob
+from src.services import analysis_queue
+from src.services.progress_bus import publish_analysis_event
+
+# 心跳超时任务的检查间隔（秒）
+REAP_INTERVAL = 60
+
+
+def _publish_failure(event: Dict[str, Any]):
+    event = dict(event)
+    publish_analysis_event(event.pop("paper_id"), event.pop("type"), **event)
+
+
+class AnalysisWorker:
+    """论文分析worker，在一个事件循环中并发执行多个任务"""
+
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None,
+                 poll_interval: Optional[float] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(1, concurrency or settings.ANALYSIS_WORKER_CONCURRENCY)
+        self.poll_interval = poll_interval or settings.ANALYSIS_WORKER_POLL_INTERVAL
+        # 心跳间隔取租约时间的三分之一，保证租约到期前至少续约两次
+        self.heartbeat_interval = max(1.0, settings.ANALYSIS_JOB_LEASE_SECONDS / 3)
+        self.shutdown_grace = settings.ANALYSIS_WORKER_SHUTDOWN_GRACE
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """停止领取新任务，执行中的任务有 shutdown_grace 秒的宽限时间"""
+        if not self._stopping.is_set():
+            print(f"worker {self.worker_id} 收到停止信号，等待执行中的任务完成")
+            self._stopping.set()
+
+    # ---- 以下同步方法在线程中执行，避免阻塞事件循环 ----
+
+    def _claim_job_sync(self) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            job = analysis_queue.claim_next_job(db, self.worker_id)
+            return job.id if job else None
+        finally:
+            db.close()
+
+    def _heartbeat_sync(self, job_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            return analysis_queue.heartbeat(db, job_id, self.worker_id)
+        finally:
+            db.close()
+
+    def _reap_sync(self) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return analysis_queue.requeue_stale_jobs(db)
+        finally:
+            db.close()
+
+    # ---- 异步执行 ----
+
+    async def _heartbeat_loop(self, job_id: str, run_task: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                if not await asyncio.to_thread(self._heartbeat_sync, job_id):
+                    # 租约已过期，任务被重新入队或由其他worker执行，停止本地执行避免重复分析
+                    print(f"任务已不属于当前worker，取消执行: job_id={job_id}")
+                    run_task.cancel()
+                    return
+            except Exception as e:
+                print(f"任务心跳失败: job_id={job_id}, error={str(e)}")
+
+    async def _run_job(self, job_id: str):
+        """执行单个任务，每个任务使用独立的数据库会话"""
+        from src.services import paper_analyzer
+
+        db = SessionLocal()
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop(job_id, asyncio.current_task()))
+        try:
+            job = db.get(AnalysisJob, job_id)
+            options = job.options or {}
+            print(f"开始执行分析任务: job_id={job.id}, paper_id={job.paper_id}, "
+                  f"第{job.attempts}/{job.max_attempts}次, 断点={job.checkpoint or []}")
+            try:
+                await paper_analyzer.analyze_paper(
+                    db,
+                    job.paper_id,
+                    job.user_id,
+                    extract_core_content=options.get("extract_core_content", True),
+                    analyze_experiments=options.get("analyze_experiments", False),
+                    analyze_references=options.get("analyze_references", False),
+                    completed_stages=job.checkpoint or [],
+                    on_stage_complete=lambda stage_name: analysis_queue.record_checkpoint(
+                        db, job, stage_name, self.worker_id),
+                )
+            except Exception as e:
+                db.rollback()
+                print(f"分析任务执行失败: job_id={job_id}, error={str(e)}\n{traceback.format_exc()}")
+                if analysis_queue.fail_job(db, job, str(e), self.worker_id):
+                    _publish_failure(analysis_queue.failure_event(job))
+                return
+            if analysis_queue.complete_job(db, job, self.worker_id):
+                print(f"分析任务完成: job_id={job_id}")
+        except asyncio.CancelledError:
+            # 失去任务所有权或worker停止：不修改任务状态，由租约过期后的重新入队接管
+            print(f"分析任务已取消: job_id={job_id}")
+            raise
+        except Exception as e:
+            print(f"处理分析任务时出错: job_id={job_id}, error={str(e)}\n{traceback.format_exc()}")
+        finally:
+            heartbeat_task.cancel()
+            db.close()
+
+    async def run(self):
+        """主循环：有空闲槽位时领取任务，队列为空时按间隔轮询"""
+        print(f"分析worker启动: id={self.worker_id}, 并发={self.concurrency}")
+        slots = asyncio.Semaphore(self.concurrency)
+        running: Set[asyncio.Task] = set()
+        last_reap = 0.0
+
+        while not self._stopping.is_set():
+            if time.monotonic() - last_reap >= REAP_INTERVAL:
+                last_reap = time.monotonic()
+                try:
+                    events = await asyncio.to_thread(self._reap_sync)
+                    for event in events:
+                        _publish_failure(event)
+                    if events:
+                        print(f"处理了{len(events)}个心跳超时的任务")
+                except Exception as e:
+                    print(f"检查超时任务失败: {str(e)}")
+
+            if not await self._wait_for_slot(slots):
+                break
+            try:
+                job_id = await asyncio.to_thread(self._claim_job_sync)
+            except Exception as e:
+                print(f"领取任务失败: {str(e)}")
+                job_id = None
+
+            if job_id is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run_job(job_id))
+            running.add(task)
+
+            def _on_done(finished: asyncio.Task):
+                running.discard(finished)
+                slots.release()
+
+            task.add_done_callback(_on_done)
+
+        await self._drain(set(running))
+        print(f"分析worker已退出: id={self.worker_id}")
+
+    async def _wait_for_slot(self, slots: asyncio.Semaphore) -> bool:
+        """等待空闲槽位；所有槽位都在执行任务时也能及时响应停止信号，停止时返回False"""
+        acquire = asyncio.create_task(slots.acquire())
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not acquire.done():
+            acquire.cancel()
+            await asyncio.gather(acquire, return_exceptions=True)
+        if acquire.cancelled():
+            return False
+        if self._stopping.is_set():
+            slots.release()
+            return False
+        return True
+
+    async def _drain(self, running: Set[asyncio.Task]):
+        """
+        停止时等待执行中的任务，超过宽限时间后取消
+
+        被取消的任务保持执行中状态，租约过期后由（重启后的）worker重新入队并从断点继续。
+        """
+        if not running:
+            return
+        _, pending = await asyncio.wait(running, timeout=self.shutdown_grace)
+        if pending:
+            print(f"{len(pending)}个任务未在{self.shutdown_grace:.0f}秒内完成，取消执行，租约过期后从断点继续")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+# Web进程内嵌的worker（见 start_embedded_worker）
+_embedded: Optional[Tuple[AnalysisWorker, asyncio.Task]] = None
+
+
+def start_embedded_worker():
+    """
+    在Web进程的事件循环中启动worker
+
+    队列已启用且未部署独立worker（ANALYSIS_EMBEDDED_WORKER=True）时由应用启动事件调用，
+    保证直接运行Web服务时入队的分析任务也会被执行。
+    """
+    global _embedded
+    if _embedded is not None or not (settings.ANALYSIS_QUEUE_ENABLED and settings.ANALYSIS_EMBEDDED_WORKER):
+        return
+    worker = AnalysisWorker()
+    _embedded = (worker, asyncio.create_task(worker.run()))
+
+
+async def stop_embedded_worker():
+    """停止内嵌worker，执行中的任务最多等待宽限时间（共享资源由应用的关闭事件释放）"""
+    global _embedded
+    if _embedded is None:
+        return
+    worker, task = _embedded
+    _embedded = None
+    worker.stop()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _main(args):
+    worker = AnalysisWorker(worker_id=args.worker_id, concurrency=args.concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            # Windows不支持add_signal_handler
+            pass
+    await worker.run()
+
+    from src.services.llm_client import close_llm_clients
+    await close_llm_clients()
+    from src.services.progress_bus import progress_bus
+    await progress_bus.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="论文分析worker")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时执行的任务数")
+    parser.add_argument("--worker-id", default=None, help="worker标识，默认由主机名和进程号生成")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()